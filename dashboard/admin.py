@@ -1,36 +1,435 @@
-from django.contrib import admin
-from .models import Company, Worker, Document, RenewalHistory, UserProfile
+import datetime
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
+
+from . import archive, webhooks
+from .forms import AutocompleteSelect
+from .models import AlertPolicy, Company, Worker, Document, RenewalHistory, ArchivedDocument, UserProfile, Job, NotificationLog, ProfileReport, CalendarFeed, StoredFile, Attachment, WebhookEndpoint, WebhookDelivery, refresh_worker_summaries, touch_companies
+from .pagination import EstimatedCountPaginator
+
+
+FILTER_CHOICES_CACHE_SECONDS = 600
+
+
+class LargeTableAdminMixin:
+    """Changelist settings for tables with millions of rows.
+
+    Uses planner estimates instead of exact ``COUNT(*)`` and skips the
+    second unfiltered count Django normally shows next to search results.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class CachedListFilter(admin.SimpleListFilter):
+    """List filter whose choices are loaded once and cached per company scope.
+
+    Subclasses set ``lookup_queryset`` to a queryset of ``(value, label)`` pairs;
+    ``company_field`` narrows it for CLIENT users. ``invalidate()`` drops
+    every cached scope, e.g. from a ``post_save`` receiver.
+
+    The version counter lives in the default cache, so invalidation only
+    reaches other processes when that cache is shared (Redis, Memcached).
+    With the default per-process ``LocMemCache`` the other workers keep
+    their choices until ``FILTER_CHOICES_CACHE_SECONDS`` runs out.
+    """
+    lookup_queryset = None
+    company_field = 'company_id'
+
+    @classmethod
+    def _version_key(cls):
+        return f'admin-filter-version:{cls.__module__}.{cls.__qualname__}'
+
+    @classmethod
+    def invalidate(cls):
+        try:
+            cache.incr(cls._version_key())
+        except ValueError:
+            pass  # Nothing cached yet
+
+    def lookups(self, request, model_admin):
+        profile = getattr(request.user, 'profile', None)
+        company_id = profile.company_id if profile and profile.role == 'CLIENT' else None
+        version = cache.get_or_set(self._version_key(), 1, None)
+        key = f'admin-filter:{self.parameter_name}:{version}:{company_id or "all"}'
+
+        def load():
+            lookups = self.lookup_queryset.all()
+            if company_id:
+                lookups = lookups.filter(**{self.company_field: company_id})
+            return list(lookups)
+
+        return cache.get_or_set(key, load, FILTER_CHOICES_CACHE_SECONDS)
+
+
+class CompanyListFilter(CachedListFilter):
+    title = "Perusahaan"
+    parameter_name = "perusahaan"
+    lookup_queryset = Company.objects.order_by('name').values_list('pk', 'name')
+    company_field = 'pk'
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(company_id=self.value())
+        return queryset
+
+
+class NationalityListFilter(CachedListFilter):
+    title = "Kewarganegaraan"
+    parameter_name = "kewarganegaraan"
+    # DISTINCT over the (nationality, name) index, cached instead of run per changelist
+    lookup_queryset = Worker.objects.order_by('nationality').values_list('nationality', 'nationality').distinct()
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(nationality=self.value())
+        return queryset
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def invalidate_company_filter(sender, **kwargs):
+    CompanyListFilter.invalidate()
+
+
+@receiver(post_save, sender=Worker)
+@receiver(post_delete, sender=Worker)
+def invalidate_nationality_filter(sender, **kwargs):
+    NationalityListFilter.invalidate()
+
+
+class ExtendExpiryForm(forms.Form):
+    days = forms.IntegerField(label="Perpanjang (hari)", min_value=1, max_value=3650)
+
+
+class ReassignCompanyForm(forms.Form):
+    company = forms.ModelChoiceField(
+        label="Perusahaan tujuan",
+        queryset=Company.objects.all(),
+        widget=AutocompleteSelect("autocomplete_companies"),
+    )
+
+
+def _bulk_action_form(modeladmin, request, form_class, title, action):
+    """Return ``(form, response)`` for an action that needs extra input.
+
+    ``response`` is the intermediate page while the form is unbound or invalid.
+    """
+    form = form_class(request.POST if 'apply' in request.POST else None)
+    if form.is_bound and form.is_valid():
+        return form, None
+    selected = request.POST.getlist(helpers.ACTION_CHECKBOX_NAME)
+    context = {
+        **modeladmin.admin_site.each_context(request),
+        'opts': modeladmin.model._meta,
+        'title': title,
+        'form': form,
+        'media': modeladmin.media + form.media,
+        'action': action,
+        'selected': selected,
+        'select_across': request.POST.get('select_across', '0'),
+        'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+    }
+    return form, TemplateResponse(request, 'admin/dashboard/bulk_action_form.html', context)
+
+
+class ClientScopedAdminMixin:
+    """Scope admin querysets (and therefore admin autocomplete) to a CLIENT's company.
+
+    ``client_company_field`` is a lookup, or a tuple of lookups any of which
+    may match. Autocomplete requests use indexed prefix matching on
+    ``autocomplete_search_fields`` instead of the changelist's ``icontains``.
+    """
+    client_company_field = None
+    autocomplete_search_fields = ()
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        profile = getattr(request.user, 'profile', None)
+        if self.client_company_field and profile and profile.role == 'CLIENT' and profile.company_id:
+            fields = self.client_company_field
+            if isinstance(fields, str):
+                fields = (fields,)
+            condition = Q()
+            for field in fields:
+                condition |= Q(**{field: profile.company_id})
+            qs = qs.filter(condition)
+        return qs
+
+    def get_search_results(self, request, queryset, search_term):
+        if self.autocomplete_search_fields and request.path.endswith('/autocomplete/'):
+            if search_term:
+                condition = Q()
+                for field in self.autocomplete_search_fields:
+                    condition |= Q(**{f'{field}__istartswith': search_term})
+                queryset = queryset.filter(condition)
+            return queryset, False
+        return super().get_search_results(request, queryset, search_term)
 
 
 @admin.register(Company)
-class CompanyAdmin(admin.ModelAdmin):
-    list_display = ("name", "industry", "contact_person")
+class CompanyAdmin(ClientScopedAdminMixin, admin.ModelAdmin):
+    list_display = ("name", "industry", "contact_person", "contact_email")
     search_fields = ("name", "industry", "contact_person")
+    ordering = ("name", "id")
+    client_company_field = "id"
+    autocomplete_search_fields = ("name",)
 
 
 @admin.register(Worker)
-class WorkerAdmin(admin.ModelAdmin):
+class WorkerAdmin(LargeTableAdminMixin, ClientScopedAdminMixin, admin.ModelAdmin):
     list_display = ("name", "passport_number", "nationality", "company", "position")
+    list_select_related = ("company",)
     search_fields = ("name", "passport_number", "nationality", "position", "company__name")
-    list_filter = ("company", "nationality")
+    list_filter = (CompanyListFilter, NationalityListFilter)
+    autocomplete_fields = ("company",)
+    ordering = ("name", "id")
+    actions = ("reassign_company",)
+    client_company_field = "company_id"
+    autocomplete_search_fields = ("name", "passport_number")
+
+    @admin.action(description="Pindahkan ke perusahaan lain", permissions=["change"])
+    def reassign_company(self, request, queryset):
+        form, response = _bulk_action_form(self, request, ReassignCompanyForm, "Pindahkan pekerja", "reassign_company")
+        if response:
+            return response
+        company = form.cleaned_data['company']
+        with transaction.atomic():
+            # Documents first: the worker queryset may be filtered by the old company
+            old_company_ids = set(queryset.order_by().values_list('company_id', flat=True).distinct())
+            Document.objects.filter(worker__in=queryset.values('pk')).update(company=company)
+            ArchivedDocument.objects.filter(worker__in=queryset.values('pk')).update(company=company)
+            updated = queryset.update(company=company)
+            touch_companies(old_company_ids | {company.pk})
+        self.message_user(request, f"{updated} pekerja dipindahkan ke {company}.", messages.SUCCESS)
 
 
 @admin.register(Document)
-class DocumentAdmin(admin.ModelAdmin):
+class DocumentAdmin(LargeTableAdminMixin, ClientScopedAdminMixin, admin.ModelAdmin):
     list_display = ("type", "document_number", "worker", "issue_date", "expiry_date", "status")
+    list_select_related = ("worker",)
     search_fields = ("document_number", "worker__name", "worker__passport_number")
-    list_filter = ("type", "status")
+    list_filter = ("type", "status", CompanyListFilter)
+    autocomplete_fields = ("worker",)
+    actions = ("mark_expired", "extend_expiry")
+    client_company_field = "company_id"
+    autocomplete_search_fields = ("document_number",)
+
+    def _affected_worker_ids(self, queryset):
+        # Collected before the UPDATE, which may move rows out of a filtered queryset
+        return list(queryset.order_by().values_list('worker_id', flat=True).distinct())
+
+    def _affected_company_ids(self, queryset):
+        return list(queryset.order_by().values_list('company_id', flat=True).distinct())
+
+    def save_model(self, request, obj, form, change):
+        # The admin view runs in a transaction, so the outbox row commits with the document
+        super().save_model(request, obj, form, change)
+        if not change:
+            webhooks.documents_created([obj])
+
+    @admin.action(description="Tandai kedaluwarsa", permissions=["change"])
+    def mark_expired(self, request, queryset):
+        with transaction.atomic():
+            worker_ids = self._affected_worker_ids(queryset)
+            company_ids = self._affected_company_ids(queryset)
+            newly_expired = list(queryset.filter(status=Document.Status.ACTIVE).values_list('pk', flat=True))
+            updated = queryset.update(status=Document.Status.EXPIRED)
+            refresh_worker_summaries(worker_ids)
+            touch_companies(company_ids)
+            webhooks.documents_expired(Document.objects.select_related('worker').filter(pk__in=newly_expired))
+        self.message_user(request, f"{updated} dokumen ditandai kedaluwarsa.", messages.SUCCESS)
+
+    @admin.action(description="Perpanjang tanggal berakhir", permissions=["change"])
+    def extend_expiry(self, request, queryset):
+        form, response = _bulk_action_form(self, request, ExtendExpiryForm, "Perpanjang tanggal berakhir", "extend_expiry")
+        if response:
+            return response
+        days = form.cleaned_data['days']
+        with transaction.atomic():
+            worker_ids = self._affected_worker_ids(queryset)
+            company_ids = self._affected_company_ids(queryset)
+            # Documents whose new date is not in the past become active again
+            today = timezone.localdate()
+            updated = queryset.update(
+                expiry_date=F('expiry_date') + datetime.timedelta(days=days),
+                status=Case(
+                    When(expiry_date__gte=today - datetime.timedelta(days=days), then=Value(Document.Status.ACTIVE)),
+                    default=F('status'),
+                ),
+            )
+            refresh_worker_summaries(worker_ids)
+            touch_companies(company_ids)
+        self.message_user(request, f"{updated} dokumen diperpanjang {days} hari.", messages.SUCCESS)
 
 
 @admin.register(RenewalHistory)
-class RenewalHistoryAdmin(admin.ModelAdmin):
+class RenewalHistoryAdmin(LargeTableAdminMixin, ClientScopedAdminMixin, admin.ModelAdmin):
     list_display = ("document", "submission_date", "process_status")
+    list_select_related = ("document__worker",)
     list_filter = ("process_status",)
+    autocomplete_fields = ("document",)
+    client_company_field = "document__company_id"
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.previous_expiry_date = obj.document.expiry_date
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(ArchivedDocument)
+class ArchivedDocumentAdmin(LargeTableAdminMixin, ClientScopedAdminMixin, admin.ModelAdmin):
+    list_display = ("type", "document_number", "worker", "expiry_date", "archived_at")
+    list_select_related = ("worker",)
+    search_fields = ("document_number", "worker__name", "worker__passport_number")
+    list_filter = ("type", CompanyListFilter)
+    readonly_fields = ("id", "worker", "company", "archived_at")
+    actions = ("restore",)
+    client_company_field = "company_id"
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Pulihkan ke dokumen aktif", permissions=["change"])
+    def restore(self, request, queryset):
+        restored = archive.restore_documents(queryset)
+        self.message_user(request, f"{restored} dokumen dipulihkan dari arsip.", messages.SUCCESS)
 
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ("user", "role", "company")
+    list_select_related = ("user", "company")
     list_filter = ("role", "company")
+    autocomplete_fields = ("user", "company")
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "attempts", "created_by", "created_at", "finished_at")
+    list_filter = ("status", "kind")
+    list_select_related = ("created_by",)
+    readonly_fields = ("started_at", "finished_at", "locked_by", "error")
+
+
+@admin.register(NotificationLog)
+class NotificationLogAdmin(admin.ModelAdmin):
+    list_display = ("recipient", "kind", "sent_at", "document_count")
+    list_filter = ("kind",)
+    search_fields = ("recipient",)
+    date_hierarchy = "sent_at"
+
+
+@admin.register(AlertPolicy)
+class AlertPolicyAdmin(admin.ModelAdmin):
+    list_display = ("document_type", "company", "urgent_days", "warning_days", "notice_days")
+    list_editable = ("urgent_days", "warning_days", "notice_days")
+    list_filter = ("document_type",)
+    list_select_related = ("company",)
+    search_fields = ("company__name",)
+    autocomplete_fields = ("company",)
+
+
+@admin.register(CalendarFeed)
+class CalendarFeedAdmin(admin.ModelAdmin):
+    list_display = ("user", "company", "created_at")
+    list_select_related = ("user", "company")
+    autocomplete_fields = ("user", "company")
+    readonly_fields = ("token", "created_at")
+
+
+@admin.register(ProfileReport)
+class ProfileReportAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "method", "path", "status_code", "duration_ms", "sql_count", "sql_ms", "user")
+    list_filter = ("method", "status_code")
+    list_select_related = ("user",)
+    search_fields = ("path",)
+    exclude = ("queries", "stats")
+    readonly_fields = (
+        "path", "method", "query_string", "user", "status_code", "duration_ms",
+        "sql_count", "sql_ms", "created_at", "slowest_queries", "call_tree",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Query SQL (terlama dulu)")
+    def slowest_queries(self, obj):
+        rows = sorted(obj.queries, key=lambda q: q["ms"], reverse=True)
+        return format_html(
+            '<table><tr><th>ms</th><th>SQL</th><th>Parameter</th></tr>{}</table>',
+            format_html_join("", "<tr><td>{}</td><td><code>{}</code></td><td><code>{}</code></td></tr>",
+                             ((q["ms"], q["sql"], q["params"]) for q in rows)),
+        )
+
+    @admin.display(description="Profil cProfile")
+    def call_tree(self, obj):
+        return format_html('<pre style="white-space: pre; overflow-x: auto;">{}</pre>', obj.stats)
 
 # Register your models here.
+
+
+@admin.register(StoredFile)
+class StoredFileAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "content_type", "size", "preview_status", "created_at")
+    list_filter = ("content_type", "preview_status")
+    search_fields = ("sha256",)
+    readonly_fields = ("sha256", "size", "content_type", "file", "preview", "created_at")
+
+
+@admin.register(Attachment)
+class AttachmentAdmin(LargeTableAdminMixin, ClientScopedAdminMixin, admin.ModelAdmin):
+    list_display = ("filename", "document", "renewal", "uploaded_by", "created_at")
+    # Document/renewal __str__ read the worker name
+    list_select_related = ("document__worker", "renewal__document__worker", "uploaded_by")
+    search_fields = ("filename", "stored_file__sha256")
+    date_hierarchy = "created_at"
+    raw_id_fields = ("stored_file", "document", "renewal")
+    readonly_fields = ("uploaded_by", "created_at")
+    client_company_field = ("document__company_id", "renewal__document__company_id")
+
+
+@admin.register(WebhookEndpoint)
+class WebhookEndpointAdmin(admin.ModelAdmin):
+    list_display = ("name", "url", "company", "is_active", "rate_limit_per_minute", "created_at")
+    list_filter = ("is_active",)
+    list_select_related = ("company",)
+    search_fields = ("name", "url")
+    autocomplete_fields = ("company",)
+    readonly_fields = ("secret", "created_at")
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    list_display = ("event", "endpoint", "status", "attempts", "response_code", "next_attempt_at", "delivered_at")
+    list_filter = ("status", "event", "endpoint")
+    list_select_related = ("endpoint",)
+    search_fields = ("event_key",)
+    date_hierarchy = "created_at"
+    readonly_fields = (
+        "endpoint", "event", "event_key", "payload", "status", "attempts", "next_attempt_at",
+        "locked_by", "created_at", "delivered_at", "response_code", "last_error",
+    )
+    actions = ("resend",)
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Kirim ulang", permissions=["change"])
+    def resend(self, request, queryset):
+        updated = queryset.update(
+            status=WebhookDelivery.Status.PENDING, attempts=0, next_attempt_at=timezone.now(), locked_by='',
+        )
+        self.message_user(request, f"{updated} pengiriman dijadwalkan ulang.", messages.SUCCESS)
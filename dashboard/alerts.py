@@ -0,0 +1,93 @@
+"""Expiry alert levels per document type (and company).
+
+``AlertPolicy`` holds few rows, so they are read in one query and compiled
+into a single ``CASE`` expression over ``Document``: company overrides
+first, then the per-type defaults, then ``AlertPolicy.DEFAULT_DAYS``. The
+dashboard and the reminder digests filter and bucket documents with that
+expression in one query instead of one query per type and window.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Case, CharField, Q, Value, When
+from django.utils import timezone
+
+from .models import AlertPolicy, Document
+
+
+LEVELS = [AlertPolicy.Level.URGENT, AlertPolicy.Level.WARNING, AlertPolicy.Level.NOTICE]
+DAY_FIELDS = ['urgent_days', 'warning_days', 'notice_days']
+
+
+def load_policies(company_id=None):
+    """Return ``(overrides, defaults)`` as ``{(company_id, type): days}`` and ``{type: days}``,
+    where ``days`` is an ``(urgent, warning, notice)`` tuple. ``company_id`` limits the overrides."""
+    qs = AlertPolicy.objects.all()
+    if company_id:
+        qs = qs.filter(Q(company__isnull=True) | Q(company_id=company_id))
+    overrides, defaults = {}, {}
+    for company, doc_type, *days in qs.values_list('company_id', 'document_type', *DAY_FIELDS):
+        if company is None:
+            defaults[doc_type] = tuple(days)
+        else:
+            overrides[(company, doc_type)] = tuple(days)
+    fallback = tuple(AlertPolicy.DEFAULT_DAYS[f] for f in DAY_FIELDS)
+    for doc_type in Document.DocumentType.values:
+        defaults.setdefault(doc_type, fallback)
+    return overrides, defaults
+
+
+def _level_whens(scope, days, today):
+    whens = [
+        When(scope & Q(expiry_date__lte=today + timedelta(days=d)), then=Value(level))
+        for level, d in zip(LEVELS, days)
+    ]
+    # Matched by this policy but outside its windows: stop before the next, broader scope
+    whens.append(When(scope, then=Value(None)))
+    return whens
+
+
+def alert_level_expression(policies, today):
+    """``CASE`` giving each document's alert level (``None`` outside every window)."""
+    overrides, defaults = policies
+    # Companies sharing the same override for a type share one WHEN
+    grouped = defaultdict(list)
+    for (company_id, doc_type), days in overrides.items():
+        grouped[(doc_type, days)].append(company_id)
+    whens = []
+    for (doc_type, days), company_ids in grouped.items():
+        whens += _level_whens(Q(type=doc_type, company_id__in=company_ids), days, today)
+    for doc_type, days in defaults.items():
+        whens += _level_whens(Q(type=doc_type), days, today)
+    return Case(*whens, default=Value(None), output_field=CharField())
+
+
+def with_alert_level(queryset, today=None, company_id=None):
+    """Active documents of ``queryset`` inside an alert window, annotated with ``alert_level``."""
+    today = today or timezone.localdate()
+    policies = load_policies(company_id)
+    horizon = max(days[-1] for days in [*policies[0].values(), *policies[1].values()])
+    return (
+        queryset.filter(
+            status=Document.Status.ACTIVE,
+            expiry_date__gte=today,
+            expiry_date__lte=today + timedelta(days=horizon),
+        )
+        .annotate(alert_level=alert_level_expression(policies, today))
+        .filter(alert_level__isnull=False)
+    )
+
+
+def cutoff_sql(policies, today, level, type_column, company_column):
+    """Raw-SQL counterpart of the policy lookup: ``(sql, params)`` for a ``CASE`` giving the
+    last expiry date that falls inside ``level``'s window for each row's type and company."""
+    overrides, defaults = policies
+    days_index = LEVELS.index(level)
+    parts, params = [], []
+    for (company_id, doc_type), days in overrides.items():
+        parts.append(f'WHEN {company_column} = %s AND {type_column} = %s THEN %s')
+        params += [company_id, doc_type, today + timedelta(days=days[days_index])]
+    for doc_type, days in defaults.items():
+        parts.append(f'WHEN {type_column} = %s THEN %s')
+        params += [doc_type, today + timedelta(days=days[days_index])]
+    return f"CASE {' '.join(parts)} END", params
@@ -0,0 +1,82 @@
+"""Archive tier for long-expired documents.
+
+Documents that expired more than ``ARCHIVE_RETENTION_DAYS`` ago move, with
+their renewal history, from ``Document``/``RenewalHistory`` into
+``ArchivedDocument``/``ArchivedRenewalHistory`` so the hot tables scanned
+by the dashboard, lists and reminders stay small. Documents with a renewal
+that is not yet completed stay in place. Rows keep their ids, so
+``restore_documents`` puts them back unchanged (attachments reference the
+ids without a DB constraint and come back with them). Both directions work in
+batches, one short transaction each.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Document, RenewalHistory, ArchivedDocument, ArchivedRenewalHistory, refresh_worker_summaries, touch_companies
+
+
+DOCUMENT_FIELDS = ['id', 'worker_id', 'company_id', 'type', 'document_number', 'issue_date', 'expiry_date', 'status']
+RENEWAL_FIELDS = [
+    'id', 'document_id', 'submission_date', 'process_status', 'notes',
+    'new_document_number', 'new_issue_date', 'new_expiry_date', 'previous_expiry_date',
+]
+
+
+def archivable_documents(retention_days=None):
+    retention_days = settings.ARCHIVE_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = timezone.localdate() - timedelta(days=retention_days)
+    open_renewals = RenewalHistory.all_objects.exclude(
+        process_status=RenewalHistory.ProcessStatus.COMPLETED
+    ).values('document_id')
+    return Document.objects.filter(expiry_date__lt=cutoff).exclude(pk__in=open_renewals)
+
+
+def _move(ids, source_docs, source_renewals, target_doc, target_renewal):
+    """Copy documents ``ids`` and their renewals to the target models, then delete the source rows."""
+    docs = list(source_docs.filter(pk__in=ids).values(*DOCUMENT_FIELDS))
+    renewals = list(source_renewals.filter(document_id__in=ids).values(*RENEWAL_FIELDS))
+    target_doc.objects.bulk_create([target_doc(**d) for d in docs])
+    target_renewal.objects.bulk_create([target_renewal(**r) for r in renewals])
+    source_renewals.filter(document_id__in=ids)._raw_delete(source_renewals.db)
+    source_docs.filter(pk__in=ids)._raw_delete(source_docs.db)
+    touch_companies({d['company_id'] for d in docs})
+    return {d['worker_id'] for d in docs}
+
+
+def _run_batches(queryset, move, batch_size, progress):
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    moved = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            worker_ids = move(ids)
+        # Raw deletes/bulk inserts skip the Document signals
+        refresh_worker_summaries(worker_ids)
+        moved += len(ids)
+        if progress:
+            progress(moved)
+    return moved
+
+
+def archive_documents(queryset=None, batch_size=None, progress=None) -> int:
+    """Move ``queryset`` (default: ``archivable_documents()``) to the archive; returns the count."""
+    queryset = archivable_documents() if queryset is None else queryset
+    return _run_batches(
+        queryset,
+        lambda ids: _move(ids, Document.all_objects, RenewalHistory.all_objects, ArchivedDocument, ArchivedRenewalHistory),
+        batch_size, progress,
+    )
+
+
+def restore_documents(queryset, batch_size=None, progress=None) -> int:
+    """Move archived documents in ``queryset`` back to the hot tables; returns the count."""
+    return _run_batches(
+        queryset,
+        lambda ids: _move(ids, ArchivedDocument.objects, ArchivedRenewalHistory.objects, Document, RenewalHistory),
+        batch_size, progress,
+    )
@@ -0,0 +1,131 @@
+"""Worker compliance state across the document chain.
+
+A worker may only work while every link of RPTKA → IMTA → VISA → KITAS →
+SKTT, plus the passport, is present and valid. One SQL statement computes
+the state of a whole company (or a page of workers): a ``ROW_NUMBER``
+window picks the current document per (worker, type), each link is coded
+missing / valid / at risk (inside the type's ``WARNING`` alert window) /
+expired, and conditional aggregates per worker turn the codes into a state
+and the first broken link in chain order.
+"""
+import datetime
+
+from django.db import connection
+from django.utils import timezone
+
+from . import alerts
+from .models import AlertPolicy, Document, Worker
+
+
+CHAIN = ['RPTKA', 'IMTA', 'VISA', 'KITAS', 'SKTT', 'PASSPORT']
+
+COMPLIANT, AT_RISK, BLOCKED = 'COMPLIANT', 'AT_RISK', 'BLOCKED'
+STATE_LABELS = {COMPLIANT: 'Patuh', AT_RISK: 'Berisiko', BLOCKED: 'Terblokir'}
+STATE_STYLES = {COMPLIANT: 'bg-success', AT_RISK: 'bg-warning', BLOCKED: 'bg-danger'}
+
+# Link codes produced by the SQL
+MISSING, VALID, RISK, EXPIRED = 0, 1, 2, 3
+LINK_LABELS = {MISSING: 'Belum ada', VALID: 'Berlaku', RISK: 'Segera berakhir', EXPIRED: 'Kedaluwarsa'}
+BROKEN = (MISSING, EXPIRED)
+
+
+def _states_sql(company_id, worker_ids, today):
+    scope, scope_params = '', []
+    if company_id:
+        scope, scope_params = 'AND w.company_id = %s', [company_id]
+    if worker_ids is not None:
+        scope += f" AND w.id IN ({', '.join(['%s'] * len(worker_ids))})"
+        scope_params += list(worker_ids)
+    risk_cutoff, risk_params = alerts.cutoff_sql(
+        alerts.load_policies(company_id), today, AlertPolicy.Level.WARNING, 'd.type', 'd.company_id'
+    )
+    n = len(CHAIN)
+    broken = ', '.join(str(code) for code in BROKEN)
+
+    def first(condition, then):
+        whens = ' '.join(f'WHEN code_{i} {condition} THEN {then(i)}' for i in range(n))
+        return f'CASE {whens} END'
+
+    sql = f"""
+        WITH ranked AS (
+            SELECT d.worker_id, d.type, d.expiry_date,
+                   CASE WHEN d.status = %s OR d.expiry_date < %s THEN {EXPIRED}
+                        WHEN d.expiry_date <= {risk_cutoff} THEN {RISK}
+                        ELSE {VALID} END AS code,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY d.worker_id, d.type ORDER BY d.expiry_date DESC, d.id DESC
+                   ) AS rn
+            FROM {Document._meta.db_table} d
+            JOIN {Worker._meta.db_table} w ON w.id = d.worker_id AND w.pending_deletion = %s {scope}
+        ),
+        links AS (
+            SELECT w.id AS worker_id,
+                   {', '.join(f'COALESCE(MAX(CASE WHEN r.type = %s THEN r.code END), {MISSING}) AS code_{i}' for i in range(n))},
+                   {', '.join(f'MAX(CASE WHEN r.type = %s THEN r.expiry_date END) AS expiry_{i}' for i in range(n))}
+            FROM {Worker._meta.db_table} w
+            LEFT JOIN ranked r ON r.worker_id = w.id AND r.rn = 1
+            WHERE w.pending_deletion = %s {scope}
+            GROUP BY w.id
+        )
+        SELECT worker_id,
+               CASE WHEN {' OR '.join(f'code_{i} IN ({broken})' for i in range(n))} THEN '{BLOCKED}'
+                    WHEN {' OR '.join(f'code_{i} = {RISK}' for i in range(n))} THEN '{AT_RISK}'
+                    ELSE '{COMPLIANT}' END AS state,
+               {first(f'IN ({broken})', lambda i: f'{i}')} AS blocking_link,
+               {first(f'= {RISK}', lambda i: f'{i}')} AS risk_link,
+               {', '.join(f'code_{i}' for i in range(n))},
+               {', '.join(f'expiry_{i}' for i in range(n))}
+        FROM links
+    """
+    params = [
+        Document.Status.EXPIRED, today, *risk_params, False, *scope_params,
+        *CHAIN, *CHAIN, False, *scope_params,
+    ]
+    return sql, params
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+def _describe(state, blocking, risk, links):
+    if state == BLOCKED:
+        link = links[blocking]
+        return f"{link['type']} {link['status'].lower()}"
+    if state == AT_RISK:
+        link = links[risk]
+        return f"{link['type']} berakhir {link['expiry_date']:%d-%m-%Y}"
+    return f"Rantai dokumen berlaku s.d. {min(l['expiry_date'] for l in links):%d-%m-%Y}"
+
+
+def worker_states(company_id=None, worker_ids=None, today=None) -> dict:
+    """Return ``{worker_id: state}`` for a company, a list of workers, or everyone.
+
+    Each state is a dict with ``state``, ``label``, ``style``, ``reason``
+    and ``links`` (one entry per chain type with code, status and expiry).
+    """
+    if worker_ids is not None and not worker_ids:
+        return {}
+    today = today or timezone.localdate()
+    sql, params = _states_sql(company_id, worker_ids, today)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    n = len(CHAIN)
+    states = {}
+    for worker_id, state, blocking, risk, *rest in rows:
+        codes, expiries = rest[:n], rest[n:]
+        links = [
+            {'type': doc_type, 'code': code, 'status': LINK_LABELS[code], 'expiry_date': _as_date(expiry)}
+            for doc_type, code, expiry in zip(CHAIN, codes, expiries)
+        ]
+        states[worker_id] = {
+            'state': state,
+            'label': STATE_LABELS[state],
+            'style': STATE_STYLES[state],
+            'reason': _describe(state, blocking, risk, links),
+            'links': links,
+        }
+    return states
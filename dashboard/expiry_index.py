@@ -0,0 +1,350 @@
+"""Memory-mapped columnar index of document expiry dates.
+
+The questions asked on every dashboard view, reminder run and forecast
+("what expires between two dates for company X, type Y, and at which alert
+level?") only need a handful of small columns per document. The index keeps
+them as sorted arrays (expiry ordinal, company id, type code, status code,
+document id) in one file, ``EXPIRY_INDEX_PATH``, which every process on the
+host maps read-only, so gunicorn workers share a single copy through the
+page cache. Date ranges are binary searches over the expiry column, the
+other filters are vectorized masks, and the alert windows of
+``dashboard.alerts`` are applied per row with NumPy.
+
+The file records the ``DataVersion`` counter it was built from (bumped by
+``touch_companies`` on every document change). ``current()`` compares it
+with the database on each call and maps the file only when it is at least
+that new; otherwise it answers from ``SqlExpiry`` and queues one
+``rebuild_expiry_index`` job, so requests never build the index. The job
+(or ``python manage.py rebuild_expiry_index``) rebuilds under a file lock
+and replaces the file atomically, so readers never see a partial index.
+
+``SqlExpiry`` answers the same calls from the database; it is used while
+the index is stale, when ``EXPIRY_INDEX_ENABLED`` is off and by
+``benchmark_expiry_index``.
+"""
+import fcntl
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from . import alerts
+from .models import DataVersion, Document, Job
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'TKAEXPI1'
+ALIGN = 64
+COLUMNS = [('expiry', '<i4'), ('company', '<i4'), ('type', '<i1'), ('status', '<i1'), ('id', '<i8')]
+TYPES = Document.DocumentType.values
+STATUSES = Document.Status.values
+BUILD_CHUNK = 50000
+
+
+def _forecast_weeks(today, days, step):
+    return [(today + timedelta(days=start)).isoformat() for start in range(0, days, step)]
+
+
+class SqlExpiry:
+    """The index API answered by the database."""
+
+    def count(self, status=None, company_id=None, document_type=None, start=None, end=None) -> int:
+        qs = Document.objects.all()
+        if status:
+            qs = qs.filter(status=status)
+        if company_id:
+            qs = qs.filter(company_id=company_id)
+        if document_type:
+            qs = qs.filter(type=document_type)
+        if start:
+            qs = qs.filter(expiry_date__gte=start)
+        if end:
+            qs = qs.filter(expiry_date__lte=end)
+        return qs.count()
+
+    def expiring(self, start, end, company_id=None, document_type=None, status=Document.Status.ACTIVE):
+        qs = Document.objects.filter(expiry_date__gte=start, expiry_date__lte=end)
+        if status:
+            qs = qs.filter(status=status)
+        if company_id:
+            qs = qs.filter(company_id=company_id)
+        if document_type:
+            qs = qs.filter(type=document_type)
+        return list(qs.order_by('expiry_date', 'id').values_list('id', flat=True))
+
+    def with_alert_level(self, queryset, today=None, company_id=None):
+        """Rows of ``queryset`` inside an alert window with ``alert_level`` set (see ``alerts``)."""
+        return alerts.with_alert_level(queryset, today, company_id).iterator(chunk_size=2000)
+
+    def forecast(self, today=None, days=365, company_id=None, document_type=None, step=7) -> dict:
+        """Active documents expiring per ``step``-day bucket from ``today``, per type."""
+        today = today or timezone.localdate()
+        qs = Document.objects.filter(
+            status=Document.Status.ACTIVE, expiry_date__gte=today, expiry_date__lt=today + timedelta(days=days),
+        )
+        if company_id:
+            qs = qs.filter(company_id=company_id)
+        if document_type:
+            qs = qs.filter(type=document_type)
+        weeks = _forecast_weeks(today, days, step)
+        counts = defaultdict(lambda: [0] * len(weeks))
+        for row in qs.values('type', 'expiry_date').annotate(n=Count('id')).order_by():
+            counts[row['type']][(row['expiry_date'] - today).days // step] += row['n']
+        return {'weeks': weeks, 'types': {t: counts[t] for t in TYPES if t in counts}}
+
+
+class ExpiryIndex:
+    """Read-only view over a mapped index file; see the module docstring."""
+
+    def __init__(self, header, columns):
+        self.header = header
+        self.version = header['version']
+        self.database = header['database']
+        for name, _ in COLUMNS:
+            setattr(self, name, columns[name])
+        self.type_codes = {t: i for i, t in enumerate(header['types'])}
+        self.status_codes = {s: i for i, s in enumerate(header['statuses'])}
+
+    def __len__(self):
+        return len(self.id)
+
+    def _range(self, start=None, end=None) -> slice:
+        """Rows with ``start <= expiry <= end``, by binary search on the sorted expiry column."""
+        lo = 0 if start is None else int(np.searchsorted(self.expiry, start.toordinal(), 'left'))
+        hi = len(self) if end is None else int(np.searchsorted(self.expiry, end.toordinal(), 'right'))
+        return slice(lo, max(lo, hi))
+
+    def _mask(self, rows, status=None, company_id=None, document_type=None):
+        mask = np.ones(rows.stop - rows.start, dtype=bool)
+        if status:
+            mask &= self.status[rows] == self.status_codes.get(status, -1)
+        if company_id:
+            mask &= self.company[rows] == company_id
+        if document_type:
+            mask &= self.type[rows] == self.type_codes.get(document_type, -1)
+        return mask
+
+    def count(self, status=None, company_id=None, document_type=None, start=None, end=None) -> int:
+        rows = self._range(start, end)
+        if not (status or company_id or document_type):
+            return rows.stop - rows.start
+        return int(np.count_nonzero(self._mask(rows, status, company_id, document_type)))
+
+    def expiring(self, start, end, company_id=None, document_type=None, status=Document.Status.ACTIVE):
+        """Ids of documents expiring between ``start`` and ``end``, ordered by expiry then id."""
+        rows = self._range(start, end)
+        return self.id[rows][self._mask(rows, status, company_id, document_type)]
+
+    def _alert_window(self, today, company_id, policies=None):
+        """``(end, ids, levels)`` of active documents inside an alert window from ``today`` to ``end``."""
+        overrides, defaults = policies or alerts.load_policies(company_id)
+        horizon = max(days[-1] for days in [*overrides.values(), *defaults.values()])
+        end = today + timedelta(days=horizon)
+        rows = self._range(today, end)
+        mask = self._mask(rows, Document.Status.ACTIVE, company_id)
+        types, companies = self.type[rows], self.company[rows]
+        # Window ends per row: the type's default, then company overrides on top
+        table = np.array([defaults[t] for t in self.header['types']], dtype=np.int32)
+        windows = table[types]
+        for (override_company, doc_type), days in overrides.items():
+            windows[(companies == override_company) & (types == self.type_codes[doc_type])] = days
+        left = self.expiry[rows] - today.toordinal()
+        levels = np.full(len(left), -1, dtype=np.int8)
+        mask &= types >= 0
+        # Broadest window first, so the first matching level of the CASE wins
+        for level in reversed(range(len(alerts.LEVELS))):
+            levels[left <= windows[:, level]] = level
+        mask &= levels >= 0
+        return end, self.id[rows][mask], levels[mask]
+
+    def alert_levels(self, today=None, company_id=None, policies=None):
+        """``(ids, levels)`` of active documents inside an alert window; ``levels`` index ``alerts.LEVELS``."""
+        _, ids, levels = self._alert_window(today or timezone.localdate(), company_id, policies)
+        return ids, levels
+
+    def with_alert_level(self, queryset, today=None, company_id=None):
+        """Rows of ``queryset`` for the index hits, in expiry order, with ``alert_level`` set.
+
+        Model rows get an attribute, ``values()`` rows (which must include
+        ``id``) a key; hits filtered out by ``queryset`` are skipped. The rows
+        come from one query over the alert horizon rather than per-id batches.
+        """
+        today = today or timezone.localdate()
+        end, ids, levels = self._alert_window(today, company_id)
+        if not len(ids):
+            return
+        level_of = dict(zip(ids.tolist(), levels.tolist()))
+        rows = queryset.filter(expiry_date__gte=today, expiry_date__lte=end).order_by('expiry_date', 'id')
+        for row in rows.iterator(chunk_size=2000):
+            level = level_of.get(row['id'] if isinstance(row, dict) else row.pk)
+            if level is None:
+                continue
+            if isinstance(row, dict):
+                row['alert_level'] = alerts.LEVELS[level]
+            else:
+                row.alert_level = alerts.LEVELS[level]
+            yield row
+
+    def forecast(self, today=None, days=365, company_id=None, document_type=None, step=7) -> dict:
+        today = today or timezone.localdate()
+        rows = self._range(today, today + timedelta(days=days - 1))
+        mask = self._mask(rows, Document.Status.ACTIVE, company_id, document_type)
+        weeks = _forecast_weeks(today, days, step)
+        buckets = (self.expiry[rows][mask] - today.toordinal()) // step
+        types = self.type[rows][mask]
+        result = {}
+        for code, doc_type in enumerate(self.header['types']):
+            if document_type and doc_type != document_type:
+                continue
+            selected = types == code
+            if selected.any():
+                result[doc_type] = np.bincount(buckets[selected], minlength=len(weeks)).tolist()
+        return {'weeks': weeks, 'types': result}
+
+
+def _database():
+    return f"{connection.vendor}:{connection.settings_dict['NAME']}"
+
+
+def build(path=None, version=None):
+    """Write a fresh index of ``Document.objects`` to ``path``; returns the number of documents."""
+    path = path or settings.EXPIRY_INDEX_PATH
+    # Read before the documents: a change committed meanwhile leaves the file stale, never wrong
+    version = DataVersion.current() if version is None else version
+    type_codes = {t: i for i, t in enumerate(TYPES)}
+    status_codes = {s: i for i, s in enumerate(STATUSES)}
+    parts = {name: [] for name, _ in COLUMNS}
+    rows = Document.objects.order_by().values_list('expiry_date', 'company_id', 'type', 'status', 'id').iterator(
+        chunk_size=BUILD_CHUNK
+    )
+    while True:
+        chunk = list(islice(rows, BUILD_CHUNK))
+        if not chunk:
+            break
+        expiry, company, doc_type, status, ids = zip(*chunk)
+        parts['expiry'].append(np.fromiter((d.toordinal() for d in expiry), '<i4', len(chunk)))
+        parts['company'].append(np.array(company, '<i4'))
+        parts['type'].append(np.fromiter((type_codes.get(t, -1) for t in doc_type), '<i1', len(chunk)))
+        parts['status'].append(np.fromiter((status_codes.get(s, -1) for s in status), '<i1', len(chunk)))
+        parts['id'].append(np.array(ids, '<i8'))
+    columns = {
+        name: np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype)
+        for name, dtype in COLUMNS
+    }
+    order = np.lexsort((columns['id'], columns['expiry']))
+    header = {
+        'version': version, 'database': _database(), 'built_at': timezone.now().isoformat(),
+        'types': TYPES, 'statuses': STATUSES, 'count': len(order), 'columns': {},
+    }
+    offset = 0
+    for name, dtype in COLUMNS:
+        columns[name] = columns[name][order]
+        header['columns'][name] = [dtype, offset]
+        offset += -(-columns[name].nbytes // ALIGN) * ALIGN
+
+    meta = json.dumps(header).encode()
+    start = -(-(len(MAGIC) + 4 + len(meta)) // ALIGN) * ALIGN
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(MAGIC + struct.pack('<I', len(meta)) + meta)
+            for name, _ in COLUMNS:
+                fh.seek(start + header['columns'][name][1])
+                fh.write(columns[name].tobytes())
+            fh.truncate(start + offset)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(order)
+
+
+def load(path=None):
+    """Map the index file at ``path``; returns ``None`` if it is missing or unreadable."""
+    path = path or settings.EXPIRY_INDEX_PATH
+    try:
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+    except (FileNotFoundError, ValueError):
+        return None
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        return None
+    size = struct.unpack('<I', bytes(data[len(MAGIC):len(MAGIC) + 4]))[0]
+    header = json.loads(bytes(data[len(MAGIC) + 4:len(MAGIC) + 4 + size]))
+    start = -(-(len(MAGIC) + 4 + size) // ALIGN) * ALIGN
+    columns = {}
+    for name, (dtype, offset) in header['columns'].items():
+        columns[name] = np.frombuffer(data, dtype=dtype, count=header['count'], offset=start + offset)
+    return ExpiryIndex(header, columns)
+
+
+_lock = threading.Lock()
+_loaded = None
+_requested = -1
+
+
+def _fresh(index, version):
+    return (
+        # A newer file (built after a later change) is fresh too
+        index is not None and index.header.get('version', -1) >= version and index.database == _database()
+        and index.header['types'] == TYPES and index.header['statuses'] == STATUSES
+    )
+
+
+def rebuild(path=None):
+    """Rebuild the index file unless it already covers the current data; returns the count or ``None``."""
+    path = path or settings.EXPIRY_INDEX_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(f'{path}.lock', 'w') as lock:
+        # One builder at a time, so an older build never replaces a newer file
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        version = DataVersion.current()
+        if _fresh(load(path), version):
+            return None
+        count = build(path, version)
+    logger.info("Expiry index rebuilt: %s documents (version %s)", count, version)
+    return count
+
+
+def _request_rebuild(version):
+    """Queue one rebuild job per stale version and process (another queued job will do too)."""
+    global _requested
+    if _requested >= version:
+        return
+    from .jobs import enqueue
+
+    if not Job.objects.filter(kind='rebuild_expiry_index', status=Job.Status.QUEUED).exists():
+        enqueue('rebuild_expiry_index', max_attempts=1)
+    _requested = version
+
+
+def current():
+    """The mapped index if it covers the current data, else ``SqlExpiry`` (queuing a rebuild)."""
+    global _loaded
+    if not settings.EXPIRY_INDEX_ENABLED:
+        return SqlExpiry()
+    version = DataVersion.current()
+    with _lock:
+        if _fresh(_loaded, version):
+            return _loaded
+        index = load(settings.EXPIRY_INDEX_PATH)
+        if _fresh(index, version):
+            _loaded = index
+            return index
+        _request_rebuild(version)
+    return SqlExpiry()
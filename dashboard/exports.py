@@ -0,0 +1,117 @@
+import csv
+
+from . import compliance
+from .filters import document_facets, filter_queryset, worker_facets, worker_search_q
+from .models import Worker, Document
+
+
+PROGRESS_EVERY = 1000
+ITERATOR_CHUNK_SIZE = 2000
+
+WORKER_HEADER = [
+    'Nama', 'No Paspor', 'Kewarganegaraan', 'Tanggal Lahir', 'Perusahaan', 'Jabatan', 'Tanggal Mulai',
+    'Status Kepatuhan', 'Keterangan Kepatuhan',
+]
+DOCUMENT_HEADER = [
+    'Pekerja', 'Jenis', 'No Dokumen', 'Tanggal Terbit', 'Tanggal Berakhir', 'Status', 'Sisa Hari',
+    'Status Kepatuhan Pekerja',
+]
+
+
+def _write_rows(fileobj, header, rows, total, progress):
+    writer = csv.writer(fileobj)
+    writer.writerow(header)
+    written = 0
+    for written, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if progress and written % PROGRESS_EVERY == 0:
+            progress(written, total)
+    if progress:
+        progress(written, total)
+    return written
+
+
+def _with_compliance(objects, worker_id):
+    """Yield ``(obj, state)``, computing compliance once per ``ITERATOR_CHUNK_SIZE`` objects."""
+    chunk = []
+
+    def flush():
+        states = compliance.worker_states(worker_ids={worker_id(obj) for obj in chunk})
+        for obj in chunk:
+            yield obj, states.get(worker_id(obj))
+
+    for obj in objects:
+        chunk.append(obj)
+        if len(chunk) >= ITERATOR_CHUNK_SIZE:
+            yield from flush()
+            chunk = []
+    if chunk:
+        yield from flush()
+
+
+def worker_export_queryset(company_id=None, filters=None):
+    qs = Worker.objects.select_related('company').order_by('id')
+    if company_id:
+        qs = qs.filter(company_id=company_id)
+    if filters:
+        qs = filter_queryset(qs, worker_facets(), filters, 'next_expiry_date')
+        if filters.get('q'):
+            qs = qs.filter(worker_search_q(filters['q']))
+    return qs
+
+
+def document_export_queryset(company_id=None, filters=None):
+    qs = Document.objects.select_related('worker').order_by('id')
+    if company_id:
+        qs = qs.filter(company_id=company_id)
+    if filters:
+        qs = filter_queryset(qs, document_facets(), filters, 'expiry_date')
+    return qs
+
+
+def write_workers_csv(fileobj, company_id=None, progress=None, filters=None) -> int:
+    """Write the worker export to ``fileobj`` and return the number of rows.
+
+    ``filters`` takes the worker list's query parameters (facets, ``q``).
+    ``progress`` is called as ``progress(done, total)`` every few thousand rows.
+    """
+    qs = worker_export_queryset(company_id, filters)
+    total = qs.count() if progress else 0
+    rows = (
+        [
+            w.name,
+            w.passport_number,
+            w.nationality,
+            w.birth_date,
+            w.company.name if w.company else '',
+            w.position,
+            w.start_date or '',
+            state['label'] if state else '',
+            state['reason'] if state else '',
+        ]
+        for w, state in _with_compliance(qs.iterator(chunk_size=ITERATOR_CHUNK_SIZE), lambda w: w.pk)
+    )
+    return _write_rows(fileobj, WORKER_HEADER, rows, total, progress)
+
+
+def write_documents_csv(fileobj, company_id=None, progress=None, filters=None) -> int:
+    """Write the document export to ``fileobj`` and return the number of rows.
+
+    ``filters`` takes the document list's query parameters.
+    """
+    qs = document_export_queryset(company_id, filters)
+    total = qs.count() if progress else 0
+    rows = (
+        [
+            d.worker.name,
+            d.type,
+            d.document_number,
+            d.issue_date,
+            d.expiry_date,
+            d.status,
+            d.days_until_expiry,
+            state['label'] if state else '',
+        ]
+        for d, state in _with_compliance(qs.iterator(chunk_size=ITERATOR_CHUNK_SIZE), lambda d: d.worker_id)
+    )
+    return _write_rows(fileobj, DOCUMENT_HEADER, rows, total, progress)
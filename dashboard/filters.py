@@ -0,0 +1,188 @@
+"""Faceted filtering for list pages.
+
+Filters from different facets are combined with AND. Each facet also
+reports how many rows every one of its options would return given the
+other active filters. Facets with a fixed set of options are counted
+together in one conditional-aggregate query; open-ended facets (company,
+nationality) use one grouped query each, so the number of queries does
+not depend on how many options exist.
+"""
+import datetime
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Document
+
+
+DATE_FROM_PARAM = 'berakhir_dari'
+DATE_TO_PARAM = 'berakhir_sampai'
+
+
+class Facet:
+    def __init__(self, param, label, field, choices=None, conditions=None, label_field=None, cast=str, limit=50):
+        self.param = param
+        self.label = label
+        self.field = field
+        self.choices = choices
+        self.conditions = conditions
+        self.label_field = label_field or field
+        self.cast = cast
+        self.limit = limit
+
+    @property
+    def is_grouped(self) -> bool:
+        return self.choices is None
+
+    def q(self, value) -> Q:
+        if self.conditions:
+            return self.conditions[value]
+        return Q(**{self.field: value})
+
+    def clean(self, raw):
+        if raw in (None, ''):
+            return None
+        try:
+            value = self.cast(raw)
+        except (TypeError, ValueError):
+            return None
+        if self.choices is not None and value not in dict(self.choices):
+            return None
+        return value
+
+
+def _parse_date(raw):
+    try:
+        return datetime.date.fromisoformat(raw) if raw else None
+    except ValueError:
+        return None
+
+
+def _selection(facets, params, date_field):
+    selected = {facet.param: facet.clean(params.get(facet.param)) for facet in facets}
+    date_from = _parse_date(params.get(DATE_FROM_PARAM))
+    date_to = _parse_date(params.get(DATE_TO_PARAM))
+    range_q = Q()
+    if date_from:
+        range_q &= Q(**{f'{date_field}__gte': date_from})
+    if date_to:
+        range_q &= Q(**{f'{date_field}__lte': date_to})
+    return selected, date_from, date_to, range_q
+
+
+def filter_params(facets, params) -> dict:
+    """The recognised, non-empty filter parameters of ``params`` (e.g. for a job payload)."""
+    keys = [facet.param for facet in facets] + [DATE_FROM_PARAM, DATE_TO_PARAM]
+    return {key: params[key] for key in keys if params.get(key)}
+
+
+def filter_queryset(queryset, facets, params, date_field):
+    """Apply the same filters as ``apply_facets`` without computing facet counts."""
+    selected, _, _, q = _selection(facets, params, date_field)
+    for facet in facets:
+        if selected[facet.param] is not None:
+            q &= facet.q(selected[facet.param])
+    return queryset.filter(q)
+
+
+def worker_search_q(query) -> Q:
+    """Free-text search of the worker list (``?q=``)."""
+    return (
+        Q(name__icontains=query)
+        | Q(passport_number__icontains=query)
+        | Q(company__name__icontains=query)
+        | Q(nationality__icontains=query)
+    )
+
+
+def apply_facets(queryset, facets, params, date_field):
+    """Filter ``queryset`` by ``params`` and compute facet counts.
+
+    Returns ``(filtered_queryset, context)`` where ``context`` holds the
+    facet options with their counts and the parsed expiry range.
+    """
+    selected, date_from, date_to, range_q = _selection(facets, params, date_field)
+
+    def filters_except(excluded=None):
+        q = range_q
+        for facet in facets:
+            value = selected[facet.param]
+            if facet is not excluded and value is not None:
+                q &= facet.q(value)
+        return q
+
+    filtered = queryset.filter(filters_except())
+
+    # All fixed-choice facets in a single conditional-aggregate query
+    aggregates = {}
+    for fi, facet in enumerate(facets):
+        if facet.is_grouped:
+            continue
+        others = filters_except(facet)
+        for vi, (value, _) in enumerate(facet.choices):
+            aggregates[f'f{fi}_{vi}'] = Count('pk', filter=others & facet.q(value))
+    totals = queryset.order_by().aggregate(**aggregates) if aggregates else {}
+
+    context = []
+    for fi, facet in enumerate(facets):
+        value = selected[facet.param]
+        if facet.is_grouped:
+            rows = (
+                queryset.filter(filters_except(facet))
+                .order_by()
+                .values(facet.field, facet.label_field)
+                .annotate(n=Count('pk'))
+                .order_by('-n', facet.label_field)[:facet.limit]
+            )
+            options = [
+                {'value': row[facet.field], 'label': row[facet.label_field], 'count': row['n']}
+                for row in rows
+                if row[facet.field] not in (None, '')
+            ]
+            if value is not None and not any(o['value'] == value for o in options):
+                options.append({'value': value, 'label': value, 'count': 0})
+        else:
+            options = [
+                {'value': choice, 'label': label, 'count': totals[f'f{fi}_{vi}']}
+                for vi, (choice, label) in enumerate(facet.choices)
+            ]
+        for option in options:
+            option['selected'] = option['value'] == value
+        context.append({'param': facet.param, 'label': facet.label, 'options': options})
+
+    return filtered, {
+        'facets': context,
+        'date_from': date_from,
+        'date_to': date_to,
+        'date_from_param': DATE_FROM_PARAM,
+        'date_to_param': DATE_TO_PARAM,
+    }
+
+
+def document_facets():
+    return [
+        Facet('jenis', 'Jenis', 'type', choices=Document.DocumentType.choices),
+        Facet('status', 'Status', 'status', choices=Document.Status.choices),
+        Facet('perusahaan', 'Perusahaan', 'company_id', label_field='company__name', cast=int),
+        Facet('kewarganegaraan', 'Kewarganegaraan', 'worker__nationality'),
+    ]
+
+
+def worker_facets():
+    today = timezone.localdate()
+    status_conditions = {
+        'kedaluwarsa': Q(expired_document_count__gt=0),
+        'segera': Q(next_expiry_date__gte=today, next_expiry_date__lte=today + datetime.timedelta(days=90)),
+        'tidak_lengkap': ~Q(missing_document_types=[]),
+    }
+    status_choices = [
+        ('kedaluwarsa', 'Ada dokumen kedaluwarsa'),
+        ('segera', 'Berakhir ≤ 90 hari'),
+        ('tidak_lengkap', 'Dokumen belum lengkap'),
+    ]
+    return [
+        Facet('jenis', 'Dokumen berakhir terdekat', 'next_expiry_type', choices=Document.DocumentType.choices),
+        Facet('status', 'Status', 'status', choices=status_choices, conditions=status_conditions),
+        Facet('perusahaan', 'Perusahaan', 'company_id', label_field='company__name', cast=int),
+        Facet('kewarganegaraan', 'Kewarganegaraan', 'nationality'),
+    ]
@@ -1,16 +1,54 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
 from .models import Company, Worker, Document, RenewalHistory
 
 
+class AutocompleteSelect(forms.Select):
+    """Select that renders only the chosen option.
+
+    The remaining options are fetched from a JSON endpoint as the user
+    types (see ``static/js/autocomplete.js``), so rendering cost does not
+    depend on the size of the related table.
+    """
+
+    def __init__(self, url_name, attrs=None):
+        attrs = dict(attrs or {})
+        attrs["data-autocomplete-url"] = reverse_lazy(url_name)
+        super().__init__(attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        # A bound invalid form re-renders whatever was submitted; drop values that are not pks
+        pk_field = self.choices.queryset.model._meta.pk
+        selected = []
+        for v in value:
+            if v in (None, ""):
+                continue
+            try:
+                selected.append(pk_field.to_python(v))
+            except ValidationError:
+                pass
+        options = [self.create_option(name, "", "---------", not selected, 0)]
+        if selected:
+            queryset = self.choices.queryset.filter(pk__in=selected)
+            for index, obj in enumerate(queryset, start=1):
+                options.append(self.create_option(name, obj.pk, str(obj), True, index))
+        return [(None, options, 0)]
+
+    class Media:
+        js = ("js/autocomplete.js",)
+
+
 class CompanyForm(forms.ModelForm):
     class Meta:
         model = Company
-        fields = ["name", "industry", "address", "contact_person"]
+        fields = ["name", "industry", "address", "contact_person", "contact_email"]
         widgets = {
             "name": forms.TextInput(attrs={"class": "form-control", "placeholder": "Nama perusahaan"}),
             "industry": forms.TextInput(attrs={"class": "form-control", "placeholder": "Industri"}),
             "address": forms.Textarea(attrs={"class": "form-control", "rows": 3, "placeholder": "Alamat"}),
             "contact_person": forms.TextInput(attrs={"class": "form-control", "placeholder": "Kontak person"}),
+            "contact_email": forms.EmailInput(attrs={"class": "form-control", "placeholder": "Email kontak"}),
         }
 
 
@@ -32,7 +70,7 @@ class WorkerForm(forms.ModelForm):
             "passport_number": forms.TextInput(attrs={"class": "form-control", "placeholder": "Nomor paspor"}),
             "nationality": forms.TextInput(attrs={"class": "form-control", "placeholder": "Kewarganegaraan"}),
             "birth_date": forms.DateInput(attrs={"class": "form-control", "type": "date"}),
-            "company": forms.Select(attrs={"class": "form-select"}),
+            "company": AutocompleteSelect("autocomplete_companies", attrs={"class": "form-select"}),
             "position": forms.TextInput(attrs={"class": "form-control", "placeholder": "Jabatan"}),
             "photo": forms.ClearableFileInput(attrs={"class": "form-control"}),
             "start_date": forms.DateInput(attrs={"class": "form-control", "type": "date"}),
@@ -154,7 +192,7 @@ class WorkerWithDocumentsForm(forms.ModelForm):
             "passport_number": forms.TextInput(attrs={"class": "form-control", "placeholder": "Nomor paspor"}),
             "nationality": forms.TextInput(attrs={"class": "form-control", "placeholder": "Kewarganegaraan"}),
             "birth_date": forms.DateInput(attrs={"class": "form-control", "type": "date"}),
-            "company": forms.Select(attrs={"class": "form-select"}),
+            "company": AutocompleteSelect("autocomplete_companies", attrs={"class": "form-select"}),
             "position": forms.TextInput(attrs={"class": "form-control", "placeholder": "Jabatan"}),
             "photo": forms.ClearableFileInput(attrs={"class": "form-control"}),
             "start_date": forms.DateInput(attrs={"class": "form-control", "type": "date"}),
@@ -173,7 +211,7 @@ class DocumentForm(forms.ModelForm):
             "status",
         ]
         widgets = {
-            "worker": forms.Select(attrs={"class": "form-select"}),
+            "worker": AutocompleteSelect("autocomplete_workers", attrs={"class": "form-select"}),
             "type": forms.Select(attrs={"class": "form-select"}),
             "document_number": forms.TextInput(attrs={"class": "form-control", "placeholder": "Nomor dokumen"}),
             "issue_date": forms.DateInput(attrs={"class": "form-control", "type": "date"}),
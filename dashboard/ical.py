@@ -0,0 +1,145 @@
+"""iCalendar feeds of document expiries and renewal deadlines.
+
+A feed is identified by the secret token of a ``CalendarFeed``. Its
+validators come from ``Company.data_changed_at`` (bumped whenever a
+document or worker of the company changes) plus the current date (the
+ETag includes the day, Last-Modified is at least local midnight), so a
+calendar client polling with ``If-None-Match``/``If-Modified-Since`` gets
+``304`` without the feed being rebuilt. A rebuilt feed is streamed from a
+``values()`` iterator and cached under its ETag.
+"""
+import hashlib
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Company, Document, UserProfile
+
+
+PRODID = '-//TKA Dashboard//Kalender Dokumen//ID'
+FIELDS = ('id', 'type', 'document_number', 'expiry_date', 'worker__name', 'company__name')
+
+
+def feed_companies(feed):
+    """Companies visible through ``feed``, re-checked against the owner's current scope."""
+    user = feed.user
+    if not user.is_active:
+        return Company.objects.none()
+    companies = Company.objects.all()
+    profile = getattr(user, 'profile', None)
+    if profile and profile.role == UserProfile.Role.CLIENT:
+        companies = companies.filter(pk=profile.company_id)
+    if feed.company_id:
+        companies = companies.filter(pk=feed.company_id)
+    return companies
+
+
+def feed_state(feed):
+    """Return ``(etag, last_modified)`` for ``feed`` from one aggregate query."""
+    today = timezone.localdate()
+    changed = feed_companies(feed).aggregate(changed=Max('data_changed_at'))['changed']
+    changed = changed or feed.created_at
+    # Which documents are listed depends on the date and the deadline lead time
+    version = f'{feed.token}:{changed.timestamp()}:{today.isoformat()}:{settings.CALENDAR_RENEWAL_LEAD_DAYS}'
+    # Last-Modified must move with the ETag, so it is never before local midnight
+    midnight = timezone.make_aware(datetime.combine(today, time.min))
+    return hashlib.md5(version.encode()).hexdigest(), max(changed, midnight)
+
+
+def _escape(value) -> str:
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+    )
+
+
+def _fold(line: str) -> str:
+    # RFC 5545 3.1: lines longer than 75 octets continue after CRLF + space
+    raw = line.encode('utf-8')
+    if len(raw) <= 75:
+        return line + '\r\n'
+    parts = []
+    while raw:
+        size = 75 if not parts else 74
+        cut = size
+        while cut and (raw[cut:cut + 1] and (raw[cut] & 0xC0) == 0x80):
+            cut -= 1  # do not split a UTF-8 sequence
+        parts.append(raw[:cut].decode('utf-8'))
+        raw = raw[cut:]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _event(uid, day, summary, description, stamp):
+    return ''.join(_fold(line) for line in (
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{stamp}',
+        f'DTSTART;VALUE=DATE:{day:%Y%m%d}',
+        f'DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}',
+        f'SUMMARY:{_escape(summary)}',
+        f'DESCRIPTION:{_escape(description)}',
+        'TRANSP:TRANSPARENT',
+        'END:VEVENT',
+    ))
+
+
+def generate_feed(feed, changed):
+    """Yield the feed as text chunks, one per document."""
+    today = timezone.localdate()
+    lead = timedelta(days=settings.CALENDAR_RENEWAL_LEAD_DAYS)
+    stamp = changed.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    host = settings.CALENDAR_UID_DOMAIN
+    yield ''.join(_fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(feed)}',
+        'X-PUBLISHED-TTL:PT15M',
+    ))
+    documents = (
+        Document.objects.filter(
+            company__in=feed_companies(feed),
+            status=Document.Status.ACTIVE,
+            expiry_date__gte=today - timedelta(days=settings.CALENDAR_PAST_DAYS),
+        )
+        .order_by('expiry_date', 'id')
+        .values_list(*FIELDS)
+    )
+    for pk, doc_type, number, expiry, worker, company in documents.iterator(chunk_size=2000):
+        description = f'{worker} ({company}) - {doc_type} {number}'
+        chunk = _event(f'doc-{pk}-expiry@{host}', expiry, f'{doc_type} berakhir: {worker}', description, stamp)
+        if lead:
+            chunk += _event(
+                f'doc-{pk}-renewal@{host}', expiry - lead,
+                f'Batas pengajuan perpanjangan {doc_type}: {worker}', description, stamp,
+            )
+        yield chunk
+    yield 'END:VCALENDAR\r\n'
+
+
+def cached_feed(feed, etag, changed):
+    """Return the cached feed body, or a generator that streams and caches it."""
+    key = f'calendar-feed:{etag}'
+    body = cache.get(key)
+    if body is not None:
+        return [body]
+
+    def stream():
+        parts = []
+        size = 0
+        for chunk in generate_feed(feed, changed):
+            data = chunk.encode('utf-8')
+            size += len(data)
+            if parts is not None:
+                parts.append(data)
+                if size > settings.CALENDAR_CACHE_MAX_BYTES:
+                    parts = None  # too large to cache, keep streaming only
+            yield data
+        if parts is not None:
+            cache.set(key, b''.join(parts), settings.CALENDAR_CACHE_SECONDS)
+
+    return stream()
@@ -0,0 +1,428 @@
+"""Database-backed background job queue.
+
+Jobs are rows in ``Job``; ``python manage.py run_jobs`` claims them with
+``SELECT ... FOR UPDATE SKIP LOCKED`` so several workers can share the
+queue without an extra service. Handlers are registered per ``Job.kind``
+with ``@job_handler`` and receive the claimed ``Job``.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from .models import (
+    Company, Worker, Document, RenewalHistory, ArchivedDocument, ArchivedRenewalHistory, Job, touch_companies,
+    Attachment, StoredFile, UploadSession, refresh_due_worker_summaries, DocumentSnapshot, WebhookDelivery,
+)
+from . import expiry_index, exports, metrics, snapshots, uploads
+
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def job_handler(kind):
+    """Register ``func(job)`` as the handler for jobs of ``kind``."""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, user=None, max_attempts=3, fingerprint='') -> Job:
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        created_by=user if user and user.is_authenticated else None,
+        max_attempts=max_attempts,
+        fingerprint=fingerprint,
+    )
+
+
+def claim_next(worker_name: str):
+    """Atomically move the next due job to RUNNING and return it, or ``None``."""
+    while True:
+        now = timezone.now()
+        with transaction.atomic():
+            due = Job.objects.select_for_update(skip_locked=True).filter(
+                status=Job.Status.QUEUED, run_after__lte=now,
+            ).order_by('run_after', 'id')
+            job = due.first()
+            if job is None:
+                return None
+            # Exports wait in the queue while EXPORT_MAX_RUNNING of them already hit the database
+            if job.kind in EXPORT_KINDS:
+                _lock_export_claims()
+                running_exports = Job.objects.filter(kind__in=EXPORT_KINDS, status=Job.Status.RUNNING).count()
+                if running_exports >= settings.EXPORT_MAX_RUNNING:
+                    job = due.exclude(kind__in=EXPORT_KINDS).first()
+                    if job is None:
+                        return None
+            # The status guard keeps claims exclusive on backends without row locks (SQLite)
+            claimed = Job.objects.filter(pk=job.pk, status=Job.Status.QUEUED).update(
+                status=Job.Status.RUNNING,
+                attempts=F('attempts') + 1,
+                started_at=now,
+                locked_by=worker_name[:100],
+                error='',
+            )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def _lock_export_claims():
+    """Serialize export claims so the running-export count cannot change under us.
+
+    PostgreSQL takes a transaction-scoped advisory lock. The tuned SQLite
+    backend already starts ``atomic()`` with ``BEGIN IMMEDIATE``, which holds
+    the database write lock for the whole claim.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [EXPORT_CLAIM_LOCK_ID])
+
+
+def requeue_stale(stale_after_seconds=None) -> int:
+    """Return jobs left RUNNING by a crashed worker to the queue."""
+    stale_after_seconds = stale_after_seconds or settings.JOB_STALE_AFTER_SECONDS
+    cutoff = timezone.now() - timedelta(seconds=stale_after_seconds)
+    return Job.objects.filter(status=Job.Status.RUNNING, started_at__lt=cutoff).update(
+        status=Job.Status.QUEUED, locked_by=''
+    )
+
+
+# Export admission control
+#
+# Exports are expensive full scans. Before one is queued, an identical
+# request (same kind, scope and filters) from the same user that is still
+# queued or running is returned instead, and a finished identical export
+# whose data has not changed since it started is reused. New exports are
+# refused with ``ExportThrottled`` above the per-user and global limits,
+# and ``claim_next`` caps how many run at once.
+
+EXPORT_KINDS = ('export_workers_csv', 'export_documents_csv')
+# Arbitrary key of the PostgreSQL advisory lock held while an export is claimed
+EXPORT_CLAIM_LOCK_ID = 0x746b6145
+ACTIVE_STATUSES = (Job.Status.QUEUED, Job.Status.RUNNING)
+
+
+class ExportThrottled(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def job_fingerprint(kind, payload) -> str:
+    return hashlib.sha256(json.dumps([kind, payload], sort_keys=True).encode()).hexdigest()
+
+
+def data_watermark(company_id=None):
+    """Latest data change visible to an export of ``company_id`` (or of every company)."""
+    companies = Company.all_objects.all()
+    if company_id:
+        companies = companies.filter(pk=company_id)
+    marks = [companies.aggregate(m=Max('data_changed_at'))['m']]
+    if not company_id:
+        # Deleted companies no longer carry a watermark
+        marks.append(
+            Job.objects.filter(kind='delete_company', status=Job.Status.DONE).aggregate(m=Max('finished_at'))['m']
+        )
+    return max((m for m in marks if m), default=None)
+
+
+def _reusable_export(fingerprint, company_id):
+    candidate = (
+        Job.objects.filter(fingerprint=fingerprint, status=Job.Status.DONE)
+        .exclude(result_file='')
+        .order_by('-started_at')
+        .first()
+    )
+    if candidate is None or candidate.started_at is None:
+        return None
+    # Compliance states and "days left" columns depend on the date
+    if timezone.localdate(candidate.started_at) != timezone.localdate():
+        return None
+    watermark = data_watermark(company_id)
+    if watermark and candidate.started_at <= watermark:
+        return None
+    if not default_storage.exists(candidate.result_file.name):
+        return None
+    return candidate
+
+
+def request_export(kind, payload, user):
+    """Return ``(job, reused)`` for an export request, or raise ``ExportThrottled``."""
+    fingerprint = job_fingerprint(kind, payload)
+    with transaction.atomic():
+        in_flight = Job.objects.filter(fingerprint=fingerprint, status__in=ACTIVE_STATUSES, created_by=user).first()
+        if in_flight:
+            return in_flight, True
+
+        done = _reusable_export(fingerprint, payload.get('company_id'))
+        if done:
+            if done.created_by_id == user.pk:
+                return done, True
+            # Another user's result: give this user their own finished job pointing at the same file
+            now = timezone.now()
+            copy = Job.objects.create(
+                kind=kind, payload=payload, fingerprint=fingerprint, created_by=user,
+                status=Job.Status.DONE, started_at=done.started_at, finished_at=now,
+                result_file=done.result_file.name, message=f"{done.message} (hasil ekspor #{done.pk})",
+            )
+            return copy, True
+
+        active = Job.objects.filter(kind__in=EXPORT_KINDS, status__in=ACTIVE_STATUSES)
+        if active.filter(created_by=user).count() >= settings.EXPORT_MAX_PER_USER:
+            raise ExportThrottled(
+                "Masih ada ekspor Anda yang sedang diproses. Tunggu hingga selesai.",
+                settings.EXPORT_RETRY_AFTER_SECONDS,
+            )
+        if active.count() >= settings.EXPORT_MAX_PENDING:
+            raise ExportThrottled(
+                "Antrean ekspor sedang penuh. Coba lagi sebentar lagi.",
+                settings.EXPORT_RETRY_AFTER_SECONDS,
+            )
+        return enqueue(kind, payload, user=user, fingerprint=fingerprint), False
+
+
+def run_job(job: Job) -> None:
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"Unknown job kind: {job.kind}")
+        handler(job)
+    except Exception:
+        logger.exception("Job %s failed (attempt %s/%s)", job.pk, job.attempts, job.max_attempts)
+        job.error = traceback.format_exc()
+        job.locked_by = ''
+        retry = job.attempts < job.max_attempts
+        metrics.JOB_RESULTS.labels(job.kind, 'retry' if retry else 'failed').inc()
+        if retry:
+            backoff = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** max(job.attempts - 1, 0)
+            job.status = Job.Status.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=backoff)
+        else:
+            job.status = Job.Status.FAILED
+            job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'run_after', 'finished_at', 'locked_by'])
+    else:
+        metrics.JOB_RESULTS.labels(job.kind, 'done').inc()
+        job.status = Job.Status.DONE
+        job.finished_at = timezone.now()
+        job.locked_by = ''
+        job.save(update_fields=['status', 'finished_at', 'locked_by', 'result_file', 'message'])
+
+
+def _save_result(job, filename, write):
+    """Run ``write(fileobj)`` against a temp file and attach it as the job result."""
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1])
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as fh:
+            result = write(fh)
+        with open(path, 'rb') as fh:
+            # A random directory keeps result URLs unguessable
+            job.result_file.save(f"{uuid.uuid4().hex}/{filename}", File(fh), save=False)
+        return result
+    finally:
+        os.unlink(path)
+
+
+# Handlers
+
+def _export(job, filename, write):
+    start = time.perf_counter()
+    rows = _save_result(
+        job, filename,
+        lambda fh: write(fh, job.payload.get('company_id'), job.report_progress, job.payload.get('filters')),
+    )
+    metrics.EXPORT_DURATION.labels(job.kind).observe(time.perf_counter() - start)
+    metrics.EXPORT_SIZE.labels(job.kind).observe(job.result_file.size)
+    metrics.EXPORT_ROWS.labels(job.kind).inc(rows)
+    return rows
+
+
+@job_handler('export_workers_csv')
+def export_workers_csv(job):
+    rows = _export(job, 'workers.csv', exports.write_workers_csv)
+    job.message = f"{rows} pekerja diekspor"
+
+
+@job_handler('export_documents_csv')
+def export_documents_csv(job):
+    rows = _export(job, 'documents.csv', exports.write_documents_csv)
+    job.message = f"{rows} dokumen diekspor"
+
+
+@job_handler('send_document_reminders')
+def send_document_reminders(job):
+    output = io.StringIO()
+    call_command('send_document_reminders', stdout=output)
+    _save_result(job, 'reminders.txt', lambda fh: fh.write(output.getvalue()))
+    job.message = "Reminder dokumen selesai"
+
+
+@job_handler('snapshot_documents')
+def snapshot_documents(job):
+    summary = snapshots.take_snapshot()
+    job.message = f"Snapshot {summary['date']}: {summary['rows']} baris, {summary['recounted']} perusahaan dihitung ulang"
+
+
+@job_handler('refresh_worker_summaries')
+def refresh_worker_summaries(job):
+    updated = refresh_due_worker_summaries()
+    job.message = f"Ringkasan {updated} pekerja diperbarui"
+
+
+@job_handler('rebuild_expiry_index')
+def rebuild_expiry_index(job):
+    count = expiry_index.rebuild()
+    job.message = "Indeks sudah terbaru" if count is None else f"Indeks dibangun ulang: {count} dokumen"
+
+
+@job_handler('attachment_preview')
+def attachment_preview(job):
+    stored = StoredFile.objects.get(pk=job.payload['stored_file_id'])
+    uploads.render_preview(stored)
+    job.message = f"Pratinjau {stored.get_preview_status_display().lower()}"
+
+
+# Background cascade deletes
+#
+# Deleting a large company through the ORM collector loads every related
+# row and removes them in one long transaction. Instead the parent is
+# flagged ``pending_deletion`` (which the default managers hide) and the
+# children are removed here bottom-up in bounded chunks with raw DELETEs,
+# each chunk in its own short transaction.
+
+def _raw_delete(queryset) -> int:
+    # Plain DELETE ... WHERE, without the collector or delete signals
+    return queryset._raw_delete(queryset.db)
+
+
+def _raw_delete_in_chunks(queryset) -> int:
+    """Raw-delete ``queryset`` in ``DELETE_CHUNK_SIZE`` batches, one transaction each."""
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.order_by().values_list('pk', flat=True)[:settings.DELETE_CHUNK_SIZE])
+            if not ids:
+                return deleted
+            deleted += _raw_delete(queryset.model._base_manager.filter(pk__in=ids))
+
+
+# Document tables and their renewal tables, emptied before the workers
+DOCUMENT_TABLES = [(Document, RenewalHistory), (ArchivedDocument, ArchivedRenewalHistory)]
+
+
+def _delete_chunked(document_filter, workers, job, total):
+    """Delete documents matching ``document_filter`` (with renewals), then ``workers`` and their photos."""
+    chunk_size = settings.DELETE_CHUNK_SIZE
+    done = 0
+    for document_model, renewal_model in DOCUMENT_TABLES:
+        documents = document_model._base_manager.filter(**document_filter)
+        while True:
+            with transaction.atomic():
+                doc_ids = list(documents.order_by().values_list('pk', flat=True)[:chunk_size])
+                if not doc_ids:
+                    break
+                # Attachments reference documents and renewals without a DB constraint
+                # (they follow archived ids), so they are removed explicitly;
+                # unused stored files are left to `purge_uploads`
+                renewal_ids = list(renewal_model._base_manager.filter(document_id__in=doc_ids).values_list('pk', flat=True))
+                target = Q(document_id__in=doc_ids) | Q(renewal_id__in=renewal_ids)
+                _raw_delete(UploadSession.objects.filter(target))
+                _raw_delete(Attachment.objects.filter(target))
+                _raw_delete(renewal_model._base_manager.filter(document_id__in=doc_ids))
+                _raw_delete(document_model._base_manager.filter(pk__in=doc_ids))
+    while True:
+        with transaction.atomic():
+            rows = list(workers.order_by().values_list('pk', 'photo')[:chunk_size])
+            if not rows:
+                break
+            _raw_delete(Worker.all_objects.filter(pk__in=[pk for pk, _ in rows]))
+            photos = [photo for _, photo in rows if photo]
+            transaction.on_commit(lambda photos=photos: _delete_files(photos))
+        done += len(rows)
+        job.report_progress(done, total, f"{done} pekerja dihapus")
+    return done
+
+
+def _delete_files(names):
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except OSError:
+            logger.warning("Could not delete file %s", name, exc_info=True)
+
+
+def schedule_company_deletion(company, user=None) -> Job:
+    """Hide ``company`` and its workers now and delete them in the background."""
+    with transaction.atomic():
+        Company.all_objects.filter(pk=company.pk).update(pending_deletion=True)
+        Worker.all_objects.filter(company_id=company.pk).update(pending_deletion=True)
+        Document.all_objects.filter(company_id=company.pk).update(pending_deletion=True)
+        # Its documents drop out of caches and the expiry index now
+        touch_companies([company.pk])
+        return enqueue('delete_company', {'company_id': company.pk}, user=user)
+
+
+def schedule_worker_deletion(worker, user=None) -> Job:
+    """Hide ``worker`` now and delete it with its documents in the background."""
+    with transaction.atomic():
+        Worker.all_objects.filter(pk=worker.pk).update(pending_deletion=True)
+        Document.all_objects.filter(worker_id=worker.pk).update(pending_deletion=True)
+        # Its documents disappear from counts and feeds right away
+        touch_companies([worker.company_id])
+        return enqueue('delete_worker', {'worker_id': worker.pk}, user=user)
+
+
+@job_handler('delete_company')
+def delete_company(job):
+    company_id = job.payload['company_id']
+    # Workers moved into the company after it was flagged are hidden too
+    Worker.all_objects.filter(company_id=company_id, pending_deletion=False).update(pending_deletion=True)
+    if Document.all_objects.filter(company_id=company_id, pending_deletion=False).update(pending_deletion=True):
+        touch_companies([company_id])
+    total = Worker.all_objects.filter(company_id=company_id).count()
+    deleted = _delete_chunked(
+        {'company_id': company_id},
+        Worker.all_objects.filter(company_id=company_id),
+        job, total,
+    )
+    # Webhook outboxes and daily snapshots grow without bound; empty them in chunks too
+    _raw_delete_in_chunks(WebhookDelivery.objects.filter(endpoint__company_id=company_id))
+    _raw_delete_in_chunks(DocumentSnapshot.objects.filter(company_id=company_id))
+    # Only endpoints, feeds and policies remain, so the regular collector is cheap here
+    Company.all_objects.filter(pk=company_id).delete()
+    job.message = f"Perusahaan dihapus ({deleted} pekerja)"
+
+
+@job_handler('delete_worker')
+def delete_worker(job):
+    worker_id = job.payload['worker_id']
+    company_id = Worker.all_objects.filter(pk=worker_id).values_list('company_id', flat=True).first()
+    _delete_chunked(
+        {'worker_id': worker_id},
+        Worker.all_objects.filter(pk=worker_id),
+        job, 1,
+    )
+    touch_companies([company_id])
+    job.message = "Pekerja dihapus"
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import archive
+from dashboard.models import ArchivedDocument
+
+
+class Command(BaseCommand):
+    help = 'Pindahkan dokumen yang sudah lama kedaluwarsa (beserta riwayat perpanjangan selesai) ke tabel arsip, atau pulihkan dengan --restore'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help='Arsipkan dokumen yang berakhir lebih dari N hari lalu (default ARCHIVE_RETENTION_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--dry-run', action='store_true', help='Hanya hitung dokumen yang akan dipindahkan')
+        parser.add_argument('--restore', action='store_true', help='Pulihkan dokumen dari arsip')
+        parser.add_argument('--worker', type=int, help='Batasi ke satu pekerja (id)')
+        parser.add_argument('--company', type=int, help='Batasi ke satu perusahaan (id)')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            if not (options['worker'] or options['company']):
+                raise CommandError('--restore membutuhkan --worker atau --company')
+            qs = ArchivedDocument.objects.all()
+            verb = 'dipulihkan'
+        else:
+            qs = archive.archivable_documents(options['retention_days'])
+            verb = 'diarsipkan'
+        if options['worker']:
+            qs = qs.filter(worker_id=options['worker'])
+        if options['company']:
+            qs = qs.filter(company_id=options['company'])
+
+        if options['dry_run']:
+            self.stdout.write(f"{qs.count()} dokumen akan {verb}")
+            return
+
+        def progress(done):
+            self.stdout.write(f"{done} dokumen {verb}...")
+
+        run = archive.restore_documents if options['restore'] else archive.archive_documents
+        moved = run(qs, batch_size=options['batch_size'], progress=progress if options['verbosity'] > 1 else None)
+        self.stdout.write(self.style.SUCCESS(f"{moved} dokumen {verb}"))
@@ -0,0 +1,95 @@
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from dashboard import alerts, expiry_index, queryplans
+from dashboard.models import Company, Document
+
+
+def _timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times) * 1000
+
+
+class Command(BaseCommand):
+    help = 'Bandingkan query tanggal berakhir (hitungan, jendela peringatan, prakiraan) lewat SQL dan lewat indeks expiry'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=20000, help='Jumlah pekerja pada dataset uji (default 20000)')
+        parser.add_argument('--repeat', type=int, default=20, help='Ulangan per query; dilaporkan median')
+        parser.add_argument('--current-db', action='store_true',
+                            help='Pakai data database sekarang alih-alih database uji berisi data contoh')
+
+    def handle(self, *args, **options):
+        if options['current_db']:
+            if not Document.objects.exists():
+                raise CommandError('Database kosong; jalankan tanpa --current-db')
+            self._run(options['repeat'])
+            return
+        # Seed a throwaway test database so production data is never touched
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"Mengisi {options['workers']} pekerja...")
+            queryplans.seed_dataset(options['workers'])
+            self._run(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _run(self, repeat):
+        today = timezone.localdate()
+        company_id = Company.objects.order_by('pk').values_list('pk', flat=True).first()
+        sql = expiry_index.SqlExpiry()
+        with tempfile.TemporaryDirectory(prefix='tka-expiry-index-') as tmp:
+            path = Path(tmp) / 'expiry_index.bin'
+            count, build_ms = _timed(lambda: expiry_index.build(path), 1)
+            index = expiry_index.load(path)
+            self.stdout.write(
+                f'Indeks: {count} dokumen, {path.stat().st_size / 1024:.0f} KB, dibangun dalam {build_ms:.0f} ms'
+            )
+            cases = [
+                ('total_per_status', lambda b: [b.count(status=s) for s in Document.Status.values]),
+                ('berakhir_90h_perusahaan_jenis', lambda b: b.count(
+                    Document.Status.ACTIVE, company_id, Document.DocumentType.KITAS, today, today + timedelta(days=90),
+                )),
+                ('berakhir_30h_perusahaan_id', lambda b: list(b.expiring(today, today + timedelta(days=30), company_id))),
+                ('jendela_peringatan', lambda b: self._alerts(b, today)),
+                ('jendela_peringatan_perusahaan', lambda b: self._alerts(b, today, company_id)),
+                ('prakiraan_1_tahun', lambda b: b.forecast(today, 365)),
+                ('prakiraan_1_tahun_perusahaan', lambda b: b.forecast(today, 365, company_id)),
+            ]
+            self.stdout.write(f"{'query':<32} {'SQL ms':>9} {'indeks ms':>10} {'x':>7}  hasil")
+            for name, run in cases:
+                expected, sql_ms = _timed(lambda: run(sql), repeat)
+                result, index_ms = _timed(lambda: run(index), repeat)
+                same = 'sama' if result == expected else 'BERBEDA'
+                self.stdout.write(f'{name:<32} {sql_ms:>9.2f} {index_ms:>10.3f} {sql_ms / max(index_ms, 1e-6):>7.0f}  {same}')
+
+            # Cost paid by every caller to confirm the index is fresh
+            original = settings.EXPIRY_INDEX_PATH
+            settings.EXPIRY_INDEX_PATH = path
+            try:
+                expiry_index.current()
+                _, check_ms = _timed(expiry_index.current, repeat)
+            finally:
+                settings.EXPIRY_INDEX_PATH = original
+            self.stdout.write(f'Cek versi data per panggilan current(): {check_ms:.2f} ms')
+
+    def _alerts(self, backend, today, company_id=None):
+        if isinstance(backend, expiry_index.ExpiryIndex):
+            ids, levels = backend.alert_levels(today, company_id)
+            return sorted(zip(ids.tolist(), [alerts.LEVELS[level] for level in levels.tolist()]))
+        documents = Document.objects.filter(company_id=company_id) if company_id else Document.objects.all()
+        qs = alerts.with_alert_level(documents, today, company_id)
+        return sorted(qs.values_list('id', 'alert_level'))
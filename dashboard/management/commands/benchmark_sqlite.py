@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction, OperationalError
+from django.db.utils import load_backend
+
+
+BACKENDS = {
+    'default': 'django.db.backends.sqlite3',
+    'tuned': 'dashboard.sqlite',
+}
+ALIAS = 'benchmark'
+BASE_DATE = date(2024, 1, 1)
+
+
+def _seed(path, rows):
+    """Create a scratch database shaped like the document/renewal tables."""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE document (
+            id INTEGER PRIMARY KEY, worker_id INTEGER NOT NULL, type TEXT NOT NULL,
+            expiry_date TEXT NOT NULL, status TEXT NOT NULL
+        );
+        CREATE INDEX document_expiry ON document (status, expiry_date);
+        CREATE TABLE renewal (
+            id INTEGER PRIMARY KEY, document_id INTEGER NOT NULL,
+            submission_date TEXT NOT NULL, new_expiry_date TEXT NOT NULL
+        );
+        CREATE INDEX renewal_document ON renewal (document_id);
+    """)
+    rng = random.Random(0)
+    conn.executemany(
+        "INSERT INTO document (worker_id, type, expiry_date, status) VALUES (?, ?, ?, 'ACTIVE')",
+        (
+            (i // 6, ('RPTKA', 'IMTA', 'VISA', 'KITAS', 'SKTT', 'PASSPORT')[i % 6],
+             (BASE_DATE + timedelta(days=rng.randrange(1500))).isoformat())
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _worker(engine, path, rows, seconds, write_ratio, seed, results):
+    settings_dict = dict(connections['default'].settings_dict, ENGINE=engine, NAME=path)
+    connections[ALIAS] = load_backend(engine).DatabaseWrapper(settings_dict, ALIAS)
+    rng = random.Random(seed)
+    reads = writes = errors = 0
+    latencies = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            if rng.random() < write_ratio:
+                # Read-then-write, like a renewal: look the document up, extend it, log it
+                with transaction.atomic(using=ALIAS), connections[ALIAS].cursor() as cursor:
+                    doc_id = rng.randrange(1, rows + 1)
+                    cursor.execute("SELECT expiry_date FROM document WHERE id = %s", [doc_id])
+                    new_expiry = (date.fromisoformat(cursor.fetchone()[0]) + timedelta(days=365)).isoformat()
+                    cursor.execute("UPDATE document SET expiry_date = %s WHERE id = %s", [new_expiry, doc_id])
+                    cursor.execute(
+                        "INSERT INTO renewal (document_id, submission_date, new_expiry_date) VALUES (%s, %s, %s)",
+                        [doc_id, BASE_DATE.isoformat(), new_expiry],
+                    )
+                writes += 1
+            else:
+                # Dashboard-style read: count and first page of documents expiring in a window
+                low = BASE_DATE + timedelta(days=rng.randrange(1400))
+                high = (low + timedelta(days=90)).isoformat()
+                with connections[ALIAS].cursor() as cursor:
+                    cursor.execute(
+                        "SELECT COUNT(*) FROM document WHERE status = 'ACTIVE' AND expiry_date BETWEEN %s AND %s",
+                        [low.isoformat(), high],
+                    )
+                    cursor.fetchone()
+                    cursor.execute(
+                        "SELECT id, worker_id, type, expiry_date FROM document "
+                        "WHERE status = 'ACTIVE' AND expiry_date BETWEEN %s AND %s ORDER BY expiry_date LIMIT 20",
+                        [low.isoformat(), high],
+                    )
+                    cursor.fetchall()
+                reads += 1
+        except OperationalError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    connections[ALIAS].close()
+    results.put((reads, writes, errors, latencies))
+
+
+class Command(BaseCommand):
+    help = 'Ukur throughput baca/tulis SQLite bawaan vs mode tuned (WAL, busy_timeout, BEGIN IMMEDIATE) dengan beberapa proses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', default=[3, 8], help='Jumlah proses (default 3 8)')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Durasi per skenario')
+        parser.add_argument('--rows', type=int, default=50000, help='Jumlah dokumen di database uji')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Porsi operasi tulis (0-1)')
+        parser.add_argument('--mode', choices=['default', 'tuned', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            self.stderr.write('Catatan: database utama bukan SQLite; benchmark tetap memakai file SQLite sementara.')
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('Benchmark membutuhkan multiprocessing "fork"')
+        modes = ['default', 'tuned'] if options['mode'] == 'both' else [options['mode']]
+        ctx = multiprocessing.get_context('fork')
+        # Forked children must not share the parent's sqlite handles
+        connections.close_all()
+
+        self.stdout.write(f"{'mode':<8} {'proses':>6} {'baca/s':>9} {'tulis/s':>9} {'gagal':>6} {'p95 ms':>8}")
+        with tempfile.TemporaryDirectory(prefix='tka-sqlite-bench-') as tmp:
+            for mode in modes:
+                for workers in options['workers']:
+                    path = os.path.join(tmp, f'{mode}-{workers}.sqlite3')
+                    _seed(path, options['rows'])
+                    results = ctx.Queue()
+                    procs = [
+                        ctx.Process(target=_worker, args=(
+                            BACKENDS[mode], path, options['rows'], options['seconds'],
+                            options['write_ratio'], seed, results,
+                        ))
+                        for seed in range(workers)
+                    ]
+                    for proc in procs:
+                        proc.start()
+                    collected = [results.get() for _ in procs]
+                    for proc in procs:
+                        proc.join()
+                    reads = sum(r[0] for r in collected)
+                    writes = sum(r[1] for r in collected)
+                    errors = sum(r[2] for r in collected)
+                    latencies = sorted(l for r in collected for l in r[3])
+                    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+                    self.stdout.write(
+                        f"{mode:<8} {workers:>6} {reads / options['seconds']:>9.0f} "
+                        f"{writes / options['seconds']:>9.0f} {errors:>6} {p95:>8.1f}"
+                    )
+        if settings.DATABASES['default']['ENGINE'] != BACKENDS['tuned'] and connections['default'].vendor == 'sqlite':
+            self.stdout.write('Mode tuned aktif bila SQLITE_TUNED=True (default).')
@@ -0,0 +1,85 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from dashboard import queryplans
+from dashboard.models import Company
+
+
+class Command(BaseCommand):
+    help = (
+        'Jalankan EXPLAIN untuk query utama (dashboard, daftar, pencarian, export, pengingat) '
+        'dan bandingkan dengan baseline rencana query yang di-commit'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--update-baseline', action='store_true', help='Tulis ulang baseline dari hasil sekarang')
+        parser.add_argument('--baseline', help='Path file baseline (default dashboard/query_plans/<vendor>.json)')
+        parser.add_argument('--workers', type=int, default=3000, help='Jumlah pekerja pada dataset uji (default 3000)')
+        parser.add_argument('--cost-threshold', type=float, default=0.5,
+                            help='Kenaikan biaya (PostgreSQL) yang dianggap regresi, 0.5 = +50%%')
+        parser.add_argument('--current-db', action='store_true',
+                            help='Pakai data database sekarang alih-alih database uji berisi data contoh')
+        parser.add_argument('--query', nargs='+', help='Hanya periksa query ini')
+
+    def handle(self, *args, **options):
+        path = Path(options['baseline']) if options['baseline'] else queryplans.baseline_path()
+        if options['current_db']:
+            company = Company.objects.order_by('pk').first()
+            if company is None:
+                raise CommandError('Database kosong; jalankan tanpa --current-db')
+            plans = self._capture(company.pk, options['query'])
+        else:
+            # Seed a throwaway test database so production data is never touched
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                queryplans.seed_dataset(options['workers'])
+                plans = self._capture(Company.objects.order_by('name').first().pk, options['query'])
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['update_baseline']:
+            if options['query'] and path.exists():
+                plans = {**queryplans.load_baseline(path)['queries'], **plans}
+            meta = {'vendor': connection.vendor, 'workers': None if options['current_db'] else options['workers']}
+            queryplans.write_baseline(path, plans, meta)
+            self.stdout.write(self.style.SUCCESS(f'Baseline {len(plans)} query ditulis ke {path}'))
+            return
+
+        if not path.exists():
+            raise CommandError(f'Baseline {path} belum ada; jalankan dengan --update-baseline')
+        baseline = queryplans.load_baseline(path)
+        if baseline['meta'].get('workers') != (None if options['current_db'] else options['workers']):
+            self.stderr.write('Catatan: ukuran dataset berbeda dari baseline; biaya bisa tidak sebanding.')
+        failed = 0
+        for name, current in plans.items():
+            if name not in baseline['queries']:
+                self.stdout.write(self.style.WARNING(f'BARU     {name}: belum ada di baseline'))
+                continue
+            regressions, changes = queryplans.compare(baseline['queries'][name], current, options['cost_threshold'])
+            if regressions:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"REGRESI  {name}: {'; '.join(regressions)}"))
+            elif changes:
+                self.stdout.write(self.style.WARNING(f"BERUBAH  {name}: {'; '.join(changes)}"))
+            else:
+                self.stdout.write(f'OK       {name}')
+            if regressions or changes or options['verbosity'] > 1:
+                for line in current['plan']:
+                    self.stdout.write(f'           {line}')
+        for name in sorted(set(baseline['queries']) - set(plans)):
+            if not options['query']:
+                self.stdout.write(self.style.WARNING(f'HILANG   {name}: ada di baseline, tidak dijalankan'))
+        if failed:
+            raise CommandError(f'{failed} query mengalami regresi rencana eksekusi')
+
+    def _capture(self, company_id, names):
+        queries = queryplans.canonical_queries(company_id)
+        if names:
+            unknown = set(names) - set(queries)
+            if unknown:
+                raise CommandError(f"Query tidak dikenal: {', '.join(sorted(unknown))}")
+            queries = {name: queries[name] for name in names}
+        return queryplans.capture(queries)
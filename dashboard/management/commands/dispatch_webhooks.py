@@ -0,0 +1,49 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from dashboard import webhooks
+
+
+class Command(BaseCommand):
+    help = 'Kirim event webhook dari outbox (bertanda tangan HMAC, dengan retry dan batas kirim per endpoint)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Kirim semua yang sudah jatuh tempo lalu berhenti')
+        parser.add_argument('--scan', action='store_true',
+                            help='Antrekan event kedaluwarsa/masa peringatan sebelum mengirim (dan berkala saat berjalan terus)')
+        parser.add_argument('--scan-interval', type=float, default=3600, help='Jeda antar-scan (detik) tanpa --once')
+        parser.add_argument('--batch', type=int, default=None, help='Jumlah pengiriman per batch')
+        parser.add_argument('--concurrency', type=int, default=None, help='Koneksi HTTP bersamaan')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Jeda polling (detik) saat outbox kosong')
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        limiter = webhooks.RateLimiter()
+        totals = {'delivered': 0, 'retry': 0, 'failed': 0}
+        last_scan = None
+        while not self._stopping:
+            close_old_connections()
+            if options['scan'] and (last_scan is None or time.monotonic() - last_scan >= options['scan_interval']):
+                queued = webhooks.scan_lifecycle()
+                last_scan = time.monotonic()
+                self.stdout.write(f"Scan: {queued['expired']} kedaluwarsa, {queued['alert']} masa peringatan diantrekan")
+            counts = webhooks.dispatch(limiter, options['batch'], options['concurrency'])
+            for key, value in counts.items():
+                totals[key] += value
+            if not any(counts.values()):
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Terkirim {totals['delivered']}, dijadwalkan ulang {totals['retry']}, gagal {totals['failed']}"
+        ))
+        if totals['failed']:
+            self.stdout.write(self.style.WARNING('Pengiriman gagal dapat dikirim ulang dari admin "Pengiriman Webhook".'))
+
+    def _stop(self, signum, frame):
+        self._stopping = True
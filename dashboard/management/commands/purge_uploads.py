@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from dashboard import uploads
+
+
+class Command(BaseCommand):
+    help = 'Hapus sesi unggah lampiran yang terbengkalai beserta berkas sementaranya, dan berkas yang tidak lagi dilampirkan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=None,
+                            help='Umur minimal sesi/berkas yang dihapus (default ATTACHMENT_SESSION_HOURS)')
+
+    def handle(self, *args, **options):
+        counts = uploads.purge(options['hours'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Dihapus {counts['sessions']} sesi unggah dan {counts['files']} berkas tanpa lampiran"
+        ))
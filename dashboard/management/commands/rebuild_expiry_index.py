@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from dashboard import expiry_index
+
+
+class Command(BaseCommand):
+    help = 'Bangun ulang indeks tanggal berakhir (EXPIRY_INDEX_PATH) bila data sudah berubah'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enqueue', action='store_true', help='Masukkan ke antrean tugas latar alih-alih langsung dijalankan')
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            from dashboard.jobs import enqueue
+            job = enqueue('rebuild_expiry_index', max_attempts=1)
+            self.stdout.write(self.style.SUCCESS(f"Tugas indeks #{job.pk} masuk antrean"))
+            return
+        count = expiry_index.rebuild()
+        if count is None:
+            self.stdout.write("Indeks sudah terbaru")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Indeks dibangun ulang: {count} dokumen"))
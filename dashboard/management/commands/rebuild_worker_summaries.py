@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.models import refresh_due_worker_summaries, refresh_worker_summaries
+
+
+class Command(BaseCommand):
+    help = 'Hitung ulang ringkasan kepatuhan pekerja (berakhir terdekat, kedaluwarsa, dokumen belum ada)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--due', action='store_true',
+                            help='Hanya pekerja yang dokumen terdekatnya sudah lewat tanggal berakhir (cukup untuk cron harian)')
+        parser.add_argument('--enqueue', action='store_true', help='Masukkan ke antrean tugas latar (mode --due)')
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            from dashboard.jobs import enqueue
+            job = enqueue('refresh_worker_summaries')
+            self.stdout.write(self.style.SUCCESS(f"Tugas ringkasan pekerja #{job.pk} masuk antrean"))
+            return
+        if options['due']:
+            updated = refresh_due_worker_summaries(batch_size=options['batch_size'])
+        else:
+            updated = refresh_worker_summaries(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Ringkasan {updated} pekerja diperbarui"))
@@ -0,0 +1,50 @@
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from dashboard import jobs
+
+
+class Command(BaseCommand):
+    help = 'Jalankan worker antrean tugas latar (ekspor, reminder, penghapusan)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Proses tugas yang tersedia lalu berhenti')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Berhenti setelah N tugas (0 = tanpa batas)')
+        parser.add_argument('--sleep', type=float, default=None, help='Jeda polling (detik) saat antrean kosong')
+
+    def handle(self, *args, **options):
+        sleep = options['sleep'] if options['sleep'] is not None else settings.JOB_POLL_INTERVAL_SECONDS
+        worker_name = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"{requeued} tugas macet dikembalikan ke antrean"))
+
+        processed = 0
+        while not self._stopping:
+            close_old_connections()
+            job = jobs.claim_next(worker_name)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(sleep)
+                continue
+            self.stdout.write(f"Menjalankan {job.kind} #{job.pk} (percobaan {job.attempts})")
+            jobs.run_job(job)
+            style = self.style.SUCCESS if job.status == job.Status.DONE else self.style.ERROR
+            self.stdout.write(style(f"{job.kind} #{job.pk}: {job.get_status_display()}"))
+            processed += 1
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+    def _stop(self, signum, frame):
+        self._stopping = True
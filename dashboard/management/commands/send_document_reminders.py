@@ -1,34 +1,29 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from dashboard.models import Document
+from dashboard import notifications
 
 
 class Command(BaseCommand):
-    help = 'Kirim reminder dokumen yang akan habis dalam 30/60/90 hari (placeholder: cetak ke stdout)'
+    help = 'Kirim digest email dokumen yang akan habis sesuai Aturan Peringatan per jenis dokumen, satu email per penerima'
 
-    def handle(self, *args, **options):
-        today = timezone.localdate()
-        d30 = today + timezone.timedelta(days=30)
-        d60 = today + timezone.timedelta(days=60)
-        d90 = today + timezone.timedelta(days=90)
-
-        qs = Document.objects.select_related('worker', 'worker__company').filter(
-            status=Document.Status.ACTIVE,
-            expiry_date__gte=today,
-            expiry_date__lte=d90,
-        ).order_by('expiry_date')
+    def add_arguments(self, parser):
+        parser.add_argument('--enqueue', action='store_true', help='Masukkan ke antrean tugas latar alih-alih langsung dijalankan')
+        parser.add_argument('--dry-run', action='store_true', help='Hitung penerima dan dokumen tanpa mengirim email')
 
-        bucket = {
-            '30': qs.filter(expiry_date__lte=d30),
-            '60': qs.filter(expiry_date__gt=d30, expiry_date__lte=d60),
-            '90': qs.filter(expiry_date__gt=d60, expiry_date__lte=d90),
-        }
-
-        for label, docs in bucket.items():
-            count = docs.count()
-            self.stdout.write(self.style.SUCCESS(f"Reminder {label} hari: {count} dokumen"))
-            for d in docs:
-                self.stdout.write(
-                    f"- {d.worker.company.name} / {d.worker.name} / {d.type} {d.document_number} berakhir {d.expiry_date} ({d.days_until_expiry} hari)"
-                )
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            from dashboard.jobs import enqueue
+            job = enqueue('send_document_reminders')
+            self.stdout.write(self.style.SUCCESS(f"Tugas reminder #{job.pk} masuk antrean"))
+            return
 
+        summary = notifications.send_digests(dry_run=options['dry_run'])
+        for level, count in summary['levels'].items():
+            self.stdout.write(self.style.SUCCESS(f"Reminder {level}: {count} dokumen"))
+        self.stdout.write(
+            f"{summary['companies']} perusahaan, {summary['recipients']} penerima, "
+            f"{summary['throttled']} dilewati (sudah dikirimi dalam periode throttle)"
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("Dry run: tidak ada email yang dikirim"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{summary['sent']} digest terkirim"))
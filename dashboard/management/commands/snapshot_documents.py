@@ -0,0 +1,33 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import snapshots
+
+
+class Command(BaseCommand):
+    help = 'Simpan snapshot harian jumlah dokumen per perusahaan dan jenis (untuk grafik tren)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Tanggal snapshot (YYYY-MM-DD), default hari ini')
+        parser.add_argument('--full', action='store_true', help='Hitung ulang semua perusahaan dari tabel dokumen')
+        parser.add_argument('--enqueue', action='store_true', help='Masukkan ke antrean tugas latar alih-alih langsung dijalankan')
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            from dashboard.jobs import enqueue
+            job = enqueue('snapshot_documents')
+            self.stdout.write(self.style.SUCCESS(f"Tugas snapshot #{job.pk} masuk antrean"))
+            return
+
+        day = None
+        if options['date']:
+            try:
+                day = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date harus berformat YYYY-MM-DD')
+        summary = snapshots.take_snapshot(day, full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot {summary['date']}: {summary['rows']} baris, "
+            f"{summary['recounted']} perusahaan dihitung ulang (snapshot sebelumnya: {summary['previous'] or '-'})"
+        ))
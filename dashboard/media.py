@@ -0,0 +1,162 @@
+"""Authenticated delivery of uploaded files.
+
+Views decide whether the user may see a file, then call ``serve_file``.
+With ``MEDIA_ACCEL_REDIRECT`` enabled the response only carries an
+``X-Accel-Redirect`` header and nginx sends the bytes from an ``internal``
+location, handling ranges and cache validators itself. Without nginx
+(development) the file is streamed from storage with ``ETag``,
+``Last-Modified`` and single-range support.
+"""
+import mimetypes
+import os
+import re
+import zipfile
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse, Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, content_disposition_header
+
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _content_type(name):
+    content_type, encoding = mimetypes.guess_type(name)
+    return content_type or 'application/octet-stream'
+
+
+def _read_range(fh, start, length):
+    fh.seek(start)
+    remaining = length
+    try:
+        while remaining > 0:
+            chunk = fh.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
+
+
+def _parse_range(header, size):
+    """Return ``(start, end)`` for a single satisfiable byte range, ``None`` to send the
+    whole file, or ``False`` when the range cannot be satisfied."""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _set_disposition(response, name, filename, as_attachment):
+    if as_attachment or filename:
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename or os.path.basename(name))
+
+
+def serve_file(request, name, as_attachment=False, filename=None):
+    """Return a response delivering storage file ``name``; the caller has checked access."""
+    if not name or not default_storage.exists(name):
+        raise Http404
+    content_type = _content_type(filename or name)
+
+    if settings.MEDIA_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(name)
+        _set_disposition(response, name, filename, as_attachment)
+        return response
+
+    path = default_storage.path(name)
+    stat = os.stat(path)
+    last_modified = int(stat.st_mtime)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and request.method == 'GET':
+        if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+        if not if_range or if_range == etag or parse_http_date_safe(if_range) == last_modified:
+            byte_range = _parse_range(range_header, stat.st_size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(_read_range(open(path, 'rb'), start, length), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(length)
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    _set_disposition(response, name, filename, as_attachment)
+    return response
+
+
+class _ZipBuffer:
+    """Write-only sink for ``ZipFile`` whose contents are drained after each write."""
+
+    def __init__(self):
+        self.parts = []
+        self.offset = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def stream_zip(entries):
+    """Yield a ZIP archive of ``(archive_name, storage_name)`` pairs chunk by chunk.
+
+    Entries are stored uncompressed (photos are already compressed) and
+    written through a non-seekable sink, so memory use is bounded by
+    ``CHUNK_SIZE`` regardless of archive size.
+    """
+    sink = _ZipBuffer()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for arcname, name in entries:
+            try:
+                source = default_storage.open(name, 'rb')
+            except (FileNotFoundError, OSError):
+                continue
+            with source, archive.open(arcname, mode='w', force_zip64=True) as dest:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    dest.write(chunk)
+                    yield sink.drain()
+            yield sink.drain()
+    # Central directory, written when the archive is closed
+    yield sink.drain()
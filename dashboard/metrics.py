@@ -0,0 +1,123 @@
+"""Prometheus metrics served at ``/metrics``.
+
+Under gunicorn every worker process writes its samples to memory-mapped
+files in ``PROMETHEUS_MULTIPROC_DIR`` (the variable must be set before the
+process starts) and the scrape merges them with ``MultiProcessCollector``.
+Without it, as under ``runserver``, the in-process registry is used.
+
+Business gauges are not stored per process: ``DocumentStatsCollector``
+reads them from one aggregate query whose result is cached for
+``METRICS_BUSINESS_CACHE_SECONDS``.
+"""
+import hmac
+import ipaddress
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from .models import Document
+
+
+REQUEST_LATENCY = Histogram(
+    'tka_request_duration_seconds', 'Request latency per view',
+    ['view', 'method', 'status'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+REQUEST_QUERIES = Histogram(
+    'tka_request_db_queries', 'Database queries per request',
+    ['view'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000),
+)
+EXPORT_DURATION = Histogram(
+    'tka_export_duration_seconds', 'Duration of CSV export jobs',
+    ['kind'],
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+EXPORT_SIZE = Histogram(
+    'tka_export_size_bytes', 'Size of CSV export files',
+    ['kind'],
+    buckets=(1e3, 1e4, 1e5, 1e6, 1e7, 5e7, 1e8, 5e8),
+)
+EXPORT_ROWS = Counter('tka_export_rows', 'Rows written by CSV exports', ['kind'])
+JOB_RESULTS = Counter('tka_jobs', 'Finished background job attempts', ['kind', 'result'])
+REMINDER_DIGESTS = Counter('tka_reminder_digests', 'Reminder digests by outcome', ['result'])
+WEBHOOK_DELIVERIES = Counter('tka_webhook_deliveries', 'Webhook delivery attempts by outcome', ['event', 'result'])
+
+
+def status_class(status_code) -> str:
+    return f'{status_code // 100}xx'
+
+
+class DocumentStatsCollector:
+    """Document gauges (active, expired, expiring within 30/60/90 days)."""
+
+    cache_key = 'metrics:document-stats'
+
+    def collect(self):
+        stats = cache.get(self.cache_key)
+        if stats is None:
+            stats = self._query()
+            cache.set(self.cache_key, stats, settings.METRICS_BUSINESS_CACHE_SECONDS)
+        documents = GaugeMetricFamily('tka_documents', 'Documents by status', labels=['status'])
+        documents.add_metric(['active'], stats['active'])
+        documents.add_metric(['expired'], stats['expired'])
+        yield documents
+        expiring = GaugeMetricFamily(
+            'tka_documents_expiring', 'Active documents expiring within N days', labels=['within_days']
+        )
+        for days in (30, 60, 90):
+            expiring.add_metric([str(days)], stats[f'within_{days}'])
+        yield expiring
+
+    def _query(self):
+        today = timezone.localdate()
+        active = Q(status=Document.Status.ACTIVE, expiry_date__gte=today)
+        return Document.objects.aggregate(
+            active=Count('pk', filter=active),
+            expired=Count('pk', filter=~active),
+            **{
+                f'within_{days}': Count('pk', filter=active & Q(expiry_date__lte=today + timedelta(days=days)))
+                for days in (30, 60, 90)
+            },
+        )
+
+
+_business_registry = CollectorRegistry()
+_business_registry.register(DocumentStatsCollector())
+
+
+def render():
+    """Return ``(body, content_type)`` for a scrape."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(_business_registry), CONTENT_TYPE_LATEST
+
+
+def is_authorized(request) -> bool:
+    """Require the ``METRICS_TOKEN`` bearer token, and a ``METRICS_ALLOWED_IPS`` address if that is set.
+
+    There is no token-less access: behind nginx every request comes from
+    127.0.0.1, so the peer address alone proves nothing.
+    """
+    if not settings.METRICS_TOKEN:
+        return False
+    if not hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {settings.METRICS_TOKEN}'):
+        return False
+    if not settings.METRICS_ALLOWED_IPS:
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(net, strict=False) for net in settings.METRICS_ALLOWED_IPS)
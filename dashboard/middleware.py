@@ -1,14 +1,25 @@
+import cProfile
+import io
+import pstats
+import time
+from contextlib import ExitStack
+
 from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.shortcuts import redirect
 from django.urls import resolve
 
+from . import metrics
+
 
 EXEMPT_PREFIXES = (
     '/accounts/',  # django auth
     '/admin/login',
     '/static/',
-    '/media/',
     '/account/',  # two_factor
+    '/metrics',  # guarded by token/IP in the view
+    '/kalender/',  # secret-token calendar feeds
 )
 
 
@@ -23,3 +34,113 @@ class LoginRequiredMiddleware:
             return redirect(settings.LOGIN_URL)
         return self.get_response(request)
 
+
+
+class MetricsMiddleware:
+    """Record per-view latency and database query counts for ``/metrics``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path.startswith(('/static/', '/media/')):
+            return self.get_response(request)
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        metrics.REQUEST_LATENCY.labels(view, request.method, metrics.status_class(response.status_code)).observe(elapsed)
+        metrics.REQUEST_QUERIES.labels(view).observe(queries)
+        return response
+
+
+class ProfilingMiddleware:
+    """Profile single requests on demand for staff users.
+
+    A request is profiled when it carries an ``X-Profile`` header or a
+    ``_profile`` query parameter and the user is staff. The cProfile call
+    tree, every SQL statement with its timing, and the total duration are
+    stored as a ``ProfileReport`` (see the admin) and its id is returned in
+    the ``X-Profile-Id`` response header. Other requests only pay for the
+    header/parameter check; with ``PROFILING_ENABLED = False`` the
+    middleware is removed from the stack entirely.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (request.META.get('HTTP_X_PROFILE') or '_profile' in request.GET):
+            return self.get_response(request)
+        if not request.user.is_staff:
+            return self.get_response(request)
+        return self._profile(request)
+
+    def _profile(self, request):
+        from .models import ProfileReport
+
+        queries = []
+        # Totals cover every execution; only the first PROFILING_MAX_QUERIES are stored
+        totals = {'count': 0, 'ms': 0.0}
+
+        def capture(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                ms = (time.perf_counter() - start) * 1000
+                totals['count'] += 1
+                totals['ms'] += ms
+                if len(queries) < settings.PROFILING_MAX_QUERIES:
+                    queries.append({
+                        'sql': sql,
+                        'params': repr(params)[:500],
+                        'ms': round(ms, 3),
+                        'db': context['connection'].alias,
+                    })
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(capture))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        output = io.StringIO()
+        stats = pstats.Stats(profiler, stream=output).sort_stats('cumulative')
+        stats.print_stats(settings.PROFILING_STATS_LIMIT)
+        stats.print_callees(settings.PROFILING_STATS_LIMIT // 2)
+
+        report = ProfileReport.objects.create(
+            path=request.path[:500],
+            method=request.method,
+            query_string=request.META.get('QUERY_STRING', '')[:1000],
+            user=request.user,
+            status_code=response.status_code,
+            duration_ms=round(duration_ms, 3),
+            sql_count=totals['count'],
+            sql_ms=round(totals['ms'], 3),
+            queries=queries,
+            stats=output.getvalue(),
+        )
+        ProfileReport.prune(settings.PROFILING_KEEP_REPORTS)
+        response['X-Profile-Id'] = str(report.pk)
+        return response
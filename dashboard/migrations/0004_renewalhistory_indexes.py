@@ -0,0 +1,21 @@
+# Generated by Django 5.0.9 on 2026-10-19 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_userprofile'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='renewalhistory',
+            index=models.Index(fields=['document', 'submission_date'], name='renewal_document_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='renewalhistory',
+            index=models.Index(fields=['submission_date', 'id'], name='renewal_date_idx'),
+        ),
+    ]
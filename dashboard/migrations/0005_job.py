@@ -0,0 +1,44 @@
+# Generated by Django 5.0.9 on 2026-10-19 11:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_renewalhistory_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50, verbose_name='Jenis')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Parameter')),
+                ('status', models.CharField(choices=[('QUEUED', 'Dalam antrean'), ('RUNNING', 'Berjalan'), ('DONE', 'Selesai'), ('FAILED', 'Gagal')], default='QUEUED', max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Percobaan')),
+                ('max_attempts', models.PositiveIntegerField(default=3, verbose_name='Maksimum percobaan')),
+                ('progress_done', models.PositiveIntegerField(default=0, verbose_name='Progres')),
+                ('progress_total', models.PositiveIntegerField(default=0, verbose_name='Total')),
+                ('message', models.CharField(blank=True, max_length=255, verbose_name='Pesan')),
+                ('error', models.TextField(blank=True, verbose_name='Galat')),
+                ('result_file', models.FileField(blank=True, upload_to='jobs/', verbose_name='Hasil')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Dibuat')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Jalankan setelah')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Mulai')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Selesai')),
+                ('locked_by', models.CharField(blank=True, max_length=100, verbose_name='Diproses oleh')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to=settings.AUTH_USER_MODEL, verbose_name='Dibuat oleh')),
+            ],
+            options={
+                'verbose_name': 'Tugas Latar',
+                'verbose_name_plural': 'Tugas Latar',
+                'indexes': [models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'), models.Index(fields=['created_by', 'created_at'], name='job_created_by_idx')],
+            },
+        ),
+    ]
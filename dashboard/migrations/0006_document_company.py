@@ -0,0 +1,42 @@
+# Generated by Django 5.0.9 on 2026-10-19 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_company(apps, schema_editor):
+    Document = apps.get_model('dashboard', 'Document')
+    Worker = apps.get_model('dashboard', 'Worker')
+    # Single UPDATE ... SET company_id = (SELECT company_id FROM worker ...)
+    Document.objects.update(
+        company_id=Subquery(Worker.objects.filter(pk=OuterRef('worker_id')).values('company_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+    # On PostgreSQL the new FK is DEFERRABLE INITIALLY DEFERRED: the backfill must commit
+    # on its own, or the ALTER TABLE/CREATE INDEX below fail with "pending trigger events"
+    atomic = False
+
+    dependencies = [
+        ('dashboard', '0005_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='company',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='documents', to='dashboard.company', verbose_name='Perusahaan'),
+        ),
+        migrations.RunPython(backfill_company, migrations.RunPython.noop, atomic=True),
+        migrations.AlterField(
+            model_name='document',
+            name='company',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='documents', to='dashboard.company', verbose_name='Perusahaan'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['company', 'status', 'expiry_date'], name='doc_company_status_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.0.9 on 2026-10-19 11:31
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_summaries(apps, schema_editor):
+    # Same computation as models.refresh_worker_summaries, on the historical models
+    Document = apps.get_model('dashboard', 'Document')
+    Worker = apps.get_model('dashboard', 'Worker')
+    today = timezone.localdate()
+    all_types = [t for t, _ in Document._meta.get_field('type').choices]
+    fields = ['next_expiry_date', 'next_expiry_type', 'expired_document_count', 'missing_document_types']
+    last_pk = 0
+    while True:
+        workers = {w.pk: w for w in Worker.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', *fields)[:1000]}
+        if not workers:
+            break
+        summary = {pk: {'next': None, 'type': '', 'expired': 0, 'types': set()} for pk in workers}
+        docs = Document.objects.filter(worker_id__in=workers).values_list('worker_id', 'type', 'status', 'expiry_date')
+        for worker_id, doc_type, status, expiry_date in docs:
+            item = summary[worker_id]
+            item['types'].add(doc_type)
+            if status == 'EXPIRED' or expiry_date < today:
+                item['expired'] += 1
+            elif item['next'] is None or expiry_date < item['next']:
+                item['next'], item['type'] = expiry_date, doc_type
+        for pk, worker in workers.items():
+            item = summary[pk]
+            worker.next_expiry_date = item['next']
+            worker.next_expiry_type = item['type']
+            worker.expired_document_count = item['expired']
+            worker.missing_document_types = [t for t in all_types if t not in item['types']]
+        Worker.objects.bulk_update(workers.values(), fields)
+        last_pk = max(workers)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_document_company'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='worker',
+            name='expired_document_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Dokumen kedaluwarsa'),
+        ),
+        migrations.AddField(
+            model_name='worker',
+            name='missing_document_types',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Dokumen belum ada'),
+        ),
+        migrations.AddField(
+            model_name='worker',
+            name='next_expiry_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Berakhir terdekat'),
+        ),
+        migrations.AddField(
+            model_name='worker',
+            name='next_expiry_type',
+            field=models.CharField(blank=True, editable=False, max_length=20, verbose_name='Dokumen berakhir terdekat'),
+        ),
+        migrations.AddIndex(
+            model_name='worker',
+            index=models.Index(fields=['next_expiry_date'], name='worker_next_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='worker',
+            index=models.Index(fields=['company', 'next_expiry_date'], name='worker_company_next_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='worker',
+            index=models.Index(fields=['company', 'expired_document_count'], name='worker_company_expired_idx'),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
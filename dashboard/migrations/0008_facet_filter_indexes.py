@@ -0,0 +1,41 @@
+# Generated by Django 5.0.9 on 2026-10-19 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_worker_compliance_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['expiry_date', 'id'], name='doc_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['type', 'status', 'expiry_date'], name='doc_type_status_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['status', 'expiry_date'], name='doc_status_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='worker',
+            index=models.Index(fields=['name', 'id'], name='worker_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='worker',
+            index=models.Index(fields=['company', 'name'], name='worker_company_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='worker',
+            index=models.Index(fields=['nationality', 'name'], name='worker_nationality_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='worker',
+            index=models.Index(fields=['next_expiry_type', 'next_expiry_date'], name='worker_next_type_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.9 on 2026-10-19 13:10
+
+from django.db import migrations
+
+
+# Case-insensitive prefix indexes for the autocomplete endpoints (istartswith).
+# PostgreSQL compiles istartswith to UPPER(col::text) LIKE UPPER('term%'), which
+# needs text_pattern_ops; SQLite's LIKE is case-insensitive and needs NOCASE.
+PREFIX_INDEXES = [
+    ('worker_name_prefix_idx', 'dashboard_worker', 'name'),
+    ('worker_passport_prefix_idx', 'dashboard_worker', 'passport_number'),
+    ('company_name_prefix_idx', 'dashboard_company', 'name'),
+    ('document_number_prefix_idx', 'dashboard_document', 'document_number'),
+]
+
+
+def create_prefix_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for name, table, column in PREFIX_INDEXES:
+        if vendor == 'postgresql':
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {name} ON {table} ((UPPER({column}::text)) text_pattern_ops)'
+            )
+        elif vendor == 'sqlite':
+            schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({column} COLLATE NOCASE)')
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    for name, _table, _column in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_facet_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.9 on 2026-10-19 11:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_autocomplete_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='pending_deletion',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Menunggu penghapusan'),
+        ),
+        migrations.AddField(
+            model_name='worker',
+            name='pending_deletion',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Menunggu penghapusan'),
+        ),
+        migrations.AddIndex(
+            model_name='worker',
+            index=models.Index(condition=models.Q(('pending_deletion', True)), fields=['id'], name='worker_pending_deletion_idx'),
+        ),
+    ]
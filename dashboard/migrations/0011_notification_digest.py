@@ -0,0 +1,34 @@
+# Generated by Django 5.0.9 on 2026-10-19 11:38
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0010_pending_deletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='contact_email',
+            field=models.EmailField(blank=True, max_length=254, verbose_name='Email kontak'),
+        ),
+        migrations.CreateModel(
+            name='NotificationLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254, verbose_name='Penerima')),
+                ('kind', models.CharField(max_length=50, verbose_name='Jenis')),
+                ('sent_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Dikirim')),
+                ('document_count', models.PositiveIntegerField(default=0, verbose_name='Jumlah dokumen')),
+            ],
+            options={
+                'verbose_name': 'Log Notifikasi',
+                'verbose_name_plural': 'Log Notifikasi',
+                'indexes': [models.Index(fields=['kind', 'recipient', 'sent_at'], name='notif_recipient_sent_idx')],
+            },
+        ),
+    ]
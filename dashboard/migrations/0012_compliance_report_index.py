@@ -0,0 +1,17 @@
+# Generated by Django 5.0.9 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0011_notification_digest'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['worker', 'type', 'expiry_date'], name='doc_worker_type_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.9 on 2026-10-19 11:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0012_compliance_report_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, verbose_name='Path')),
+                ('method', models.CharField(max_length=10, verbose_name='Metode')),
+                ('query_string', models.CharField(blank=True, max_length=1000, verbose_name='Query string')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Status HTTP')),
+                ('duration_ms', models.FloatField(verbose_name='Durasi (ms)')),
+                ('sql_count', models.PositiveIntegerField(verbose_name='Jumlah query')),
+                ('sql_ms', models.FloatField(verbose_name='Durasi SQL (ms)')),
+                ('queries', models.JSONField(default=list, verbose_name='Query SQL')),
+                ('stats', models.TextField(verbose_name='Profil cProfile')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Dibuat')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Laporan Profil',
+                'verbose_name_plural': 'Laporan Profil',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
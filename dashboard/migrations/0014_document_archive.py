@@ -0,0 +1,62 @@
+# Generated by Django 5.0.9 on 2026-10-19 11:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0013_profile_report'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDocument',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('type', models.CharField(choices=[('RPTKA', 'RPTKA'), ('IMTA', 'IMTA/Notifikasi'), ('VISA', 'Visa'), ('KITAS', 'KITAS'), ('SKTT', 'SKTT'), ('PASSPORT', 'Paspor')], max_length=20, verbose_name='Jenis dokumen')),
+                ('document_number', models.CharField(max_length=100, verbose_name='Nomor dokumen')),
+                ('issue_date', models.DateField(verbose_name='Tanggal terbit')),
+                ('expiry_date', models.DateField(verbose_name='Tanggal berakhir')),
+                ('status', models.CharField(choices=[('ACTIVE', 'Aktif'), ('EXPIRED', 'Kedaluwarsa')], max_length=20, verbose_name='Status')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Diarsipkan')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_documents', to='dashboard.company', verbose_name='Perusahaan')),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_documents', to='dashboard.worker', verbose_name='Pekerja')),
+            ],
+            options={
+                'verbose_name': 'Arsip Dokumen',
+                'verbose_name_plural': 'Arsip Dokumen',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedRenewalHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('submission_date', models.DateField(verbose_name='Tanggal pengajuan')),
+                ('process_status', models.CharField(choices=[('PENDING', 'Pending'), ('APPROVED', 'Disetujui'), ('COMPLETED', 'Selesai')], max_length=20, verbose_name='Status proses')),
+                ('notes', models.TextField(blank=True, verbose_name='Catatan')),
+                ('new_document_number', models.CharField(blank=True, max_length=100, verbose_name='Nomor dokumen baru')),
+                ('new_issue_date', models.DateField(blank=True, null=True, verbose_name='Tanggal terbit baru')),
+                ('new_expiry_date', models.DateField(blank=True, null=True, verbose_name='Tanggal berakhir baru')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renewal_history', to='dashboard.archiveddocument', verbose_name='Dokumen')),
+            ],
+            options={
+                'verbose_name': 'Arsip Riwayat Perpanjangan',
+                'verbose_name_plural': 'Arsip Riwayat Perpanjangan',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archiveddocument',
+            index=models.Index(fields=['worker', 'expiry_date'], name='archdoc_worker_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archiveddocument',
+            index=models.Index(fields=['company', 'expiry_date'], name='archdoc_company_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedrenewalhistory',
+            index=models.Index(fields=['document', 'submission_date'], name='archren_document_date_idx'),
+        ),
+    ]
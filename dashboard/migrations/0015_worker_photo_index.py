@@ -0,0 +1,17 @@
+# Generated by Django 5.0.9 on 2026-10-19 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0014_document_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='worker',
+            index=models.Index(fields=['photo'], name='worker_photo_idx'),
+        ),
+    ]
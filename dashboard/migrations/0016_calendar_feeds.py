@@ -0,0 +1,37 @@
+# Generated by Django 5.0.9 on 2026-10-19 11:47
+
+import dashboard.models
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0015_worker_photo_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='data_changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Data terakhir berubah'),
+        ),
+        migrations.CreateModel(
+            name='CalendarFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(default=dashboard.models.new_feed_token, editable=False, max_length=64, unique=True, verbose_name='Token')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Dibuat')),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='calendar_feeds', to='dashboard.company', verbose_name='Perusahaan')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_feeds', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Feed Kalender',
+                'verbose_name_plural': 'Feed Kalender',
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.9 on 2026-10-19 11:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_default_policies(apps, schema_editor):
+    AlertPolicy = apps.get_model('dashboard', 'AlertPolicy')
+    # The previous hard-coded 30/60/90 windows, one editable row per document type
+    AlertPolicy.objects.bulk_create([
+        AlertPolicy(document_type=t, urgent_days=30, warning_days=60, notice_days=90)
+        for t in ['RPTKA', 'IMTA', 'VISA', 'KITAS', 'SKTT', 'PASSPORT']
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0016_calendar_feeds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_type', models.CharField(choices=[('RPTKA', 'RPTKA'), ('IMTA', 'IMTA/Notifikasi'), ('VISA', 'Visa'), ('KITAS', 'KITAS'), ('SKTT', 'SKTT'), ('PASSPORT', 'Paspor')], max_length=20, verbose_name='Jenis dokumen')),
+                ('urgent_days', models.PositiveIntegerField(default=30, verbose_name='Mendesak (hari)')),
+                ('warning_days', models.PositiveIntegerField(default=60, verbose_name='Peringatan (hari)')),
+                ('notice_days', models.PositiveIntegerField(default=90, verbose_name='Pemberitahuan (hari)')),
+                ('company', models.ForeignKey(blank=True, help_text='Kosongkan untuk aturan default jenis dokumen ini', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='alert_policies', to='dashboard.company', verbose_name='Perusahaan')),
+            ],
+            options={
+                'verbose_name': 'Aturan Peringatan',
+                'verbose_name_plural': 'Aturan Peringatan',
+                'ordering': ['document_type', 'company__name'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='alertpolicy',
+            constraint=models.UniqueConstraint(fields=('document_type', 'company'), name='alertpolicy_type_company_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='alertpolicy',
+            constraint=models.UniqueConstraint(condition=models.Q(('company__isnull', True)), fields=('document_type',), name='alertpolicy_type_default_uniq'),
+        ),
+        migrations.RunPython(create_default_policies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.9 on 2026-10-19 11:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0017_alert_policy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Tanggal')),
+                ('document_type', models.CharField(choices=[('RPTKA', 'RPTKA'), ('IMTA', 'IMTA/Notifikasi'), ('VISA', 'Visa'), ('KITAS', 'KITAS'), ('SKTT', 'SKTT'), ('PASSPORT', 'Paspor')], max_length=20, verbose_name='Jenis dokumen')),
+                ('active_count', models.PositiveIntegerField(default=0, verbose_name='Aktif')),
+                ('expiring_count', models.PositiveIntegerField(default=0, verbose_name='Akan berakhir')),
+                ('expired_count', models.PositiveIntegerField(default=0, verbose_name='Kedaluwarsa')),
+                ('computed_at', models.DateTimeField(verbose_name='Dihitung')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='dashboard.company', verbose_name='Perusahaan')),
+            ],
+            options={
+                'verbose_name': 'Snapshot Dokumen',
+                'verbose_name_plural': 'Snapshot Dokumen',
+                'indexes': [models.Index(fields=['company', 'date'], name='snapshot_company_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='documentsnapshot',
+            constraint=models.UniqueConstraint(fields=('date', 'company', 'document_type'), name='snapshot_date_company_type_uniq'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.9 on 2026-10-19 11:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0018_document_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Sidik'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['fingerprint', 'status'], name='job_fingerprint_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.9 on 2026-10-19 12:05
+
+import dashboard.models
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0019_job_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEndpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nama')),
+                ('url', models.URLField(max_length=500, verbose_name='URL')),
+                ('secret', models.CharField(default=dashboard.models.new_feed_token, help_text='Kunci HMAC-SHA256 untuk header X-TKA-Signature', max_length=64, verbose_name='Secret')),
+                ('events', models.JSONField(blank=True, default=list, help_text='Daftar event; kosongkan untuk semua event', verbose_name='Event')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Aktif')),
+                ('rate_limit_per_minute', models.PositiveIntegerField(default=60, help_text='0 = tanpa batas', verbose_name='Batas kirim per menit')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Dibuat')),
+                ('company', models.ForeignKey(blank=True, help_text='Kosongkan untuk event semua perusahaan', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='webhook_endpoints', to='dashboard.company', verbose_name='Perusahaan')),
+            ],
+            options={
+                'verbose_name': 'Webhook',
+                'verbose_name_plural': 'Webhook',
+            },
+        ),
+        migrations.CreateModel(
+            name='WebhookDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(choices=[('document.created', 'Dokumen dibuat'), ('document.renewed', 'Dokumen diperpanjang'), ('document.expired', 'Dokumen kedaluwarsa'), ('document.alert', 'Dokumen masuk masa peringatan')], max_length=50, verbose_name='Event')),
+                ('event_key', models.CharField(max_length=200, verbose_name='Kunci event')),
+                ('payload', models.JSONField(default=dict, verbose_name='Isi')),
+                ('status', models.CharField(choices=[('PENDING', 'Menunggu'), ('DELIVERED', 'Terkirim'), ('FAILED', 'Gagal')], default='PENDING', max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Percobaan')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Kirim setelah')),
+                ('locked_by', models.CharField(blank=True, max_length=64, verbose_name='Diproses oleh')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Dibuat')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Terkirim')),
+                ('response_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Kode respons')),
+                ('last_error', models.TextField(blank=True, verbose_name='Galat terakhir')),
+                ('endpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='dashboard.webhookendpoint', verbose_name='Webhook')),
+            ],
+            options={
+                'verbose_name': 'Pengiriman Webhook',
+                'verbose_name_plural': 'Pengiriman Webhook',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='webhook_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='webhookdelivery',
+            constraint=models.UniqueConstraint(fields=('endpoint', 'event_key'), name='webhookdelivery_event_uniq'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.0.9 on 2026-10-19 12:08
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0020_webhooks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('size', models.BigIntegerField(verbose_name='Ukuran (byte)')),
+                ('content_type', models.CharField(max_length=100, verbose_name='Tipe')),
+                ('file', models.FileField(max_length=200, upload_to='attachments/', verbose_name='Berkas')),
+                ('preview', models.FileField(blank=True, max_length=200, upload_to='attachments/previews/', verbose_name='Pratinjau')),
+                ('preview_status', models.CharField(choices=[('PENDING', 'Diproses'), ('READY', 'Tersedia'), ('UNSUPPORTED', 'Tidak didukung'), ('FAILED', 'Gagal')], default='PENDING', max_length=20, verbose_name='Status pratinjau')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Dibuat')),
+            ],
+            options={
+                'verbose_name': 'Berkas',
+                'verbose_name_plural': 'Berkas',
+            },
+        ),
+        migrations.CreateModel(
+            name='Attachment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=255, verbose_name='Nama berkas')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Diunggah')),
+                ('document', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='dashboard.document', verbose_name='Dokumen')),
+                ('renewal', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='dashboard.renewalhistory', verbose_name='Perpanjangan')),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Diunggah oleh')),
+                ('stored_file', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='attachments', to='dashboard.storedfile', verbose_name='Berkas')),
+            ],
+            options={
+                'verbose_name': 'Lampiran',
+                'verbose_name_plural': 'Lampiran',
+            },
+        ),
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='Nama berkas')),
+                ('content_type', models.CharField(max_length=100, verbose_name='Tipe')),
+                ('size', models.BigIntegerField(verbose_name='Ukuran (byte)')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256')),
+                ('received', models.BigIntegerField(default=0, verbose_name='Diterima (byte)')),
+                ('status', models.CharField(choices=[('OPEN', 'Berjalan'), ('COMPLETE', 'Selesai'), ('FAILED', 'Gagal')], default='OPEN', max_length=20, verbose_name='Status')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Dibuat')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Diperbarui')),
+                ('attachment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='dashboard.attachment', verbose_name='Lampiran')),
+                ('document', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dashboard.document', verbose_name='Dokumen')),
+                ('renewal', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dashboard.renewalhistory', verbose_name='Perpanjangan')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Sesi Unggah',
+                'verbose_name_plural': 'Sesi Unggah',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='attachment',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('document__isnull', False), ('renewal__isnull', True)), models.Q(('document__isnull', True), ('renewal__isnull', False)), _connector='OR'), name='attachment_one_target'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadsession',
+            index=models.Index(fields=['status', 'updated_at'], name='upload_status_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.9 on 2026-10-19 12:25
+
+import dashboard.models
+from django.db import migrations, models
+
+
+def backfill_workers_without_documents(apps, schema_editor):
+    Worker = apps.get_model('dashboard', 'Worker')
+    Document = apps.get_model('dashboard', 'Document')
+    # Workers created before this default never had their missing types computed
+    Worker.objects.exclude(pk__in=Document.objects.values('worker_id')).update(
+        missing_document_types=dashboard.models.all_document_types()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0021_attachments'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='worker',
+            name='missing_document_types',
+            field=models.JSONField(blank=True, default=dashboard.models.all_document_types, editable=False, verbose_name='Dokumen belum ada'),
+        ),
+        migrations.RunPython(backfill_workers_without_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.9 on 2026-10-19 12:27
+
+from django.db import migrations, models
+
+
+def backfill_previous_expiry(apps, schema_editor):
+    # Best effort for existing rows: the latest new_expiry_date of an earlier
+    # renewal of the same document. A document's first renewal keeps NULL when
+    # it changed the expiry, since the original date was overwritten.
+    for renewal_model in ('RenewalHistory', 'ArchivedRenewalHistory'):
+        Renewal = apps.get_model('dashboard', renewal_model)
+        rows = Renewal.objects.order_by('document_id', 'submission_date', 'id').values_list(
+            'id', 'document_id', 'new_expiry_date', 'document__expiry_date',
+        )
+        batch, document_id, latest = [], None, None
+        for pk, doc_id, new_expiry, current_expiry in rows.iterator(chunk_size=2000):
+            if doc_id != document_id:
+                document_id, latest = doc_id, None
+            previous = latest if latest is not None else (current_expiry if new_expiry is None else None)
+            if previous is not None:
+                batch.append(Renewal(pk=pk, previous_expiry_date=previous))
+            if new_expiry is not None and (latest is None or new_expiry > latest):
+                latest = new_expiry
+        Renewal.objects.bulk_update(batch, ['previous_expiry_date'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0022_worker_missing_types_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedrenewalhistory',
+            name='previous_expiry_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Tanggal berakhir sebelumnya'),
+        ),
+        migrations.AddField(
+            model_name='renewalhistory',
+            name='previous_expiry_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Tanggal berakhir sebelumnya'),
+        ),
+        migrations.RunPython(backfill_previous_expiry, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.9 on 2026-10-19 12:32
+
+from django.db import migrations, models
+
+
+def flag_documents_of_pending_workers(apps, schema_editor):
+    Worker = apps.get_model('dashboard', 'Worker')
+    Document = apps.get_model('dashboard', 'Document')
+    pending = Worker.objects.filter(pending_deletion=True).values('pk')
+    Document.objects.filter(worker_id__in=pending).update(pending_deletion=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0023_renewal_previous_expiry'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='worker',
+            name='worker_pending_deletion_idx',
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='pending_deletion',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Menunggu penghapusan'),
+        ),
+        migrations.RunPython(flag_documents_of_pending_workers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.9 on 2026-10-19 12:34
+
+from django.db import migrations, models
+
+
+def create_counter(apps, schema_editor):
+    # Bumps are plain UPDATEs of this row
+    apps.get_model('dashboard', 'DataVersion').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0024_document_pending_deletion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0, verbose_name='Versi')),
+            ],
+            options={
+                'verbose_name': 'Versi data',
+                'verbose_name_plural': 'Versi data',
+            },
+        ),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+    ]
@@ -1,24 +1,57 @@
+import secrets
+import uuid
+
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import F
 from django.utils import timezone
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 
+def new_feed_token() -> str:
+    return secrets.token_urlsafe(32)
+
+
+class VisibleManager(models.Manager):
+    """Default manager that hides rows queued for background deletion."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(pending_deletion=False)
+
+
 class Company(models.Model):
     name = models.CharField("Nama", max_length=255)
     industry = models.CharField("Industri", max_length=255, blank=True)
     address = models.TextField("Alamat", blank=True)
     contact_person = models.CharField("Kontak person", max_length=255, blank=True)
+    contact_email = models.EmailField("Email kontak", blank=True)
+    # Watermark for cached per-company output (calendar feeds, snapshots, exports); see touch_companies()
+    data_changed_at = models.DateTimeField("Data terakhir berubah", default=timezone.now, editable=False)
+    pending_deletion = models.BooleanField("Menunggu penghapusan", default=False, editable=False)
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        # The name appears in exports and feeds
+        self.data_changed_at = timezone.now()
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Perusahaan"
         verbose_name_plural = "Perusahaan"
 
 
+def all_document_types():
+    # A new worker has no documents yet, so every type is missing
+    return list(Document.DocumentType.values)
+
+
 class Worker(models.Model):
     name = models.CharField("Nama", max_length=255)
     passport_number = models.CharField("Nomor paspor", max_length=50, unique=True)
@@ -29,12 +62,59 @@ class Worker(models.Model):
     photo = models.ImageField("Foto", upload_to='workers/photos/', blank=True, null=True)
     start_date = models.DateField("Tanggal mulai kerja", null=True, blank=True)
 
+    # Compliance summary, maintained by refresh_worker_summaries()
+    next_expiry_date = models.DateField("Berakhir terdekat", null=True, blank=True, editable=False)
+    next_expiry_type = models.CharField("Dokumen berakhir terdekat", max_length=20, blank=True, editable=False)
+    expired_document_count = models.PositiveIntegerField("Dokumen kedaluwarsa", default=0, editable=False)
+    missing_document_types = models.JSONField("Dokumen belum ada", default=all_document_types, blank=True, editable=False)
+    pending_deletion = models.BooleanField("Menunggu penghapusan", default=False, editable=False)
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
+
     def __str__(self) -> str:
         return f"{self.name} ({self.passport_number})"
 
+    @property
+    def next_expiry_days(self):
+        if self.next_expiry_date is None:
+            return None
+        return (self.next_expiry_date - timezone.localdate()).days
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'company_id' in field_names:
+            instance._loaded_company_id = instance.company_id
+        return instance
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        # Move the denormalized Document/ArchivedDocument.company along with the worker.
+        # Bulk QuerySet.update(company=...) bypasses this and must sync both itself.
+        previous_company_id = getattr(self, '_loaded_company_id', None)
+        if not adding and previous_company_id != self.company_id:
+            self.documents.exclude(company_id=self.company_id).update(company_id=self.company_id)
+            self.archived_documents.exclude(company_id=self.company_id).update(company_id=self.company_id)
+        touch_companies([self.company_id, previous_company_id])
+        self._loaded_company_id = self.company_id
+
     class Meta:
         verbose_name = "Pekerja"
         verbose_name_plural = "Pekerja"
+        indexes = [
+            models.Index(fields=['next_expiry_date'], name='worker_next_expiry_idx'),
+            models.Index(fields=['company', 'next_expiry_date'], name='worker_company_next_expiry_idx'),
+            models.Index(fields=['company', 'expired_document_count'], name='worker_company_expired_idx'),
+            # Facet filters and default name ordering on worker_list
+            models.Index(fields=['name', 'id'], name='worker_name_idx'),
+            models.Index(fields=['company', 'name'], name='worker_company_name_idx'),
+            models.Index(fields=['nationality', 'name'], name='worker_nationality_idx'),
+            models.Index(fields=['next_expiry_type', 'next_expiry_date'], name='worker_next_type_idx'),
+            # Ownership lookup for protected media URLs
+            models.Index(fields=['photo'], name='worker_photo_idx'),
+        ]
 
 
 class Document(models.Model):
@@ -51,11 +131,19 @@ class Document(models.Model):
         EXPIRED = 'EXPIRED', 'Kedaluwarsa'
 
     worker = models.ForeignKey(Worker, verbose_name="Pekerja", on_delete=models.CASCADE, related_name='documents')
+    # Copy of worker.company, kept in sync on save so tenant-scoped queries avoid joining Worker
+    company = models.ForeignKey(Company, verbose_name="Perusahaan", on_delete=models.CASCADE, related_name='documents', editable=False)
     type = models.CharField("Jenis", max_length=20, choices=DocumentType.choices)
     document_number = models.CharField("Nomor dokumen", max_length=100)
     issue_date = models.DateField("Tanggal terbit")
     expiry_date = models.DateField("Tanggal berakhir")
     status = models.CharField("Status", max_length=20, choices=Status.choices, default=Status.ACTIVE)
+    # Copy of worker.pending_deletion, set in bulk by the schedule_*_deletion jobs,
+    # so the default manager hides these documents without a subquery on Worker
+    pending_deletion = models.BooleanField("Menunggu penghapusan", default=False, editable=False)
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
 
     def __str__(self) -> str:
         return f"{self.type} - {self.document_number} ({self.worker.name})"
@@ -67,9 +155,150 @@ class Document(models.Model):
     def is_expiring_in_days(self, days: int) -> bool:
         return 0 <= self.days_until_expiry <= days
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'worker_id' in field_names:
+            instance._loaded_worker_id = instance.worker_id
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self.worker_id:
+            self.company_id = self.worker.company_id
+            self.pending_deletion = self.worker.pending_deletion
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Dokumen"
         verbose_name_plural = "Dokumen"
+        indexes = [
+            models.Index(fields=['company', 'status', 'expiry_date'], name='doc_company_status_expiry_idx'),
+            # Facet filters on document_list, ordered by expiry
+            models.Index(fields=['expiry_date', 'id'], name='doc_expiry_idx'),
+            models.Index(fields=['type', 'status', 'expiry_date'], name='doc_type_status_expiry_idx'),
+            models.Index(fields=['status', 'expiry_date'], name='doc_status_expiry_idx'),
+            # Current document per (worker, type) in the compliance report window
+            models.Index(fields=['worker', 'type', 'expiry_date'], name='doc_worker_type_expiry_idx'),
+        ]
+
+
+def refresh_worker_summaries(worker_ids=None, batch_size=1000, today=None) -> int:
+    """Recompute the compliance summary fields of ``Worker``.
+
+    Pass ``worker_ids`` to refresh specific workers, or ``None`` to rebuild
+    every worker. Each batch costs one document query and one bulk UPDATE.
+    Returns the number of workers updated.
+    """
+    if worker_ids is None:
+        worker_ids = Worker.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size)
+    today = today or timezone.localdate()
+    all_types = [t for t, _ in Document.DocumentType.choices]
+    fields = ['next_expiry_date', 'next_expiry_type', 'expired_document_count', 'missing_document_types']
+    updated = 0
+    batch = []
+
+    def flush(ids):
+        workers = {w.pk: w for w in Worker.objects.filter(pk__in=ids).only('pk', *fields)}
+        summary = {pk: {'next': None, 'type': '', 'expired': 0, 'types': set()} for pk in workers}
+        docs = Document.objects.filter(worker_id__in=workers).values_list('worker_id', 'type', 'status', 'expiry_date')
+        for worker_id, doc_type, status, expiry_date in docs:
+            item = summary[worker_id]
+            item['types'].add(doc_type)
+            if status == Document.Status.EXPIRED or expiry_date < today:
+                item['expired'] += 1
+            elif item['next'] is None or expiry_date < item['next']:
+                item['next'], item['type'] = expiry_date, doc_type
+        for pk, worker in workers.items():
+            item = summary[pk]
+            worker.next_expiry_date = item['next']
+            worker.next_expiry_type = item['type']
+            worker.expired_document_count = item['expired']
+            worker.missing_document_types = [t for t in all_types if t not in item['types']]
+        Worker.objects.bulk_update(workers.values(), fields)
+        return len(workers)
+
+    for worker_id in worker_ids:
+        batch.append(worker_id)
+        if len(batch) >= batch_size:
+            updated += flush(batch)
+            batch = []
+    if batch:
+        updated += flush(batch)
+    return updated
+
+
+def refresh_due_worker_summaries(today=None, batch_size=1000) -> int:
+    """Refresh only workers whose nearest expiry has passed.
+
+    The summary depends on the date only through ``expiry_date < today``, so
+    the nightly refresh just has to revisit workers with ``next_expiry_date``
+    before ``today``.
+    """
+    today = today or timezone.localdate()
+    # Materialized: the refresh rewrites next_expiry_date, the column this query filters on
+    due = list(Worker.objects.filter(next_expiry_date__lt=today).order_by('pk').values_list('pk', flat=True))
+    return refresh_worker_summaries(due, batch_size, today)
+
+
+class DataVersion(models.Model):
+    """Single-row counter of document changes, bumped by ``touch_companies``.
+
+    Timestamps can commit out of order; the counter cannot, because each
+    bump holds the row lock until its transaction ends. A reader that sees
+    version N therefore sees every change made under versions up to N.
+    """
+    version = models.BigIntegerField("Versi", default=0)
+
+    @classmethod
+    def current(cls) -> int:
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls) -> None:
+        if not cls.objects.filter(pk=1).update(version=F('version') + 1):
+            cls.objects.get_or_create(pk=1, defaults={'version': 1})
+
+    class Meta:
+        verbose_name = "Versi data"
+        verbose_name_plural = "Versi data"
+
+
+def touch_companies(company_ids) -> None:
+    """Bump ``Company.data_changed_at`` and ``DataVersion`` so cached output is rebuilt.
+
+    Document/worker saves and deletes call this through signals; bulk
+    ``update()``/raw-delete paths must call it themselves.
+    """
+    ids = {pk for pk in company_ids if pk}
+    if ids:
+        Company.all_objects.filter(pk__in=ids).update(data_changed_at=timezone.now())
+        DataVersion.bump()
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def update_worker_summary(sender, instance, **kwargs):
+    # A document moved to another worker also changes the previous worker's summary
+    previous_worker_id = getattr(instance, '_loaded_worker_id', None)
+    worker_ids = {instance.worker_id, previous_worker_id} - {None}
+    refresh_worker_summaries(sorted(worker_ids))
+    if previous_worker_id and previous_worker_id != instance.worker_id:
+        touch_companies(Worker.all_objects.filter(pk__in=worker_ids).values_list('company_id', flat=True))
+    else:
+        touch_companies([instance.company_id])
+    instance._loaded_worker_id = instance.worker_id
+
+
+@receiver(post_delete, sender=Worker)
+def touch_worker_company(sender, instance, **kwargs):
+    touch_companies([instance.company_id])
+
+
+class RenewalHistoryManager(models.Manager):
+    """Default manager that hides renewals of documents queued for deletion."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(document__pending_deletion=False)
 
 
 class RenewalHistory(models.Model):
@@ -87,6 +316,11 @@ class RenewalHistory(models.Model):
     new_document_number = models.CharField("Nomor dokumen baru", max_length=100, blank=True)
     new_issue_date = models.DateField("Tanggal terbit baru", null=True, blank=True)
     new_expiry_date = models.DateField("Tanggal berakhir baru", null=True, blank=True)
+    # Document expiry the renewal was filed against; the renewal overwrites Document.expiry_date
+    previous_expiry_date = models.DateField("Tanggal berakhir sebelumnya", null=True, blank=True, editable=False)
+
+    objects = RenewalHistoryManager()
+    all_objects = models.Manager()
 
     def __str__(self) -> str:
         return f"Perpanjangan {self.document} pada {self.submission_date}"
@@ -94,6 +328,62 @@ class RenewalHistory(models.Model):
     class Meta:
         verbose_name = "Riwayat Perpanjangan"
         verbose_name_plural = "Riwayat Perpanjangan"
+        indexes = [
+            # Per-document timeline and keyset pagination on (submission_date, id)
+            models.Index(fields=['document', 'submission_date'], name='renewal_document_date_idx'),
+            models.Index(fields=['submission_date', 'id'], name='renewal_date_idx'),
+        ]
+
+
+class ArchivedDocument(models.Model):
+    """Document moved out of the hot table by ``archive_documents``.
+
+    The primary key is the original ``Document`` id so renewals keep their
+    links and a restore puts the row back unchanged.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    worker = models.ForeignKey(Worker, verbose_name="Pekerja", on_delete=models.CASCADE, related_name='archived_documents')
+    company = models.ForeignKey(Company, verbose_name="Perusahaan", on_delete=models.CASCADE, related_name='archived_documents')
+    type = models.CharField("Jenis dokumen", max_length=20, choices=Document.DocumentType.choices)
+    document_number = models.CharField("Nomor dokumen", max_length=100)
+    issue_date = models.DateField("Tanggal terbit")
+    expiry_date = models.DateField("Tanggal berakhir")
+    status = models.CharField("Status", max_length=20, choices=Document.Status.choices)
+    archived_at = models.DateTimeField("Diarsipkan", default=timezone.now)
+
+    def __str__(self) -> str:
+        return f"{self.type} - {self.document_number} (arsip)"
+
+    class Meta:
+        verbose_name = "Arsip Dokumen"
+        verbose_name_plural = "Arsip Dokumen"
+        indexes = [
+            models.Index(fields=['worker', 'expiry_date'], name='archdoc_worker_expiry_idx'),
+            models.Index(fields=['company', 'expiry_date'], name='archdoc_company_expiry_idx'),
+        ]
+
+
+class ArchivedRenewalHistory(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    document = models.ForeignKey(ArchivedDocument, verbose_name="Dokumen", on_delete=models.CASCADE, related_name='renewal_history')
+    submission_date = models.DateField("Tanggal pengajuan")
+    process_status = models.CharField("Status proses", max_length=20, choices=RenewalHistory.ProcessStatus.choices)
+    notes = models.TextField("Catatan", blank=True)
+    new_document_number = models.CharField("Nomor dokumen baru", max_length=100, blank=True)
+    new_issue_date = models.DateField("Tanggal terbit baru", null=True, blank=True)
+    new_expiry_date = models.DateField("Tanggal berakhir baru", null=True, blank=True)
+    previous_expiry_date = models.DateField("Tanggal berakhir sebelumnya", null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"Perpanjangan {self.document} pada {self.submission_date}"
+
+    class Meta:
+        verbose_name = "Arsip Riwayat Perpanjangan"
+        verbose_name_plural = "Arsip Riwayat Perpanjangan"
+        indexes = [
+            models.Index(fields=['document', 'submission_date'], name='archren_document_date_idx'),
+        ]
 
 
 class UserProfile(models.Model):
@@ -109,6 +399,366 @@ class UserProfile(models.Model):
         return f"{self.user.username} - {self.role}"
 
 
+class Job(models.Model):
+    """Background work item processed by the ``run_jobs`` worker command."""
+
+    class Status(models.TextChoices):
+        QUEUED = 'QUEUED', 'Dalam antrean'
+        RUNNING = 'RUNNING', 'Berjalan'
+        DONE = 'DONE', 'Selesai'
+        FAILED = 'FAILED', 'Gagal'
+
+    kind = models.CharField("Jenis", max_length=50)
+    payload = models.JSONField("Parameter", default=dict, blank=True)
+    status = models.CharField("Status", max_length=20, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveIntegerField("Percobaan", default=0)
+    max_attempts = models.PositiveIntegerField("Maksimum percobaan", default=3)
+    progress_done = models.PositiveIntegerField("Progres", default=0)
+    progress_total = models.PositiveIntegerField("Total", default=0)
+    message = models.CharField("Pesan", max_length=255, blank=True)
+    error = models.TextField("Galat", blank=True)
+    result_file = models.FileField("Hasil", upload_to='jobs/', blank=True)
+    created_by = models.ForeignKey(User, verbose_name="Dibuat oleh", on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField("Dibuat", auto_now_add=True)
+    run_after = models.DateTimeField("Jalankan setelah", default=timezone.now)
+    started_at = models.DateTimeField("Mulai", null=True, blank=True)
+    finished_at = models.DateTimeField("Selesai", null=True, blank=True)
+    locked_by = models.CharField("Diproses oleh", max_length=100, blank=True)
+    # Hash of kind + payload; identical exports are coalesced and reused (see jobs.request_export)
+    fingerprint = models.CharField("Sidik", max_length=64, blank=True, editable=False)
+
+    def __str__(self) -> str:
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (self.Status.DONE, self.Status.FAILED)
+
+    @property
+    def progress_percent(self) -> int:
+        if self.status == self.Status.DONE:
+            return 100
+        if not self.progress_total:
+            return 0
+        return min(100, int(self.progress_done * 100 / self.progress_total))
+
+    def report_progress(self, done: int, total: int | None = None, message: str | None = None) -> None:
+        """Persist progress with a single UPDATE so status pages see it mid-run."""
+        self.progress_done = done
+        fields = {'progress_done': done}
+        if total is not None:
+            self.progress_total = fields['progress_total'] = total
+        if message is not None:
+            self.message = fields['message'] = message[:255]
+        Job.objects.filter(pk=self.pk).update(**fields)
+
+    class Meta:
+        verbose_name = "Tugas Latar"
+        verbose_name_plural = "Tugas Latar"
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+            models.Index(fields=['created_by', 'created_at'], name='job_created_by_idx'),
+            models.Index(fields=['fingerprint', 'status'], name='job_fingerprint_idx'),
+        ]
+
+
+class NotificationLog(models.Model):
+    """One delivered reminder digest; used to throttle repeat sends per recipient."""
+
+    recipient = models.EmailField("Penerima")
+    kind = models.CharField("Jenis", max_length=50)
+    sent_at = models.DateTimeField("Dikirim", default=timezone.now)
+    document_count = models.PositiveIntegerField("Jumlah dokumen", default=0)
+
+    def __str__(self) -> str:
+        return f"{self.kind} -> {self.recipient} ({self.sent_at:%Y-%m-%d %H:%M})"
+
+    class Meta:
+        verbose_name = "Log Notifikasi"
+        verbose_name_plural = "Log Notifikasi"
+        indexes = [
+            models.Index(fields=['kind', 'recipient', 'sent_at'], name='notif_recipient_sent_idx'),
+        ]
+
+
+class ProfileReport(models.Model):
+    """cProfile call tree and captured SQL of one request (see ``ProfilingMiddleware``)."""
+
+    path = models.CharField("Path", max_length=500)
+    method = models.CharField("Metode", max_length=10)
+    query_string = models.CharField("Query string", max_length=1000, blank=True)
+    user = models.ForeignKey(User, verbose_name="User", on_delete=models.SET_NULL, null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField("Status HTTP")
+    duration_ms = models.FloatField("Durasi (ms)")
+    sql_count = models.PositiveIntegerField("Jumlah query")
+    sql_ms = models.FloatField("Durasi SQL (ms)")
+    queries = models.JSONField("Query SQL", default=list)
+    stats = models.TextField("Profil cProfile")
+    created_at = models.DateTimeField("Dibuat", auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+    @classmethod
+    def prune(cls, keep: int) -> None:
+        """Delete all but the newest ``keep`` reports."""
+        cutoff = list(cls.objects.order_by('-id').values_list('id', flat=True)[keep:keep + 1])
+        if cutoff:
+            cls.objects.filter(id__lte=cutoff[0]).delete()
+
+    class Meta:
+        verbose_name = "Laporan Profil"
+        verbose_name_plural = "Laporan Profil"
+        ordering = ['-id']
+
+
+class CalendarFeed(models.Model):
+    """Secret iCalendar feed URL of a user, for one company or everything the user can see."""
+
+    user = models.ForeignKey(User, verbose_name="User", on_delete=models.CASCADE, related_name='calendar_feeds')
+    company = models.ForeignKey(Company, verbose_name="Perusahaan", on_delete=models.CASCADE, null=True, blank=True, related_name='calendar_feeds')
+    token = models.CharField("Token", max_length=64, unique=True, default=new_feed_token, editable=False)
+    created_at = models.DateTimeField("Dibuat", auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"Kalender {self.company or 'semua perusahaan'} ({self.user.username})"
+
+    class Meta:
+        verbose_name = "Feed Kalender"
+        verbose_name_plural = "Feed Kalender"
+
+
+class AlertPolicy(models.Model):
+    """Alert windows (days before expiry) for a document type.
+
+    A row without company is the default for that type; a row with a company
+    overrides it for that company. Types without any row use
+    ``DEFAULT_DAYS``. Evaluated in SQL by ``dashboard.alerts``.
+    """
+
+    class Level(models.TextChoices):
+        URGENT = 'URGENT', 'Mendesak'
+        WARNING = 'WARNING', 'Peringatan'
+        NOTICE = 'NOTICE', 'Pemberitahuan'
+
+    DEFAULT_DAYS = {'urgent_days': 30, 'warning_days': 60, 'notice_days': 90}
+
+    document_type = models.CharField("Jenis dokumen", max_length=20, choices=Document.DocumentType.choices)
+    company = models.ForeignKey(Company, verbose_name="Perusahaan", on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='alert_policies', help_text="Kosongkan untuk aturan default jenis dokumen ini")
+    urgent_days = models.PositiveIntegerField("Mendesak (hari)", default=30)
+    warning_days = models.PositiveIntegerField("Peringatan (hari)", default=60)
+    notice_days = models.PositiveIntegerField("Pemberitahuan (hari)", default=90)
+
+    def __str__(self) -> str:
+        scope = self.company or 'default'
+        return f"{self.get_document_type_display()} ({scope}): {self.urgent_days}/{self.warning_days}/{self.notice_days} hari"
+
+    def clean(self):
+        if not self.urgent_days <= self.warning_days <= self.notice_days:
+            raise ValidationError("Urutan hari harus Mendesak ≤ Peringatan ≤ Pemberitahuan.")
+
+    class Meta:
+        verbose_name = "Aturan Peringatan"
+        verbose_name_plural = "Aturan Peringatan"
+        ordering = ['document_type', 'company__name']
+        constraints = [
+            models.UniqueConstraint(fields=['document_type', 'company'], name='alertpolicy_type_company_uniq'),
+            models.UniqueConstraint(fields=['document_type'], condition=models.Q(company__isnull=True),
+                                    name='alertpolicy_type_default_uniq'),
+        ]
+
+
+class DocumentSnapshot(models.Model):
+    """Document counts of one company and document type on one day (see ``dashboard.snapshots``)."""
+
+    date = models.DateField("Tanggal")
+    company = models.ForeignKey(Company, verbose_name="Perusahaan", on_delete=models.CASCADE, related_name='snapshots')
+    document_type = models.CharField("Jenis dokumen", max_length=20, choices=Document.DocumentType.choices)
+    active_count = models.PositiveIntegerField("Aktif", default=0)
+    expiring_count = models.PositiveIntegerField("Akan berakhir", default=0)
+    expired_count = models.PositiveIntegerField("Kedaluwarsa", default=0)
+    # Start of the run that produced the row; compared with Company.data_changed_at
+    computed_at = models.DateTimeField("Dihitung")
+
+    def __str__(self) -> str:
+        return f"{self.date} {self.company_id} {self.document_type}"
+
+    class Meta:
+        verbose_name = "Snapshot Dokumen"
+        verbose_name_plural = "Snapshot Dokumen"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'company', 'document_type'], name='snapshot_date_company_type_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['company', 'date'], name='snapshot_company_date_idx'),
+        ]
+
+
+class StoredFile(models.Model):
+    """Uploaded file content, stored once per SHA-256 and shared by every attachment of it."""
+
+    class PreviewStatus(models.TextChoices):
+        PENDING = 'PENDING', 'Diproses'
+        READY = 'READY', 'Tersedia'
+        UNSUPPORTED = 'UNSUPPORTED', 'Tidak didukung'
+        FAILED = 'FAILED', 'Gagal'
+
+    sha256 = models.CharField("SHA-256", max_length=64, unique=True)
+    size = models.BigIntegerField("Ukuran (byte)")
+    content_type = models.CharField("Tipe", max_length=100)
+    file = models.FileField("Berkas", upload_to='attachments/', max_length=200)
+    preview = models.FileField("Pratinjau", upload_to='attachments/previews/', max_length=200, blank=True)
+    preview_status = models.CharField("Status pratinjau", max_length=20, choices=PreviewStatus.choices, default=PreviewStatus.PENDING)
+    created_at = models.DateTimeField("Dibuat", auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.sha256[:12]} ({self.size} byte)"
+
+    class Meta:
+        verbose_name = "Berkas"
+        verbose_name_plural = "Berkas"
+
+
+class Attachment(models.Model):
+    """A scan attached to a document or a renewal.
+
+    The target foreign keys carry no database constraint: archiving moves
+    documents and renewals with their ids to the archive tables, and the
+    attachments follow them back on restore.
+    """
+
+    stored_file = models.ForeignKey(StoredFile, verbose_name="Berkas", on_delete=models.PROTECT, related_name='attachments')
+    document = models.ForeignKey(Document, verbose_name="Dokumen", on_delete=models.CASCADE, null=True, blank=True,
+                                 db_constraint=False, related_name='attachments')
+    renewal = models.ForeignKey(RenewalHistory, verbose_name="Perpanjangan", on_delete=models.CASCADE, null=True, blank=True,
+                                db_constraint=False, related_name='attachments')
+    filename = models.CharField("Nama berkas", max_length=255)
+    uploaded_by = models.ForeignKey(User, verbose_name="Diunggah oleh", on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField("Diunggah", auto_now_add=True)
+
+    def __str__(self) -> str:
+        return self.filename
+
+    class Meta:
+        verbose_name = "Lampiran"
+        verbose_name_plural = "Lampiran"
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(document__isnull=False, renewal__isnull=True)
+                | models.Q(document__isnull=True, renewal__isnull=False),
+                name='attachment_one_target',
+            ),
+        ]
+
+
+class UploadSession(models.Model):
+    """Resumable upload in progress; chunks are appended to a partial file on disk."""
+
+    class Status(models.TextChoices):
+        OPEN = 'OPEN', 'Berjalan'
+        COMPLETE = 'COMPLETE', 'Selesai'
+        FAILED = 'FAILED', 'Gagal'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, verbose_name="User", on_delete=models.CASCADE, related_name='upload_sessions')
+    document = models.ForeignKey(Document, verbose_name="Dokumen", on_delete=models.CASCADE, null=True, blank=True,
+                                 db_constraint=False, related_name='+')
+    renewal = models.ForeignKey(RenewalHistory, verbose_name="Perpanjangan", on_delete=models.CASCADE, null=True, blank=True,
+                                db_constraint=False, related_name='+')
+    filename = models.CharField("Nama berkas", max_length=255)
+    content_type = models.CharField("Tipe", max_length=100)
+    size = models.BigIntegerField("Ukuran (byte)")
+    sha256 = models.CharField("SHA-256", max_length=64)
+    received = models.BigIntegerField("Diterima (byte)", default=0)
+    status = models.CharField("Status", max_length=20, choices=Status.choices, default=Status.OPEN)
+    attachment = models.ForeignKey(Attachment, verbose_name="Lampiran", on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField("Dibuat", auto_now_add=True)
+    updated_at = models.DateTimeField("Diperbarui", auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.filename} ({self.received}/{self.size})"
+
+    class Meta:
+        verbose_name = "Sesi Unggah"
+        verbose_name_plural = "Sesi Unggah"
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='upload_status_updated_idx'),
+        ]
+
+
+class WebhookEndpoint(models.Model):
+    """Receiver URL for document lifecycle events (see ``dashboard.webhooks``)."""
+
+    class Event(models.TextChoices):
+        DOCUMENT_CREATED = 'document.created', 'Dokumen dibuat'
+        DOCUMENT_RENEWED = 'document.renewed', 'Dokumen diperpanjang'
+        DOCUMENT_EXPIRED = 'document.expired', 'Dokumen kedaluwarsa'
+        DOCUMENT_ALERT = 'document.alert', 'Dokumen masuk masa peringatan'
+
+    name = models.CharField("Nama", max_length=100)
+    url = models.URLField("URL", max_length=500)
+    secret = models.CharField("Secret", max_length=64, default=new_feed_token,
+                              help_text="Kunci HMAC-SHA256 untuk header X-TKA-Signature")
+    company = models.ForeignKey(Company, verbose_name="Perusahaan", on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='webhook_endpoints', help_text="Kosongkan untuk event semua perusahaan")
+    events = models.JSONField("Event", default=list, blank=True, help_text="Daftar event; kosongkan untuk semua event")
+    is_active = models.BooleanField("Aktif", default=True)
+    rate_limit_per_minute = models.PositiveIntegerField("Batas kirim per menit", default=60, help_text="0 = tanpa batas")
+    created_at = models.DateTimeField("Dibuat", auto_now_add=True)
+
+    def __str__(self) -> str:
+        return self.name
+
+    def subscribes(self, event) -> bool:
+        return not self.events or event in self.events
+
+    def clean(self):
+        unknown = set(self.events or []) - set(self.Event.values)
+        if unknown:
+            raise ValidationError(f"Event tidak dikenal: {', '.join(sorted(unknown))}")
+
+    class Meta:
+        verbose_name = "Webhook"
+        verbose_name_plural = "Webhook"
+
+
+class WebhookDelivery(models.Model):
+    """Outbox row: one event for one endpoint, written in the transaction that made the change."""
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Menunggu'
+        DELIVERED = 'DELIVERED', 'Terkirim'
+        FAILED = 'FAILED', 'Gagal'
+
+    endpoint = models.ForeignKey(WebhookEndpoint, verbose_name="Webhook", on_delete=models.CASCADE, related_name='deliveries')
+    event = models.CharField("Event", max_length=50, choices=WebhookEndpoint.Event.choices)
+    # Identifies the event; the same event is queued at most once per endpoint
+    event_key = models.CharField("Kunci event", max_length=200)
+    payload = models.JSONField("Isi", default=dict)
+    status = models.CharField("Status", max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField("Percobaan", default=0)
+    next_attempt_at = models.DateTimeField("Kirim setelah", default=timezone.now)
+    locked_by = models.CharField("Diproses oleh", max_length=64, blank=True)
+    created_at = models.DateTimeField("Dibuat", default=timezone.now)
+    delivered_at = models.DateTimeField("Terkirim", null=True, blank=True)
+    response_code = models.PositiveSmallIntegerField("Kode respons", null=True, blank=True)
+    last_error = models.TextField("Galat terakhir", blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.event} → {self.endpoint_id} ({self.status})"
+
+    class Meta:
+        verbose_name = "Pengiriman Webhook"
+        verbose_name_plural = "Pengiriman Webhook"
+        constraints = [
+            models.UniqueConstraint(fields=['endpoint', 'event_key'], name='webhookdelivery_event_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='webhook_due_idx'),
+        ]
+
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
@@ -120,4 +770,13 @@ def save_user_profile(sender, instance, **kwargs):
     if hasattr(instance, 'profile'):
         instance.profile.save()
 
-# Create your models here.
+
+@receiver(post_save, sender=AlertPolicy)
+@receiver(post_delete, sender=AlertPolicy)
+def touch_policy_companies(sender, instance, **kwargs):
+    # Policies change compliance states and alert levels in cached output;
+    # a default policy affects every company
+    if instance.company_id:
+        touch_companies([instance.company_id])
+    else:
+        touch_companies(Company.all_objects.values_list('pk', flat=True))
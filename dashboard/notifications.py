@@ -0,0 +1,147 @@
+"""Reminder digests for expiring documents.
+
+Each recipient (a company's contact email or a CLIENT user of that company)
+gets one digest covering every company they are attached to. Documents
+inside their type's alert window (see ``dashboard.alerts``) are picked from
+the shared expiry index (``dashboard.expiry_index``, or read in a single
+query when it is disabled), the digest templates are compiled once and
+rendered once per recipient, and all messages go out over one reused email
+connection. Recipients that already got a digest within
+``NOTIFICATION_THROTTLE_HOURS`` are skipped.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import get_template
+from django.utils import timezone
+
+from . import alerts, expiry_index, metrics
+from .models import AlertPolicy, Company, Document, UserProfile, NotificationLog
+
+
+DIGEST_KIND = 'document_digest'
+LEVEL_LABELS = dict(AlertPolicy.Level.choices)
+
+
+DIGEST_FIELDS = ['id', 'company_id', 'company__name', 'worker__name', 'type', 'document_number', 'expiry_date']
+
+
+def digest_rows(today):
+    """Documents inside an alert window, as dicts ordered by company then expiry (SQL path)."""
+    return (
+        alerts.with_alert_level(Document.objects.all(), today)
+        .order_by('company__name', 'company_id', 'expiry_date', 'id')
+        .values(*DIGEST_FIELDS, 'alert_level')
+    )
+
+
+def build_digests(today=None):
+    """Return ``(digests, companies)``.
+
+    ``companies`` maps company id to ``{'name', 'documents'}`` for every
+    company with documents inside an alert window;
+    ``digests`` maps each recipient email to the list of those companies
+    it should hear about.
+    """
+    today = today or timezone.localdate()
+    companies = {}
+    if settings.EXPIRY_INDEX_ENABLED:
+        # Hits come in expiry order, so each company's list still is
+        rows = expiry_index.current().with_alert_level(Document.objects.values(*DIGEST_FIELDS), today)
+    else:
+        rows = digest_rows(today).iterator(chunk_size=2000)
+    for row in rows:
+        company = companies.setdefault(row['company_id'], {'name': row['company__name'], 'documents': []})
+        days_left = (row['expiry_date'] - today).days
+        row['days_left'] = days_left
+        row['level'] = LEVEL_LABELS[row['alert_level']]
+        company['documents'].append(row)
+
+    recipients = defaultdict(set)
+    contacts = (
+        Company.objects.filter(pk__in=list(companies))
+        .exclude(contact_email='')
+        .values_list('pk', 'contact_email')
+    )
+    users = (
+        User.objects.filter(
+            is_active=True,
+            profile__role=UserProfile.Role.CLIENT,
+            profile__company_id__in=list(companies),
+        )
+        .exclude(email='')
+        .values_list('profile__company_id', 'email')
+    )
+    for company_id, email in [*contacts, *users]:
+        recipients[email.strip().lower()].add(company_id)
+
+    digests = {
+        email: [companies[pk] for pk in sorted(ids, key=lambda pk: companies[pk]['name'])]
+        for email, ids in recipients.items()
+    }
+    return digests, companies
+
+
+def send_digests(today=None, dry_run=False, connection=None):
+    """Build and send the reminder digests; returns a summary dict."""
+    today = today or timezone.localdate()
+    digests, companies = build_digests(today)
+
+    cutoff = timezone.now() - timedelta(hours=settings.NOTIFICATION_THROTTLE_HOURS)
+    recent = set(
+        NotificationLog.objects.filter(kind=DIGEST_KIND, sent_at__gte=cutoff)
+        .values_list('recipient', flat=True)
+    )
+    pending = {email: sections for email, sections in digests.items() if email not in recent}
+
+    levels = {label: 0 for label in LEVEL_LABELS.values()}
+    for company in companies.values():
+        for doc in company['documents']:
+            levels[doc['level']] += 1
+    summary = {
+        'companies': len(companies),
+        'documents': sum(levels.values()),
+        'levels': levels,
+        'recipients': len(digests),
+        'throttled': len(digests) - len(pending),
+        'sent': 0,
+    }
+    if dry_run:
+        return summary
+    metrics.REMINDER_DIGESTS.labels('throttled').inc(summary['throttled'])
+    if not pending:
+        return summary
+
+    text_template = get_template('emails/document_digest.txt')
+    html_template = get_template('emails/document_digest.html')
+    messages = []
+    for email, sections in pending.items():
+        total = sum(len(section['documents']) for section in sections)
+        context = {'recipient': email, 'companies': sections, 'total': total, 'today': today}
+        message = EmailMultiAlternatives(
+            subject=f"Reminder dokumen TKA: {total} dokumen akan berakhir",
+            body=text_template.render(context),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[email],
+        )
+        message.attach_alternative(html_template.render(context), 'text/html')
+        message.document_count = total
+        messages.append(message)
+
+    connection = connection or get_connection()
+    batch_size = settings.NOTIFICATION_BATCH_SIZE
+    with connection:
+        for start in range(0, len(messages), batch_size):
+            batch = messages[start:start + batch_size]
+            connection.send_messages(batch)
+            now = timezone.now()
+            NotificationLog.objects.bulk_create([
+                NotificationLog(recipient=m.to[0], kind=DIGEST_KIND, sent_at=now, document_count=m.document_count)
+                for m in batch
+            ])
+            summary['sent'] += len(batch)
+            metrics.REMINDER_DIGESTS.labels('sent').inc(len(batch))
+    return summary
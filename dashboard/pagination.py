@@ -0,0 +1,136 @@
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset.
+
+    Iterating yields the rows of the page. ``next_cursor`` is the opaque
+    cursor for the following page, or ``None`` on the last page.
+    """
+
+    def __init__(self, object_list, cursor, next_cursor):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return bool(self.cursor)
+
+
+def _encode_cursor(date_value, pk) -> str:
+    return f"{date_value.isoformat()}.{pk}"
+
+
+def _decode_cursor(cursor):
+    try:
+        date_part, pk_part = cursor.split('.', 1)
+        return datetime.date.fromisoformat(date_part), int(pk_part)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_paginate(queryset, cursor, per_page, date_field):
+    """Return a ``KeysetPage`` ordered by ``date_field`` then ``id``, newest first.
+
+    Unlike ``Paginator`` this never counts the queryset or uses ``OFFSET``:
+    each page is a range read that continues from the last row of the
+    previous one, so deep pages cost the same as the first. An invalid
+    cursor falls back to the first page.
+    """
+    queryset = queryset.order_by(f'-{date_field}', '-id')
+    position = _decode_cursor(cursor) if cursor else None
+    if position:
+        date_value, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__lt': date_value})
+            | Q(**{date_field: date_value, 'id__lt': pk})
+        )
+    else:
+        cursor = None
+    rows = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = _encode_cursor(getattr(last, date_field), last.pk)
+    return KeysetPage(rows, cursor, next_cursor)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that avoids exact ``COUNT(*)`` on large result sets.
+
+    On PostgreSQL the planner estimate is used first: ``reltuples`` for
+    an unfiltered queryset, or the row estimate of ``EXPLAIN`` for a
+    filtered one. When that estimate is at least ``threshold`` it is used
+    as the count and ``is_estimated`` is set, so templates can show the
+    total as approximate. Smaller results (and other backends) get an
+    exact count, cached for ``cache_timeout`` seconds under ``cache_key``
+    when one is given.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True,
+                 threshold=None, cache_key=None, cache_timeout=None):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.threshold = settings.PAGINATOR_ESTIMATE_THRESHOLD if threshold is None else threshold
+        self.cache_key = cache_key
+        self.cache_timeout = settings.PAGINATOR_COUNT_CACHE_SECONDS if cache_timeout is None else cache_timeout
+        self.is_estimated = False
+
+    @cached_property
+    def count(self):
+        estimate = self._planner_estimate()
+        if estimate is not None and estimate >= self.threshold:
+            self.is_estimated = True
+            return estimate
+        if not self.cache_key:
+            return super().count
+        key = 'paginator-count:' + hashlib.md5(self.cache_key.encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, self.cache_timeout)
+        return count
+
+    def _planner_estimate(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is None or query.distinct or query.combinator:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            if not query.where.children:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+                # reltuples is -1 (or 0) until the table has been analyzed
+                return row[0] if row and row[0] and row[0] > 0 else None
+            sql, params = queryset.order_by().values('pk').query.sql_with_params()
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
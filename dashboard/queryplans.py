@@ -0,0 +1,259 @@
+"""Query-plan capture and regression checks for the hot read paths.
+
+``canonical_queries`` builds the queries behind the dashboard alert window,
+the (client-scoped) lists, search, autocomplete, exports, reminders and the
+compliance chain the same way the views and jobs build them. ``capture``
+runs ``EXPLAIN QUERY PLAN`` on SQLite or ``EXPLAIN (ANALYZE, BUFFERS, FORMAT
+JSON)`` on PostgreSQL and reduces each plan to its table accesses (index
+search, index-ordered scan, automatic index, full scan), sorts and total
+cost. ``compare`` checks a capture against the committed baseline in
+``query_plans/<vendor>.json`` and reports accesses that got worse, new
+sorts and cost increases above a threshold.
+"""
+import json
+import random
+import re
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import alerts, compliance
+from .exports import document_export_queryset, worker_export_queryset
+from .filters import document_facets, filter_queryset, worker_facets, worker_search_q
+from .models import Company, Document, RenewalHistory, Worker, refresh_worker_summaries
+from .notifications import digest_rows
+
+
+BASELINE_DIR = Path(__file__).resolve().parent / 'query_plans'
+PAGE_SIZE = 25
+
+# Access kinds from best to worst
+SEARCH, INDEX_SCAN, AUTO_INDEX, FULL_SCAN, SORT = 'search', 'index scan', 'automatic index', 'full scan', 'sort'
+RANK = {SEARCH: 0, INDEX_SCAN: 1, AUTO_INDEX: 2, FULL_SCAN: 3}
+
+
+def baseline_path(vendor=None) -> Path:
+    return BASELINE_DIR / f'{vendor or connection.vendor}.json'
+
+
+def seed_dataset(workers=3000, seed=0):
+    """Fill an empty database with a deterministic dataset shaped like production."""
+    rng = random.Random(seed)
+    today = timezone.localdate()
+    types = Document.DocumentType.values
+    nationalities = ['CN', 'IN', 'JP', 'KR', 'MY', 'PH', 'US', 'VN']
+    with transaction.atomic():
+        companies = Company.objects.bulk_create([
+            Company(name=f'Perusahaan {i:03d}', contact_email=f'hr{i}@example.com')
+            for i in range(max(1, workers // 100))
+        ])
+        created = Worker.objects.bulk_create([
+            Worker(
+                name=f'Pekerja {i:05d}', passport_number=f'QP{i:07d}', nationality=rng.choice(nationalities),
+                birth_date=date(1970, 1, 1) + timedelta(days=rng.randrange(12000)),
+                company=companies[i % len(companies)], position='Staf',
+            )
+            for i in range(workers)
+        ], batch_size=1000)
+        documents = []
+        for worker in created:
+            # Most workers hold the whole chain, some miss a link
+            for doc_type in types[:rng.choice([4, 5, 6, 6, 6])]:
+                expiry = today + timedelta(days=rng.randrange(-400, 900))
+                documents.append(Document(
+                    worker=worker, company_id=worker.company_id, type=doc_type,
+                    document_number=f'{doc_type}-{worker.pk}', issue_date=expiry - timedelta(days=365),
+                    expiry_date=expiry,
+                    status=Document.Status.EXPIRED if expiry < today else Document.Status.ACTIVE,
+                ))
+        documents = Document.objects.bulk_create(documents, batch_size=1000)
+        RenewalHistory.objects.bulk_create([
+            RenewalHistory(
+                document=doc, submission_date=doc.expiry_date - timedelta(days=rng.randrange(10, 60)),
+                process_status=rng.choice(RenewalHistory.ProcessStatus.values), previous_expiry_date=doc.expiry_date,
+            )
+            for doc in documents if rng.random() < 0.3
+        ], batch_size=1000)
+    refresh_worker_summaries()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def canonical_queries(company_id, today=None) -> dict:
+    """``{name: queryset or (sql, params)}`` for the hot read paths."""
+    from .views import WORKER_SORTS
+
+    today = today or timezone.localdate()
+    window = {'berakhir_dari': today.isoformat(), 'berakhir_sampai': (today + timedelta(days=90)).isoformat()}
+    dashboard = Document.objects.select_related('worker', 'worker__company').order_by('expiry_date')
+    workers = Worker.objects.select_related('company')
+    documents = Document.objects.select_related('worker').order_by('expiry_date', 'id')
+    return {
+        'dashboard_window': alerts.with_alert_level(dashboard, today),
+        'dashboard_window_client': alerts.with_alert_level(dashboard.filter(company_id=company_id), today, company_id),
+        'worker_list': workers.order_by(*WORKER_SORTS[''])[:PAGE_SIZE],
+        'worker_list_client_urgency': workers.filter(company_id=company_id).order_by(*WORKER_SORTS['urgensi'])[:PAGE_SIZE],
+        'worker_list_client_facets': filter_queryset(
+            workers.filter(company_id=company_id), worker_facets(), {'status': 'segera'}, 'next_expiry_date'
+        ).order_by(*WORKER_SORTS[''])[:PAGE_SIZE],
+        'worker_search': workers.filter(worker_search_q('Pekerja 0001')).order_by(*WORKER_SORTS[''])[:PAGE_SIZE],
+        'worker_autocomplete': Worker.objects.only('id', 'name', 'passport_number').filter(
+            Q(name__istartswith='Pekerja 01') | Q(passport_number__istartswith='Pekerja 01')
+        ).order_by('name', 'id')[:PAGE_SIZE],
+        'document_list': documents[:PAGE_SIZE],
+        'document_list_client_facets': filter_queryset(
+            documents.filter(company_id=company_id), document_facets(),
+            {'jenis': 'KITAS', 'status': Document.Status.ACTIVE, **window}, 'expiry_date',
+        )[:PAGE_SIZE],
+        'renewal_list_client': RenewalHistory.objects.select_related('document', 'document__worker')
+        .filter(document__company_id=company_id).order_by('-submission_date', '-id')[:PAGE_SIZE + 1],
+        'export_workers_client': worker_export_queryset(company_id),
+        'export_documents_filtered': document_export_queryset(None, {'status': Document.Status.ACTIVE, **window}),
+        'reminder_digest': digest_rows(today),
+        'compliance_client': compliance._states_sql(company_id, None, today),
+    }
+
+
+def _sql(query):
+    if isinstance(query, tuple):
+        return query
+    return query.query.sql_with_params()
+
+
+_SQLITE_ACCESS = re.compile(r'^(SCAN|SEARCH) (\S+)(?: USING (.+?))?(?: \(.*\))?$')
+_SQLITE_INDEX = re.compile(r'(?:COVERING )?INDEX (\S+)')
+
+
+def _sqlite_access(detail):
+    if detail.startswith('USE TEMP B-TREE'):
+        return [SORT, '', '']
+    match = _SQLITE_ACCESS.match(detail)
+    if not match:
+        return None
+    op, table, using = match.groups()
+    if using and using.startswith('AUTOMATIC'):
+        return [AUTO_INDEX, table, '']
+    index = ''
+    if using:
+        found = _SQLITE_INDEX.match(using)
+        index = found.group(1) if found else using
+    if op == 'SEARCH':
+        return [SEARCH, table, index]
+    return [INDEX_SCAN if using else FULL_SCAN, table, index]
+
+
+def _explain_sqlite(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        rows = cursor.fetchall()
+    depth = {0: -1}
+    lines, accesses = [], []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+        access = _sqlite_access(detail)
+        if access:
+            accesses.append(access)
+    return {'plan': lines, 'accesses': accesses, 'cost': None, 'buffers': None}
+
+
+def _pg_nodes(node, depth=0):
+    yield node, depth
+    for child in node.get('Plans', []):
+        yield from _pg_nodes(child, depth + 1)
+
+
+def _explain_postgresql(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}', params)
+        result = cursor.fetchone()[0]
+    if isinstance(result, str):
+        result = json.loads(result)
+    root = result[0]['Plan']
+    lines, accesses = [], []
+    for node, depth in _pg_nodes(root):
+        kind = node['Node Type']
+        table = node.get('Alias') or node.get('Relation Name', '')
+        line = kind
+        if node.get('Index Name'):
+            line += f" using {node['Index Name']}"
+        if table:
+            line += f' on {table}'
+        lines.append('  ' * depth + f"{line} (cost={node['Total Cost']:.0f} rows={node['Plan Rows']})")
+        if kind == 'Seq Scan':
+            accesses.append([FULL_SCAN, table, ''])
+        elif kind in ('Index Scan', 'Index Only Scan'):
+            accesses.append([SEARCH if 'Index Cond' in node else INDEX_SCAN, table, node['Index Name']])
+        elif kind == 'Bitmap Heap Scan':
+            indexes = [n.get('Index Name', '') for n, _ in _pg_nodes(node) if n['Node Type'] == 'Bitmap Index Scan']
+            accesses.append([SEARCH, table, ','.join(indexes)])
+        elif kind in ('Sort', 'Incremental Sort'):
+            accesses.append([SORT, '', ''])
+    buffers = root.get('Shared Hit Blocks', 0) + root.get('Shared Read Blocks', 0)
+    return {'plan': lines, 'accesses': accesses, 'cost': root['Total Cost'], 'buffers': buffers}
+
+
+def capture(queries) -> dict:
+    """Explain every query of ``queries``; returns ``{name: plan summary}``."""
+    if connection.vendor == 'postgresql':
+        explain = _explain_postgresql
+    elif connection.vendor == 'sqlite':
+        explain = _explain_sqlite
+    else:
+        raise NotImplementedError(f'EXPLAIN untuk {connection.vendor} belum didukung')
+    return {name: explain(*_sql(query)) for name, query in queries.items()}
+
+
+def _by_table(accesses):
+    tables = {}
+    for kind, table, index in accesses:
+        if kind != SORT:
+            tables.setdefault(table, []).append((kind, index))
+    return tables
+
+
+def compare(baseline, current, cost_threshold=0.5):
+    """Return ``(regressions, changes)`` as lists of messages for one query."""
+    regressions, changes = [], []
+    base_tables, cur_tables = _by_table(baseline['accesses']), _by_table(current['accesses'])
+    for table, accesses in cur_tables.items():
+        kinds = Counter(kind for kind, _ in accesses)
+        base = base_tables.get(table, [])
+        base_kinds = Counter(kind for kind, _ in base)
+        worst = max(RANK[kind] for kind in kinds)
+        base_worst = max((RANK[kind] for kind in base_kinds), default=RANK[INDEX_SCAN])
+        slow = kinds[FULL_SCAN] + kinds[AUTO_INDEX]
+        if worst > base_worst or slow > base_kinds[FULL_SCAN] + base_kinds[AUTO_INDEX]:
+            was = ', '.join(sorted(base_kinds)) or 'tidak diakses'
+            regressions.append(f"{table}: {was} → {', '.join(sorted(kinds))}")
+            continue
+        indexes, base_indexes = sorted(i for _, i in accesses), sorted(i for _, i in base)
+        if base and indexes != base_indexes:
+            changes.append(f"{table}: indeks {', '.join(base_indexes) or '-'} → {', '.join(indexes) or '-'}")
+    sorts = sum(1 for kind, *_ in current['accesses'] if kind == SORT)
+    base_sorts = sum(1 for kind, *_ in baseline['accesses'] if kind == SORT)
+    if sorts > base_sorts:
+        regressions.append(f'sort tambahan: {base_sorts} → {sorts}')
+    elif sorts < base_sorts:
+        changes.append(f'sort berkurang: {base_sorts} → {sorts}')
+    cost, base_cost = current.get('cost'), baseline.get('cost')
+    if cost is not None and base_cost:
+        if cost > base_cost * (1 + cost_threshold):
+            regressions.append(f'biaya {base_cost:.0f} → {cost:.0f} (+{(cost / base_cost - 1) * 100:.0f}%)')
+    return regressions, changes
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def write_baseline(path, plans, meta):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump({'meta': meta, 'queries': plans}, fh, indent=2, sort_keys=True, ensure_ascii=False)
+        fh.write('\n')
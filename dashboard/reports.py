@@ -0,0 +1,152 @@
+"""Per-company compliance report.
+
+All companies are computed by one SQL statement: a ``ROW_NUMBER`` window
+picks each worker's current document per type, conditional aggregates
+turn those into complete-set and overdue counts, and renewal lead time is
+measured against ``RenewalHistory.previous_expiry_date``, the expiry each
+renewal was filed against. Results are cached per scope and day.
+"""
+import io
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .models import Company, Worker, Document, RenewalHistory
+
+
+DOCUMENT_TYPES = [t for t, _ in Document.DocumentType.choices]
+
+XLSX_HEADER = (
+    ['Perusahaan', 'Jumlah Pekerja', 'Dokumen Lengkap & Berlaku', '% Lengkap']
+    + [f'Kedaluwarsa {t}' for t in DOCUMENT_TYPES]
+    + ['Total Kedaluwarsa', 'Jumlah Perpanjangan', 'Rata-rata Hari Sebelum Berakhir']
+)
+
+
+def _days_between(later, earlier):
+    if connection.vendor == 'postgresql':
+        return f'({later} - {earlier})'
+    return f'(julianday({later}) - julianday({earlier}))'
+
+
+def _report_sql(company_id):
+    overdue_columns = ',\n'.join(
+        f"SUM(CASE WHEN type = %s AND is_overdue = 1 THEN 1 ELSE 0 END) AS overdue_{i}"
+        for i in range(len(DOCUMENT_TYPES))
+    )
+    sql = f"""
+        WITH latest AS (
+            SELECT d.company_id, d.worker_id, d.type,
+                   CASE WHEN d.status = %s AND d.expiry_date >= %s THEN 1 ELSE 0 END AS is_valid,
+                   CASE WHEN d.status = %s OR d.expiry_date < %s THEN 1 ELSE 0 END AS is_overdue,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY d.worker_id, d.type ORDER BY d.expiry_date DESC, d.id DESC
+                   ) AS rn
+            FROM {Document._meta.db_table} d
+        ),
+        current_docs AS (
+            SELECT l.* FROM latest l
+            JOIN {Worker._meta.db_table} w ON w.id = l.worker_id AND w.pending_deletion = %s
+            WHERE l.rn = 1
+        ),
+        per_worker AS (
+            SELECT w.company_id, w.id, COALESCE(SUM(cd.is_valid), 0) AS valid_types
+            FROM {Worker._meta.db_table} w
+            LEFT JOIN current_docs cd ON cd.worker_id = w.id
+            WHERE w.pending_deletion = %s
+            GROUP BY w.company_id, w.id
+        ),
+        worker_stats AS (
+            SELECT company_id, COUNT(*) AS worker_count,
+                   SUM(CASE WHEN valid_types = %s THEN 1 ELSE 0 END) AS complete_count
+            FROM per_worker
+            GROUP BY company_id
+        ),
+        overdue AS (
+            SELECT company_id, {overdue_columns}
+            FROM current_docs
+            GROUP BY company_id
+        ),
+        renewals AS (
+            SELECT d.company_id, r.submission_date, r.previous_expiry_date
+            FROM {RenewalHistory._meta.db_table} r
+            JOIN {Document._meta.db_table} d ON d.id = r.document_id
+            JOIN {Worker._meta.db_table} w ON w.id = d.worker_id AND w.pending_deletion = %s
+        ),
+        lead_time AS (
+            SELECT company_id, COUNT(*) AS renewal_count,
+                   AVG({_days_between('previous_expiry_date', 'submission_date')}) AS avg_lead_days
+            FROM renewals
+            WHERE previous_expiry_date IS NOT NULL
+            GROUP BY company_id
+        )
+        SELECT c.id, c.name,
+               COALESCE(ws.worker_count, 0), COALESCE(ws.complete_count, 0),
+               {', '.join(f'COALESCE(o.overdue_{i}, 0)' for i in range(len(DOCUMENT_TYPES)))},
+               COALESCE(lt.renewal_count, 0), lt.avg_lead_days
+        FROM {Company._meta.db_table} c
+        LEFT JOIN worker_stats ws ON ws.company_id = c.id
+        LEFT JOIN overdue o ON o.company_id = c.id
+        LEFT JOIN lead_time lt ON lt.company_id = c.id
+        WHERE c.pending_deletion = %s {'AND c.id = %s' if company_id else ''}
+        ORDER BY c.name, c.id
+    """
+    today = timezone.localdate()
+    params = [
+        Document.Status.ACTIVE, today, Document.Status.EXPIRED, today,
+        False, False, len(DOCUMENT_TYPES), *DOCUMENT_TYPES, False, False,
+    ]
+    if company_id:
+        params.append(company_id)
+    return sql, params
+
+
+def compliance_report(company_id=None):
+    """Return one dict per company (or only ``company_id``), cached per day."""
+    key = f'compliance-report:{company_id or "all"}:{timezone.localdate().isoformat()}'
+    rows = cache.get(key)
+    if rows is not None:
+        return rows
+    sql, params = _report_sql(company_id)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        result = cursor.fetchall()
+    rows = []
+    n_types = len(DOCUMENT_TYPES)
+    for row in result:
+        pk, name, workers, complete = row[:4]
+        overdue = dict(zip(DOCUMENT_TYPES, row[4:4 + n_types]))
+        renewal_count, avg_lead = row[4 + n_types:]
+        rows.append({
+            'id': pk,
+            'name': name,
+            'workers': workers,
+            'complete': complete,
+            'complete_percent': round(complete * 100 / workers, 1) if workers else None,
+            'overdue': overdue,
+            'overdue_counts': list(overdue.values()),
+            'overdue_total': sum(overdue.values()),
+            'renewal_count': renewal_count,
+            'avg_lead_days': round(float(avg_lead), 1) if avg_lead is not None else None,
+        })
+    cache.set(key, rows, settings.REPORT_CACHE_SECONDS)
+    return rows
+
+
+def write_compliance_xlsx(rows) -> bytes:
+    """Render report rows as an XLSX workbook (streamed, write-only mode)."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Kepatuhan')
+    sheet.append(XLSX_HEADER)
+    for row in rows:
+        sheet.append(
+            [row['name'], row['workers'], row['complete'], row['complete_percent']]
+            + row['overdue_counts']
+            + [row['overdue_total'], row['renewal_count'], row['avg_lead_days']]
+        )
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
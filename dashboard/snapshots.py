@@ -0,0 +1,123 @@
+"""Daily document-count snapshots for trend charts.
+
+``take_snapshot`` writes one ``DocumentSnapshot`` row per company, document
+type and day. Only companies whose ``data_changed_at`` is newer than the
+previous run are recounted from ``Document``; every other company starts
+from its previous rows and applies the documents that crossed a date
+boundary since then (expired, or entered the expiring window), read from
+one index range scan over ``expiry_date``. Trend queries then aggregate a
+few hundred snapshot rows instead of scanning ``Document``.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from .models import Company, Document, DocumentSnapshot
+
+
+COUNT_FIELDS = ['active_count', 'expiring_count', 'expired_count']
+
+
+def _full_counts(companies, day, window):
+    """Count documents of ``companies`` (a queryset) from scratch."""
+    valid = Q(status=Document.Status.ACTIVE, expiry_date__gte=day)
+    rows = (
+        Document.objects.filter(company__in=companies)
+        .values('company_id', 'type')
+        .annotate(
+            active_count=Count('pk', filter=valid),
+            expiring_count=Count('pk', filter=valid & Q(expiry_date__lte=day + timedelta(days=window))),
+            expired_count=Count('pk', filter=~valid),
+        )
+    )
+    return {(r['company_id'], r['type']): [r[f] for f in COUNT_FIELDS] for r in rows}
+
+
+def _incremental_counts(previous, prev_day, day, window, skip):
+    """Roll ``previous`` counts forward from ``prev_day`` to ``day`` for companies not in ``skip``."""
+    counts = {key: list(values) for key, values in previous.items() if key[0] not in skip}
+    # Active documents whose expiry passed, or that moved into the expiring window
+    crossings = (
+        Document.objects.filter(
+            status=Document.Status.ACTIVE,
+            expiry_date__gte=prev_day,
+            expiry_date__lte=day + timedelta(days=window),
+        )
+        .values('company_id', 'type')
+        .annotate(
+            expired=Count('pk', filter=Q(expiry_date__lt=day)),
+            left_window=Count('pk', filter=Q(expiry_date__lt=day, expiry_date__lte=prev_day + timedelta(days=window))),
+            entered_window=Count('pk', filter=Q(expiry_date__gte=day, expiry_date__gt=prev_day + timedelta(days=window))),
+        )
+    )
+    for row in crossings:
+        key = (row['company_id'], row['type'])
+        if key[0] in skip:
+            continue
+        active, expiring, expired = counts.get(key, [0, 0, 0])
+        counts[key] = [
+            active - row['expired'],
+            expiring - row['left_window'] + row['entered_window'],
+            expired + row['expired'],
+        ]
+    return counts
+
+
+def take_snapshot(day=None, full=False) -> dict:
+    """Write the snapshot rows for ``day`` (default today); returns a summary dict."""
+    day = day or timezone.localdate()
+    window = settings.SNAPSHOT_EXPIRING_DAYS
+    started = timezone.now()
+    companies = Company.objects.all()
+
+    prev_day = DocumentSnapshot.objects.filter(date__lt=day).aggregate(d=Max('date'))['d']
+    if full or prev_day is None:
+        counts = _full_counts(companies, day, window)
+        recounted = companies.count()
+    else:
+        prev_rows = DocumentSnapshot.objects.filter(date=prev_day)
+        prev_run = prev_rows.aggregate(t=Min('computed_at'))['t']
+        previous = {(r.company_id, r.document_type): [getattr(r, f) for f in COUNT_FIELDS] for r in prev_rows}
+        changed = companies.filter(data_changed_at__gt=prev_run)
+        changed_ids = set(changed.values_list('pk', flat=True))
+        counts = _incremental_counts(previous, prev_day, day, window, changed_ids)
+        counts.update(_full_counts(changed, day, window))
+        # Companies removed since the previous run drop out
+        live = set(companies.values_list('pk', flat=True))
+        counts = {key: values for key, values in counts.items() if key[0] in live}
+        recounted = len(changed_ids)
+
+    rows = [
+        DocumentSnapshot(
+            date=day, company_id=company_id, document_type=doc_type, computed_at=started,
+            **dict(zip(COUNT_FIELDS, values)),
+        )
+        for (company_id, doc_type), values in counts.items()
+        if any(values)
+    ]
+    with transaction.atomic():
+        DocumentSnapshot.objects.filter(date=day).delete()
+        DocumentSnapshot.objects.bulk_create(rows, batch_size=1000)
+    return {'date': day, 'previous': prev_day, 'rows': len(rows), 'recounted': recounted}
+
+
+def trend(company_id=None, document_type=None, days=365, today=None) -> dict:
+    """Daily totals for the last ``days`` days, summed over the selected companies and types."""
+    today = today or timezone.localdate()
+    qs = DocumentSnapshot.objects.filter(date__gt=today - timedelta(days=days), date__lte=today)
+    if company_id:
+        qs = qs.filter(company_id=company_id)
+    if document_type:
+        qs = qs.filter(document_type=document_type)
+    rows = qs.values('date').annotate(**{f: Sum(f) for f in COUNT_FIELDS}).order_by('date')
+    series = defaultdict(list)
+    dates = []
+    for row in rows:
+        dates.append(row['date'].isoformat())
+        for field in COUNT_FIELDS:
+            series[field].append(row[field])
+    return {'dates': dates, **{field: series[field] for field in COUNT_FIELDS}}
@@ -1,3 +1,660 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, time, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date
+
+from . import alerts, compliance, expiry_index, jobs, reports, snapshots, webhooks
+from .admin import NationalityListFilter
+from .archive import archive_documents
+from .models import (
+    AlertPolicy, ArchivedDocument, Attachment, CalendarFeed, Company, DataVersion, Document, DocumentSnapshot, Job,
+    ProfileReport, RenewalHistory, StoredFile, WebhookDelivery, WebhookEndpoint, Worker, refresh_due_worker_summaries,
+)
+
+
+def make_document(company, name='W1', doc_type=Document.DocumentType.KITAS, days=60):
+    worker = Worker.objects.create(
+        name=name, passport_number=f'P-{company.pk}-{name}', nationality='CN',
+        birth_date=date(1990, 1, 1), company=company, position='Staf',
+    )
+    today = timezone.localdate()
+    return Document.objects.create(
+        worker=worker, type=doc_type, document_number=f'{doc_type}-{worker.pk}',
+        issue_date=today - timedelta(days=300), expiry_date=today + timedelta(days=days),
+    )
+
+
+def client_for(company, username):
+    """Logged-in test client of a CLIENT user of ``company``."""
+    user = User.objects.create_user(username, f'{username}@example.com', 'pw')
+    user.profile.role = 'CLIENT'
+    user.profile.company = company
+    user.profile.save()
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+class MetricsAccessTests(TestCase):
+    @override_settings(METRICS_TOKEN='', METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_refused_without_token_even_from_loopback(self):
+        response = self.client.get('/metrics', REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='rahasia', METRICS_ALLOWED_IPS=[])
+    def test_bearer_token_required(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer salah').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer rahasia')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='rahasia', METRICS_ALLOWED_IPS=['10.0.0.0/8'])
+    def test_allowed_ips_limit_token_holders(self):
+        headers = {'HTTP_AUTHORIZATION': 'Bearer rahasia'}
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1', **headers).status_code, 403)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3', **headers).status_code, 200)
+
+
+class AttachmentDedupTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        patcher = override_settings(MEDIA_ROOT=media, ATTACHMENT_UPLOAD_DIR=Path(media) / 'uploads')
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.data = b'%PDF-1.4 ' + os.urandom(2000)
+        self.sha256 = hashlib.sha256(self.data).hexdigest()
+        self.doc_a = make_document(Company.objects.create(name='Alpha'))
+        self.doc_b = make_document(Company.objects.create(name='Beta'))
+
+    def _open(self, client, document):
+        return client.post(
+            reverse('document_attachments', args=[document.pk]),
+            json.dumps({'filename': 'scan.pdf', 'size': len(self.data), 'sha256': self.sha256}),
+            content_type='application/json',
+        ).json()
+
+    def _upload(self, client, document):
+        session = self._open(client, document)
+        if not session['complete']:
+            session = client.generic(
+                'PATCH', session['url'], self.data,
+                content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET='0',
+            ).json()
+        return session
+
+    def test_hash_of_other_tenant_requires_bytes(self):
+        self._upload(client_for(self.doc_a.company, 'alpha'), self.doc_a)
+        beta = client_for(self.doc_b.company, 'beta')
+        session = self._open(beta, self.doc_b)
+        self.assertFalse(session['complete'])
+        self.assertEqual(session['offset'], 0)
+        session = self._upload(beta, self.doc_b)
+        self.assertTrue(session['complete'])
+        # Same content is still stored once
+        self.assertEqual(StoredFile.objects.count(), 1)
+        self.assertEqual(Attachment.objects.count(), 2)
+
+    def test_hash_visible_to_uploader_is_attached_without_bytes(self):
+        alpha = client_for(self.doc_a.company, 'alpha')
+        self._upload(alpha, self.doc_a)
+        other = make_document(self.doc_a.company, 'W2')
+        session = self._open(alpha, other)
+        self.assertTrue(session['complete'])
+        self.assertEqual(Attachment.objects.filter(document=other).count(), 1)
+
+
+class StubReceiver(BaseHTTPRequestHandler):
+    """Records each POST; ``/gagal`` answers 503 with Retry-After like an overloaded receiver."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.received.append((self.path, self.headers[webhooks.SIGNATURE_HEADER], body))
+        if self.path == '/gagal':
+            self.send_response(503)
+            self.send_header('Retry-After', '120')
+        else:
+            self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(WEBHOOK_BACKOFF_SECONDS=30, WEBHOOK_MAX_ATTEMPTS=3, WEBHOOK_TIMEOUT_SECONDS=5)
+class WebhookDeliveryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubReceiver)
+        cls.server.received = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.received.clear()
+        self.document = make_document(Company.objects.create(name='Alpha'))
+
+    def _endpoint(self, path, **kwargs):
+        return WebhookEndpoint.objects.create(name=path, url=self.base_url + path, **kwargs)
+
+    def test_delivery_is_signed_with_endpoint_secret(self):
+        endpoint = self._endpoint('/ok')
+        webhooks.documents_created([self.document])
+        counts = webhooks.dispatch(webhooks.RateLimiter())
+        self.assertEqual(counts['delivered'], 1)
+        [(path, signature, body)] = self.server.received
+        self.assertTrue(webhooks.verify_signature(endpoint.secret, signature, body))
+        self.assertFalse(webhooks.verify_signature('salah', signature, body))
+        self.assertFalse(webhooks.verify_signature(endpoint.secret, signature, body + b' '))
+        payload = json.loads(body)
+        self.assertEqual(payload['event'], 'document.created')
+        self.assertEqual(payload['data']['id'], self.document.pk)
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual((delivery.status, delivery.attempts, delivery.response_code), ('DELIVERED', 1, 204))
+
+    def test_server_error_retries_after_retry_after(self):
+        self._endpoint('/gagal')
+        webhooks.documents_created([self.document])
+        before = timezone.now()
+        self.assertEqual(webhooks.dispatch(webhooks.RateLimiter())['retry'], 1)
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual((delivery.status, delivery.attempts, delivery.response_code), ('PENDING', 1, 503))
+        # Retry-After (120 s) outweighs the first backoff step (30 s)
+        wait = (delivery.next_attempt_at - before).total_seconds()
+        self.assertGreaterEqual(wait, 120)
+        self.assertLess(wait, 130)
+        # Not due yet, so a second pass sends nothing
+        self.assertEqual(webhooks.dispatch(webhooks.RateLimiter())['retry'], 0)
+
+    def test_backoff_doubles_and_gives_up_after_max_attempts(self):
+        self.assertEqual(webhooks._retry_delay(1, {}), 30)
+        self.assertEqual(webhooks._retry_delay(3, {}), 120)
+        self.assertEqual(webhooks._retry_delay(1, {'retry-after': '600'}), 600)
+        self.assertEqual(webhooks._retry_delay(1, {'retry-after': 'Wed, 21 Oct 2026 07:28:00 GMT'}), 30)
+        self._endpoint('/gagal')
+        webhooks.documents_created([self.document])
+        limiter = webhooks.RateLimiter()
+        for _ in range(3):
+            WebhookDelivery.objects.update(next_attempt_at=timezone.now())
+            counts = webhooks.dispatch(limiter)
+        self.assertEqual(counts['failed'], 1)
+        self.assertEqual(WebhookDelivery.objects.get().status, 'FAILED')
+        self.assertEqual(len(self.server.received), 3)
+
+    def test_rate_limited_endpoint_defers_backlog(self):
+        self._endpoint('/ok', rate_limit_per_minute=2)
+        others = [make_document(self.document.company, f'W{i}') for i in range(2, 6)]
+        webhooks.documents_created([self.document, *others])
+        before = timezone.now()
+        counts = webhooks.dispatch(webhooks.RateLimiter())
+        # Bucket starts full: two sent, the other three spaced 30 s apart
+        self.assertEqual(counts['delivered'], 2)
+        self.assertEqual(len(self.server.received), 2)
+        waits = sorted(
+            round((at - before).total_seconds())
+            for at in WebhookDelivery.objects.filter(status='PENDING').values_list('next_attempt_at', flat=True)
+        )
+        self.assertEqual(waits, [30, 60, 90])
+
+    def test_rolled_back_change_leaves_no_outbox_rows(self):
+        self._endpoint('/ok')
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            document = Document.objects.create(
+                worker=self.document.worker, type=Document.DocumentType.VISA, document_number='RB-1',
+                issue_date=timezone.localdate(), expiry_date=timezone.localdate() + timedelta(days=365),
+            )
+            self.assertEqual(webhooks.documents_created([document]), 1)
+            raise RuntimeError
+        self.assertFalse(Document.objects.filter(document_number='RB-1').exists())
+        self.assertFalse(WebhookDelivery.objects.exists())
+        self.assertEqual(webhooks.dispatch(webhooks.RateLimiter())['delivered'], 0)
+
+    def test_admin_mark_expired_queues_expired_event(self):
+        self._endpoint('/ok')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.client.post(reverse('admin:dashboard_document_changelist'), {
+            'action': 'mark_expired', '_selected_action': [self.document.pk],
+        })
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.event_key, f'document.expired:{self.document.pk}:{self.document.expiry_date}')
+        self.assertEqual(delivery.payload['data']['status'], 'EXPIRED')
+        # Already expired documents are not announced again
+        self.client.post(reverse('admin:dashboard_document_changelist'), {
+            'action': 'mark_expired', '_selected_action': [self.document.pk],
+        })
+        self.assertEqual(WebhookDelivery.objects.count(), 1)
+
+
+class WorkerSummaryTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='Alpha')
+
+    def test_new_worker_without_documents_is_incomplete(self):
+        worker = make_document(self.company).worker
+        fresh = Worker.objects.create(
+            name='Baru', passport_number='P-BARU', nationality='CN',
+            birth_date=date(1990, 1, 1), company=self.company, position='Staf',
+        )
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.missing_document_types, list(Document.DocumentType.values))
+        worker.refresh_from_db()
+        self.assertNotIn(Document.DocumentType.KITAS, worker.missing_document_types)
+
+    def test_moving_document_refreshes_previous_worker(self):
+        document = make_document(self.company, 'W1', days=10)
+        other = make_document(self.company, 'W2', Document.DocumentType.VISA, days=200).worker
+        document = Document.objects.get(pk=document.pk)
+        previous = document.worker
+        document.worker = other
+        document.save()
+        previous.refresh_from_db()
+        other.refresh_from_db()
+        self.assertIsNone(previous.next_expiry_date)
+        self.assertIn(Document.DocumentType.KITAS, previous.missing_document_types)
+        self.assertEqual(other.next_expiry_type, Document.DocumentType.KITAS)
+
+    def test_due_refresh_only_revisits_passed_expiries(self):
+        document = make_document(self.company, 'W1', days=5)
+        make_document(self.company, 'W2', days=100)
+        later = timezone.localdate() + timedelta(days=30)
+        self.assertEqual(refresh_due_worker_summaries(later), 1)
+        worker = Worker.objects.get(pk=document.worker_id)
+        self.assertEqual(worker.expired_document_count, 1)
+        self.assertIsNone(worker.next_expiry_date)
+
+
+class WorkerCompanyMoveTests(TestCase):
+    def setUp(self):
+        self.alpha = Company.objects.create(name='Alpha')
+        self.beta = Company.objects.create(name='Beta')
+        document = make_document(self.alpha, days=-900)
+        self.worker = document.worker
+        self.assertEqual(archive_documents(), 1)
+
+    def test_worker_save_moves_archived_documents(self):
+        worker = Worker.objects.get(pk=self.worker.pk)
+        worker.company = self.beta
+        worker.save()
+        self.assertEqual(list(ArchivedDocument.objects.values_list('company_id', flat=True)), [self.beta.pk])
+
+    def test_admin_reassign_moves_archived_documents(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin_user)
+        response = self.client.post(reverse('admin:dashboard_worker_changelist'), {
+            'action': 'reassign_company', '_selected_action': [self.worker.pk], 'apply': '1', 'company': self.beta.pk,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Worker.objects.get(pk=self.worker.pk).company_id, self.beta.pk)
+        self.assertEqual(list(ArchivedDocument.objects.values_list('company_id', flat=True)), [self.beta.pk])
+
+
+class RenewalLeadTimeTests(TestCase):
+    def test_first_renewal_counts_against_replaced_expiry(self):
+        company = Company.objects.create(name='Alpha')
+        document = make_document(company, days=20)
+        client = client_for(company, 'alpha')
+        today = timezone.localdate()
+        response = client.post(reverse('document_renew', args=[document.pk]), {
+            'submission_date': today, 'process_status': 'COMPLETED',
+            'new_expiry_date': today + timedelta(days=385),
+        })
+        self.assertEqual(response.status_code, 302)
+        renewal = RenewalHistory.objects.get()
+        self.assertEqual(renewal.previous_expiry_date, today + timedelta(days=20))
+        [row] = reports.compliance_report(company.pk)
+        self.assertEqual((row['renewal_count'], row['avg_lead_days']), (1, 20.0))
+
+
+class AdminListFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+
+    def test_company_filter_shows_new_companies(self):
+        Company.objects.create(name='Alpha')
+        url = reverse('admin:dashboard_worker_changelist')
+        self.assertContains(self.client.get(url), 'Alpha')
+        Company.objects.create(name='Beta Baru')
+        self.assertContains(self.client.get(url), 'Beta Baru')
+
+    def test_nationality_filter_is_scoped_and_refreshed(self):
+        alpha = Company.objects.create(name='Alpha')
+        make_document(alpha)
+        beta_worker = make_document(Company.objects.create(name='Beta'), 'B1').worker
+        url = reverse('admin:dashboard_worker_changelist')
+        self.assertNotContains(self.client.get(url), 'kewarganegaraan=JP')
+        beta_worker.nationality = 'JP'
+        beta_worker.save()
+        self.assertContains(self.client.get(url), 'kewarganegaraan=JP')
+        request = RequestFactory().get('/')
+        request.user = User.objects.create_user('klien', password='pw')
+        request.user.profile.role = 'CLIENT'
+        request.user.profile.company = alpha
+        request.user.profile.save()
+        model_admin = admin.site._registry[Worker]
+        lookups = NationalityListFilter(request, {}, Worker, model_admin).lookups(request, model_admin)
+        self.assertEqual(lookups, [('CN', 'CN')])
+
+    def test_attachment_changelist_is_scoped_without_per_row_queries(self):
+        alpha, beta = Company.objects.create(name='Alpha'), Company.objects.create(name='Beta')
+        stored = StoredFile.objects.create(sha256='a' * 64, size=1, content_type='application/pdf', file='x.pdf')
+
+        def attach(company, name):
+            document = make_document(company, name)
+            renewal = RenewalHistory.objects.create(document=document)
+            Attachment.objects.create(stored_file=stored, document=document, filename=f'{name}-dok.pdf')
+            return Attachment.objects.create(stored_file=stored, renewal=renewal, filename=f'{name}-ren.pdf')
+
+        url = reverse('admin:dashboard_attachment_changelist')
+        attach(alpha, 'A1')
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        for i in range(4):
+            attach(beta, f'B{i}')
+        with CaptureQueriesContext(connection) as many:
+            self.assertContains(self.client.get(url), 'B3-ren.pdf')
+        self.assertEqual(len(many), len(few))
+
+        request = RequestFactory().get('/')
+        request.user = User.objects.create_user('klien', password='pw')
+        request.user.profile.role = 'CLIENT'
+        request.user.profile.company = alpha
+        request.user.profile.save()
+        visible = admin.site._registry[Attachment].get_queryset(request)
+        self.assertEqual(sorted(visible.values_list('filename', flat=True)), ['A1-dok.pdf', 'A1-ren.pdf'])
+
+    def test_extend_expiry_reactivates_documents_no_longer_expired(self):
+        company = Company.objects.create(name='Alpha')
+        recovered = make_document(company, 'W1', days=-5)
+        still_expired = make_document(company, 'W2', days=-40)
+        Document.objects.filter(pk__in=[recovered.pk, still_expired.pk]).update(status=Document.Status.EXPIRED)
+        self.client.post(reverse('admin:dashboard_document_changelist'), {
+            'action': 'extend_expiry', '_selected_action': [recovered.pk, still_expired.pk], 'apply': '1', 'days': 30,
+        })
+        recovered.refresh_from_db()
+        still_expired.refresh_from_db()
+        self.assertEqual(recovered.expiry_date, timezone.localdate() + timedelta(days=25))
+        self.assertEqual(recovered.status, Document.Status.ACTIVE)
+        self.assertEqual(still_expired.status, Document.Status.EXPIRED)
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_MAX_QUERIES=2)
+class ProfilingTests(TestCase):
+    def test_sql_count_is_not_capped_by_stored_queries(self):
+        company = Company.objects.create(name='Alpha')
+        for i in range(3):
+            make_document(company, f'W{i}')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        response = self.client.get(reverse('dashboard'), HTTP_X_PROFILE='1')
+        report = ProfileReport.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(len(report.queries), 2)
+        self.assertGreater(report.sql_count, 2)
+
+
+@override_settings(EXPORT_MAX_RUNNING=1)
+class JobClaimTests(TestCase):
+    def test_export_cap_lets_other_jobs_through(self):
+        first = jobs.enqueue('export_workers_csv')
+        jobs.enqueue('export_documents_csv')
+        snapshot = jobs.enqueue('snapshot_documents')
+        self.assertEqual(jobs.claim_next('w1').pk, first.pk)
+        # The second export waits for a free slot; the snapshot does not
+        self.assertEqual(jobs.claim_next('w2').pk, snapshot.pk)
+        self.assertIsNone(jobs.claim_next('w3'))
+
+    def test_export_is_enqueued_by_post_only(self):
+        client = client_for(Company.objects.create(name='Alpha'), 'klien')
+        url = reverse('export_workers_csv') + '?kewarganegaraan=CN&q=Budi'
+        self.assertEqual(client.get(url).status_code, 405)
+        self.assertFalse(Job.objects.exists())
+        response = client.post(url)
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('job_detail', args=[job.pk]), fetch_redirect_response=False)
+        self.assertEqual(job.payload['filters'], {'kewarganegaraan': 'CN', 'q': 'Budi'})
+
+
+class CalendarFeedValidatorTests(TestCase):
+    def test_last_modified_moves_with_the_day(self):
+        company = Company.objects.create(name='Alpha')
+        make_document(company)
+        three_days_ago = timezone.now() - timedelta(days=3)
+        Company.all_objects.filter(pk=company.pk).update(data_changed_at=three_days_ago)
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        feed = CalendarFeed.objects.create(user=user, company=company)
+        url = reverse('calendar_feed', args=[feed.token])
+        # A client that last fetched before today's midnight must get the new day's feed
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(three_days_ago.timestamp()))
+        self.assertEqual(response.status_code, 200)
+        last_modified = parse_http_date(response['Last-Modified'])
+        midnight = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        self.assertGreaterEqual(last_modified, midnight.timestamp())
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+
+class PendingDeletionTests(TestCase):
+    def test_scheduled_worker_hides_documents_without_subquery(self):
+        company = Company.objects.create(name='Alpha')
+        document = make_document(company)
+        kept = make_document(company, 'W2')
+        RenewalHistory.objects.create(document=document, previous_expiry_date=document.expiry_date)
+        jobs.schedule_worker_deletion(document.worker)
+        self.assertEqual(list(Document.objects.values_list('pk', flat=True)), [kept.pk])
+        self.assertFalse(RenewalHistory.objects.exists())
+        self.assertTrue(Document.all_objects.get(pk=document.pk).pending_deletion)
+        self.assertNotIn('dashboard_worker', str(Document.objects.all().query))
+
+    def test_company_deletion_flags_documents(self):
+        company = Company.objects.create(name='Alpha')
+        make_document(company)
+        jobs.schedule_company_deletion(company)
+        self.assertFalse(Document.objects.exists())
+        self.assertEqual(Document.all_objects.filter(pending_deletion=True).count(), 1)
+
+    @override_settings(DELETE_CHUNK_SIZE=2)
+    def test_company_deletion_empties_outbox_and_snapshots(self):
+        company = Company.objects.create(name='Alpha')
+        other = make_document(Company.objects.create(name='Beta'), 'B1')
+        for i in range(3):
+            make_document(company, f'W{i}')
+        WebhookEndpoint.objects.create(name='alpha', url='http://127.0.0.1:9/', company=company)
+        WebhookEndpoint.objects.create(name='semua', url='http://127.0.0.1:9/')
+        webhooks.documents_created(Document.objects.select_related('worker'))
+        snapshots.take_snapshot()
+        job = jobs.schedule_company_deletion(company)
+        jobs.run_job(Job.objects.get(pk=job.pk))
+        self.assertFalse(Company.all_objects.filter(pk=company.pk).exists())
+        # Deliveries of the global endpoint stay
+        self.assertEqual(set(WebhookDelivery.objects.values_list('endpoint__name', flat=True)), {'semua'})
+        self.assertEqual(WebhookDelivery.objects.count(), 4)
+        self.assertEqual(set(DocumentSnapshot.objects.values_list('company__name', flat=True)), {'Beta'})
+
+
+class ExpiryIndexTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        patcher = override_settings(EXPIRY_INDEX_ENABLED=True, EXPIRY_INDEX_PATH=Path(tmp) / 'expiry_index.bin')
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        expiry_index._loaded, expiry_index._requested = None, -1
+        self.company = Company.objects.create(name='Alpha')
+        self.document = make_document(self.company, days=10)
+
+    def test_stale_index_answers_from_sql_and_queues_one_rebuild(self):
+        self.assertIsInstance(expiry_index.current(), expiry_index.SqlExpiry)
+        self.assertIsInstance(expiry_index.current(), expiry_index.SqlExpiry)
+        self.assertEqual(Job.objects.filter(kind='rebuild_expiry_index').count(), 1)
+        jobs.run_job(jobs.claim_next('w1'))
+        index = expiry_index.current()
+        self.assertIsInstance(index, expiry_index.ExpiryIndex)
+        self.assertEqual(index.count(status=Document.Status.ACTIVE), 1)
+        # Any document change bumps the version, so the old file is no longer served
+        make_document(self.company, 'W2')
+        self.assertIsInstance(expiry_index.current(), expiry_index.SqlExpiry)
+        self.assertEqual(expiry_index.rebuild(), 2)
+        self.assertEqual(expiry_index.current().count(status=Document.Status.ACTIVE), 2)
+        # Already current: nothing to rebuild
+        self.assertIsNone(expiry_index.rebuild())
+
+    def test_with_alert_level_loads_rows_in_one_query(self):
+        for i in range(3):
+            make_document(self.company, f'W{i + 2}', days=5 + i)
+        make_document(self.company, 'Jauh', days=400)
+        expiry_index.rebuild()
+        index = expiry_index.current()
+        today = timezone.localdate()
+        expected = list(expiry_index.SqlExpiry().with_alert_level(Document.objects.all(), today))
+        with self.assertNumQueries(2):  # alert policies, then the rows
+            rows = list(index.with_alert_level(Document.objects.all(), today))
+        self.assertEqual([(d.pk, d.alert_level) for d in rows], [(d.pk, d.alert_level) for d in expected])
+        self.assertEqual(len(rows), 4)
+
+
+class AutocompleteSelectTests(TestCase):
+    def test_non_numeric_id_is_a_validation_error_not_a_crash(self):
+        company = Company.objects.create(name='Alpha')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        today = timezone.localdate()
+        response = self.client.post(reverse('document_create'), {
+            'worker': 'abc', 'type': Document.DocumentType.VISA, 'document_number': 'V-1',
+            'issue_date': today, 'expiry_date': today + timedelta(days=365), 'status': Document.Status.ACTIVE,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['worker'])
+        response = self.client.post(reverse('worker_update', args=[make_document(company).worker_id]), {
+            'name': 'W1', 'passport_number': 'P-X', 'nationality': 'CN', 'birth_date': '1990-01-01',
+            'company': '1 OR 1=1', 'position': 'Staf',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['company'])
+
+    def test_admin_reassign_form_rerenders_bad_company(self):
+        worker = make_document(Company.objects.create(name='Alpha')).worker
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        response = self.client.post(reverse('admin:dashboard_worker_changelist'), {
+            'action': 'reassign_company', '_selected_action': [worker.pk], 'apply': '1', 'company': 'abc',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Perusahaan tujuan')
+
+
+class ComplianceStateTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='Alpha')
+        self.today = timezone.localdate()
+
+    def _chain(self, name, company=None, skip=(), **days):
+        """Worker with every chain document valid for a year unless ``days`` says otherwise."""
+        company = company or self.company
+        worker = Worker.objects.create(
+            name=name, passport_number=f'P-{company.pk}-{name}', nationality='CN',
+            birth_date=date(1990, 1, 1), company=company, position='Staf',
+        )
+        for doc_type in compliance.CHAIN:
+            if doc_type not in skip:
+                Document.objects.create(
+                    worker=worker, type=doc_type, document_number=f'{doc_type}-{worker.pk}',
+                    issue_date=self.today - timedelta(days=300),
+                    expiry_date=self.today + timedelta(days=days.get(doc_type, 365)),
+                )
+        return worker
+
+    def test_states_and_reasons(self):
+        compliant = self._chain('Patuh')
+        missing = self._chain('Kurang', skip=['SKTT'])
+        expired = self._chain('Lewat', VISA=-3, PASSPORT=-1)
+        at_risk = self._chain('Rawan', KITAS=100)
+        # 100 days is outside the default 60-day warning window, inside the override
+        AlertPolicy.objects.create(company=self.company, document_type='KITAS', warning_days=120, notice_days=150)
+        other_company = self._chain('Lain', Company.objects.create(name='Beta'), KITAS=100)
+
+        states = compliance.worker_states()
+        summary = {pk: (s['state'], s['reason']) for pk, s in states.items()}
+        last_valid = self.today + timedelta(days=365)
+        self.assertEqual(summary[compliant.pk], (compliance.COMPLIANT, f'Rantai dokumen berlaku s.d. {last_valid:%d-%m-%Y}'))
+        self.assertEqual(summary[missing.pk], (compliance.BLOCKED, 'SKTT belum ada'))
+        # The first broken link in chain order is reported
+        self.assertEqual(summary[expired.pk], (compliance.BLOCKED, 'VISA kedaluwarsa'))
+        kitas_expiry = self.today + timedelta(days=100)
+        self.assertEqual(summary[at_risk.pk], (compliance.AT_RISK, f'KITAS berakhir {kitas_expiry:%d-%m-%Y}'))
+        self.assertEqual(summary[other_company.pk][0], compliance.COMPLIANT)
+        self.assertEqual(compliance.worker_states(self.company.pk, [at_risk.pk])[at_risk.pk]['state'], compliance.AT_RISK)
+
+
+class SnapshotTests(TestCase):
+    def test_incremental_snapshot_matches_full_recount(self):
+        companies = [Company.objects.create(name='Alpha'), Company.objects.create(name='Beta')]
+        types = [Document.DocumentType.KITAS, Document.DocumentType.VISA]
+        # Expiries every few days, so each gap has documents expiring and entering the window
+        for i, days in enumerate(range(-20, 400, 3)):
+            make_document(companies[i % 2], f'W{i}', types[i % 3 % 2], days=days)
+        today = timezone.localdate()
+
+        def rows(day):
+            return sorted(DocumentSnapshot.objects.filter(date=day).values_list(
+                'company_id', 'document_type', 'active_count', 'expiring_count', 'expired_count',
+            ))
+
+        for gap in (1, 5, 40, 100):
+            with self.subTest(gap=gap):
+                DocumentSnapshot.objects.all().delete()
+                snapshots.take_snapshot(today)
+                day = today + timedelta(days=gap)
+                self.assertEqual(snapshots.take_snapshot(day)['recounted'], 0)
+                incremental = rows(day)
+                snapshots.take_snapshot(day, full=True)
+                self.assertEqual(incremental, rows(day))
+
+
+class AlertLevelTests(TestCase):
+    def test_company_override_takes_precedence_over_type_default(self):
+        alpha, beta = Company.objects.create(name='Alpha'), Company.objects.create(name='Beta')
+        AlertPolicy.objects.update_or_create(
+            company=None, document_type='KITAS', defaults={'urgent_days': 30, 'warning_days': 60, 'notice_days': 90},
+        )
+        AlertPolicy.objects.create(company=alpha, document_type='KITAS', urgent_days=5, warning_days=10, notice_days=20)
+        inside_override = make_document(alpha, 'A1', days=8)
+        outside_override = make_document(alpha, 'A2', days=45)
+        default_scope = make_document(beta, 'B1', days=45)
+        levels = dict(
+            Document.objects.annotate(level=alerts.alert_level_expression(alerts.load_policies(), timezone.localdate()))
+            .values_list('pk', 'level')
+        )
+        self.assertEqual(levels[inside_override.pk], AlertPolicy.Level.WARNING)
+        # Outside every override window: no level, not the type default's WARNING
+        self.assertIsNone(levels[outside_override.pk])
+        self.assertEqual(levels[default_scope.pk], AlertPolicy.Level.WARNING)
+        self.assertEqual(
+            list(alerts.with_alert_level(Document.objects.all()).values_list('pk', flat=True).order_by('pk')),
+            [inside_override.pk, default_scope.pk],
+        )
+
+    def test_default_policy_change_bumps_data_version(self):
+        company = Company.objects.create(name='Alpha')
+        before = DataVersion.current()
+        AlertPolicy.objects.filter(company=None, document_type='KITAS').get().save()
+        self.assertGreater(DataVersion.current(), before)
+        self.assertGreater(Company.objects.get(pk=company.pk).data_changed_at, company.data_changed_at)
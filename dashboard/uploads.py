@@ -0,0 +1,307 @@
+"""Resumable, chunked uploads of document scans.
+
+A client opens an ``UploadSession`` with the file's name, size and SHA-256
+and sends the bytes in chunks (``PATCH`` with ``Upload-Offset``). Each
+chunk is streamed from the request straight into a partial file under
+``ATTACHMENT_UPLOAD_DIR``; the partial file's size is the resume offset, so
+an interrupted upload asks for the session and continues from there. An
+optional ``Upload-Checksum: sha256 <hex>`` header verifies each chunk.
+
+After the last byte the whole file is hashed and compared with the
+declared SHA-256 and its type is read from its leading bytes. Content is
+stored once per hash (``StoredFile``, content-addressed path) and every
+upload of it becomes an ``Attachment``; a file whose hash is already
+attached to a document the uploader can see is attached without uploading
+at all. First-page previews are
+rendered by the ``attachment_preview`` job.
+"""
+import fcntl
+import hashlib
+import io
+import mimetypes
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image
+
+from .models import Attachment, StoredFile, UploadSession
+
+
+READ_SIZE = 64 * 1024
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Accepted scan types and the extension they are stored under
+ALLOWED_TYPES = {
+    'application/pdf': '.pdf',
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/tiff': '.tif',
+}
+SIGNATURES = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+]
+
+
+class UploadError(Exception):
+    """Rejected upload request; ``status`` is the HTTP status, ``offset`` the stored offset if known."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def sniff_type(head):
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return None
+
+
+def part_path(session) -> Path:
+    return Path(settings.ATTACHMENT_UPLOAD_DIR) / f'{session.pk}.part'
+
+
+def stored_offset(session) -> int:
+    if session.status == UploadSession.Status.COMPLETE:
+        return session.size
+    try:
+        return part_path(session).stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _attach(stored, session):
+    return Attachment.objects.create(
+        stored_file=stored, document_id=None if session.renewal_id else session.document_id,
+        renewal_id=session.renewal_id, filename=session.filename, uploaded_by=session.user,
+    )
+
+
+def open_session(user, filename, size, sha256, document=None, renewal=None, visible_documents=None):
+    """Start (or resume) an upload to ``document`` or ``renewal``; returns the ``UploadSession``.
+
+    Content that is already attached somewhere within ``visible_documents``
+    (the documents the uploader may read) is attached right away and the
+    session comes back complete. Anything else needs the bytes, even if the
+    hash is stored for another tenant; ``complete()`` deduplicates it then,
+    so a hash alone neither grants access nor reveals that a file exists.
+    """
+    filename = os.path.basename(str(filename or '')).strip()[:255]
+    sha256 = str(sha256 or '').lower()
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('Ukuran berkas tidak valid')
+    if not filename:
+        raise UploadError('Nama berkas wajib diisi')
+    if not SHA256_RE.match(sha256):
+        raise UploadError('SHA-256 berkas tidak valid')
+    if size <= 0 or size > settings.ATTACHMENT_MAX_BYTES:
+        raise UploadError(f'Ukuran berkas harus 1 byte s.d. {settings.ATTACHMENT_MAX_BYTES // (1024 * 1024)} MB', 413)
+    content_type = mimetypes.guess_type(filename)[0]
+    if content_type not in ALLOWED_TYPES:
+        raise UploadError('Tipe berkas tidak didukung (PDF, JPEG, PNG, TIFF)', 415)
+    target = {'document': None if renewal else document, 'renewal': renewal}
+
+    # The same file picked again for the same target resumes its open session
+    session = UploadSession.objects.filter(
+        user=user, sha256=sha256, size=size, status=UploadSession.Status.OPEN, **target
+    ).order_by('-created_at').first()
+    if session:
+        return session
+    session = UploadSession(user=user, filename=filename, content_type=content_type, size=size, sha256=sha256, **target)
+    stored = None
+    if visible_documents is not None:
+        visible = Attachment.objects.filter(
+            Q(document__in=visible_documents.values('pk')) | Q(renewal__document__in=visible_documents.values('pk'))
+        )
+        stored = StoredFile.objects.filter(sha256=sha256, size=size, attachments__in=visible).first()
+    with transaction.atomic():
+        if stored:
+            session.status = UploadSession.Status.COMPLETE
+            session.received = size
+            session.attachment = _attach(stored, session)
+        session.save()
+    if not stored:
+        part_path(session).parent.mkdir(parents=True, exist_ok=True)
+        part_path(session).touch()
+    return session
+
+
+def write_chunk(session, stream, start, length, checksum=None) -> int:
+    """Append ``length`` bytes read from ``stream`` at ``start``; returns the new offset.
+
+    The partial file is locked while writing, so concurrent chunks for one
+    session are refused rather than interleaved.
+    """
+    if session.status != UploadSession.Status.OPEN:
+        raise UploadError('Sesi unggah sudah ditutup', 409, stored_offset(session))
+    if length > settings.ATTACHMENT_CHUNK_MAX_BYTES:
+        raise UploadError(f'Potongan maksimal {settings.ATTACHMENT_CHUNK_MAX_BYTES} byte', 413)
+    if start + length > session.size:
+        raise UploadError('Potongan melebihi ukuran berkas', 400, stored_offset(session))
+    try:
+        fh = open(part_path(session), 'r+b')
+    except FileNotFoundError:
+        raise UploadError('Sesi unggah sudah kedaluwarsa', 410)
+    with fh:
+        try:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError('Potongan lain sedang ditulis', 409, stored_offset(session))
+        current = os.fstat(fh.fileno()).st_size
+        if start != current:
+            raise UploadError('Offset tidak cocok', 409, current)
+        fh.seek(current)
+        digest = hashlib.sha256()
+        written = 0
+        while written < length:
+            data = stream.read(min(READ_SIZE, length - written))
+            if not data:
+                break
+            fh.write(data)
+            digest.update(data)
+            written += len(data)
+        if checksum and (written != length or digest.hexdigest() != checksum.lower()):
+            fh.truncate(current)
+            raise UploadError('Checksum potongan tidak cocok', 400, current)
+        fh.flush()
+        offset = current + written
+    UploadSession.objects.filter(pk=session.pk).update(received=offset, updated_at=timezone.now())
+    session.received = offset
+    if written != length:
+        raise UploadError('Potongan tidak lengkap', 400, offset)
+    return offset
+
+
+def _store(path, sha256, size, content_type):
+    """Move ``path`` into content-addressed storage; returns ``(StoredFile, created)``."""
+    name = f'attachments/{sha256[:2]}/{sha256}{ALLOWED_TYPES[content_type]}'
+    destination = Path(default_storage.path(name))
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    if destination.exists():
+        os.remove(path)
+    else:
+        shutil.move(path, destination)
+    try:
+        with transaction.atomic():
+            return StoredFile.objects.get_or_create(
+                sha256=sha256, defaults={'size': size, 'content_type': content_type, 'file': name}
+            )
+    except IntegrityError:
+        # A concurrent upload of the same content stored it first
+        return StoredFile.objects.get(sha256=sha256), False
+
+
+def complete(session):
+    """Verify and store a fully received upload; returns ``(attachment, stored_file, created)``."""
+    path = part_path(session)
+    if _file_sha256(path) != session.sha256:
+        os.remove(path)
+        UploadSession.objects.filter(pk=session.pk).update(status=UploadSession.Status.FAILED)
+        raise UploadError('Checksum berkas tidak cocok; unggah ulang berkas', 422, 0)
+    with open(path, 'rb') as fh:
+        content_type = sniff_type(fh.read(16))
+    if content_type is None:
+        os.remove(path)
+        UploadSession.objects.filter(pk=session.pk).update(status=UploadSession.Status.FAILED)
+        raise UploadError('Isi berkas bukan PDF, JPEG, PNG atau TIFF', 415, 0)
+    stored, created = _store(path, session.sha256, session.size, content_type)
+    with transaction.atomic():
+        attachment = _attach(stored, session)
+        session.status = UploadSession.Status.COMPLETE
+        session.attachment = attachment
+        session.save(update_fields=['status', 'attachment', 'updated_at'])
+    return attachment, stored, created
+
+
+def render_preview(stored):
+    """Render the first page of ``stored`` as a JPEG preview (PDFs need poppler's ``pdftoppm``)."""
+    width = settings.ATTACHMENT_PREVIEW_WIDTH
+    source = default_storage.path(stored.file.name)
+    try:
+        if stored.content_type == 'application/pdf':
+            pdftoppm = shutil.which('pdftoppm')
+            if not pdftoppm:
+                stored.preview_status = StoredFile.PreviewStatus.UNSUPPORTED
+                stored.save(update_fields=['preview_status'])
+                return
+            with tempfile.TemporaryDirectory() as tmp:
+                subprocess.run(
+                    [pdftoppm, '-f', '1', '-l', '1', '-singlefile', '-jpeg', '-scale-to', str(width),
+                     source, os.path.join(tmp, 'page')],
+                    check=True, capture_output=True, timeout=120,
+                )
+                image = Image.open(os.path.join(tmp, 'page.jpg'))
+                image.load()
+        else:
+            image = Image.open(source)
+            image.load()
+        image = image.convert('RGB')
+        image.thumbnail((width, width * 2))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=80)
+    except (OSError, Image.DecompressionBombError, subprocess.SubprocessError):
+        stored.preview_status = StoredFile.PreviewStatus.FAILED
+        stored.save(update_fields=['preview_status'])
+        return
+    if stored.preview:
+        stored.preview.delete(save=False)
+    stored.preview.save(f'{stored.sha256}.jpg', ContentFile(buffer.getvalue()), save=False)
+    stored.preview_status = StoredFile.PreviewStatus.READY
+    stored.save(update_fields=['preview', 'preview_status'])
+
+
+def purge(hours=None) -> dict:
+    """Drop abandoned sessions and their partial files, and stored files no attachment uses."""
+    cutoff = timezone.now() - timedelta(hours=hours or settings.ATTACHMENT_SESSION_HOURS)
+    stale = UploadSession.objects.filter(updated_at__lt=cutoff).exclude(status=UploadSession.Status.COMPLETE)
+    sessions = 0
+    for session in stale.iterator():
+        part_path(session).unlink(missing_ok=True)
+        sessions += 1
+    stale.delete()
+    UploadSession.objects.filter(status=UploadSession.Status.COMPLETE, updated_at__lt=cutoff).delete()
+    # Partial files whose session is gone (e.g. removed with its document)
+    upload_dir = Path(settings.ATTACHMENT_UPLOAD_DIR)
+    if upload_dir.is_dir():
+        live = {f'{pk}.part' for pk in UploadSession.objects.values_list('pk', flat=True)}
+        for path in upload_dir.glob('*.part'):
+            if path.name not in live and path.stat().st_mtime < cutoff.timestamp():
+                path.unlink(missing_ok=True)
+                sessions += 1
+
+    orphans = StoredFile.objects.filter(attachments__isnull=True, created_at__lt=cutoff)
+    files = 0
+    for stored in orphans.iterator():
+        with transaction.atomic():
+            # Re-checked under the delete: an upload may have attached it meanwhile
+            if StoredFile.objects.filter(pk=stored.pk, attachments__isnull=True).delete()[0]:
+                names = [stored.file.name, stored.preview.name]
+                transaction.on_commit(lambda names=names: [default_storage.delete(n) for n in names if n])
+                files += 1
+    return {'sessions': sessions, 'files': files}
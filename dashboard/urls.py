@@ -8,6 +8,7 @@ urlpatterns = [
     path('perusahaan/tambah/', views.company_create, name='company_create'),
     path('perusahaan/<int:pk>/edit/', views.company_update, name='company_update'),
     path('perusahaan/<int:pk>/hapus/', views.company_delete, name='company_delete'),
+    path('perusahaan/<int:pk>/foto.zip', views.company_photos_zip, name='company_photos_zip'),
 
     path('pekerja/', views.worker_list, name='worker_list'),
     path('pekerja/tambah/', views.worker_create, name='worker_create'),
@@ -20,8 +21,32 @@ urlpatterns = [
     path('dokumen/<int:pk>/edit/', views.document_update, name='document_update'),
     path('dokumen/<int:pk>/hapus/', views.document_delete, name='document_delete'),
     path('dokumen/<int:pk>/perpanjang/', views.document_renew, name='document_renew'),
+    path('dokumen/<int:pk>/lampiran/', views.attachments, {'kind': 'dokumen'}, name='document_attachments'),
+    path('riwayat-perpanjangan/', views.renewal_list, name='renewal_list'),
+    path('riwayat-perpanjangan/<int:pk>/lampiran/', views.attachments, {'kind': 'perpanjangan'}, name='renewal_attachments'),
+    path('lampiran/unggah/<uuid:pk>/', views.upload_session, name='upload_session'),
+    path('lampiran/<int:pk>/', views.attachment_download, name='attachment_download'),
+    path('lampiran/<int:pk>/pratinjau/', views.attachment_preview, name='attachment_preview'),
+    path('lampiran/<int:pk>/hapus/', views.attachment_delete, name='attachment_delete'),
+    path('laporan/kepatuhan/', views.compliance_report, name='compliance_report'),
+    path('laporan/kepatuhan.xlsx', views.compliance_report_xlsx, name='compliance_report_xlsx'),
+    path('laporan/tren/', views.document_trend, name='document_trend'),
+    path('laporan/tren.json', views.document_trend_json, name='document_trend_json'),
+    path('laporan/prakiraan.json', views.document_forecast_json, name='document_forecast_json'),
 
     path('export/workers.csv', views.export_workers_csv, name='export_workers_csv'),
     path('export/documents.csv', views.export_documents_csv, name='export_documents_csv'),
+
+    path('autocomplete/pekerja/', views.autocomplete_workers, name='autocomplete_workers'),
+    path('autocomplete/perusahaan/', views.autocomplete_companies, name='autocomplete_companies'),
+
+    path('metrics', views.metrics_view, name='metrics'),
+    path('kalender/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
+    path('feed-kalender/', views.calendar_feeds, name='calendar_feeds'),
+    path('media/<path:path>', views.protected_media, name='protected_media'),
+
+    path('tugas/', views.job_list, name='job_list'),
+    path('tugas/<int:pk>/', views.job_detail, name='job_detail'),
+    path('tugas/<int:pk>/unduh/', views.job_download, name='job_download'),
 ]
 
@@ -1,14 +1,41 @@
+import json
+import os
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.utils import timezone
-from django.db.models import Q, Count
-from django.http import HttpResponse
+from django.utils.text import slugify
+from django.db import transaction
+from django.db.models import F, Q, Count, Prefetch
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse, Http404, JsonResponse
 from django.core.paginator import Paginator
-import csv
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import condition, require_http_methods, require_POST
 
-from .models import Company, Worker, Document, RenewalHistory
+from .models import AlertPolicy, Company, Worker, Document, RenewalHistory, ArchivedRenewalHistory, Job, CalendarFeed, Attachment, UploadSession
+from . import alerts, compliance, expiry_index, ical, jobs, media, metrics, reports, snapshots, uploads, webhooks
 from .forms import CompanyForm, WorkerForm, WorkerWithDocumentsForm, DocumentForm, RenewalForm
+from .pagination import keyset_paginate, EstimatedCountPaginator
+from .filters import apply_facets, document_facets, filter_params, worker_facets, worker_search_q
+
+
+RENEWALS_PER_PAGE = 20
+RECENT_RENEWALS_PER_DOCUMENT = 3
+ARCHIVED_DOCUMENTS_PER_PAGE = 20
+# Dashboard card header classes per alert level
+ALERT_STYLES = {
+    AlertPolicy.Level.URGENT: 'bg-danger text-white',
+    AlertPolicy.Level.WARNING: 'bg-warning',
+    AlertPolicy.Level.NOTICE: 'bg-info',
+}
+
+# worker_list ?urutkan=<key>; urgency sorts read the precomputed Worker summary
+WORKER_SORTS = {
+    '': ('name', 'id'),
+    'urgensi': (F('next_expiry_date').asc(nulls_last=True), 'name', 'id'),
+    'kedaluwarsa': ('-expired_document_count', 'name', 'id'),
+}
 
 
 def create_documents_from_form(worker, cleaned_data):
@@ -22,6 +49,7 @@ def create_documents_from_form(worker, cleaned_data):
         ('passport', 'PASSPORT'),
     ]
     
+    created = []
     for prefix, doc_type in document_types:
         number_field = f"{prefix}_number"
         issue_field = f"{prefix}_issue"
@@ -32,61 +60,71 @@ def create_documents_from_form(worker, cleaned_data):
             number_field = f"{prefix}_number_doc"
         
         if cleaned_data.get(number_field) and cleaned_data.get(issue_field) and cleaned_data.get(expiry_field):
-            Document.objects.create(
+            created.append(Document(
                 worker=worker,
                 type=doc_type,
                 document_number=cleaned_data[number_field],
                 issue_date=cleaned_data[issue_field],
                 expiry_date=cleaned_data[expiry_field],
                 status=Document.Status.ACTIVE
-            )
+            ))
+    # Documents and their webhook outbox rows commit together
+    with transaction.atomic():
+        for doc in created:
+            doc.save()
+        webhooks.documents_created(created)
 
 
 @login_required
 def dashboard(request):
+    # Document counts and alert windows come from the shared expiry index
+    index = expiry_index.current()
     total_workers = Worker.objects.count()
-    total_active_docs = Document.objects.filter(status=Document.Status.ACTIVE).count()
-    total_expired_docs = Document.objects.filter(status=Document.Status.EXPIRED).count()
+    total_active_docs = index.count(status=Document.Status.ACTIVE)
+    total_expired_docs = index.count(status=Document.Status.EXPIRED)
 
     today = timezone.localdate()
-    d30 = today + timezone.timedelta(days=30)
-    d60 = today + timezone.timedelta(days=60)
-    d90 = today + timezone.timedelta(days=90)
-
-    # Base queryset: only active docs within next 90 days
-    base_qs = (
-        Document.objects.select_related('worker', 'worker__company')
-        .filter(status=Document.Status.ACTIVE, expiry_date__gte=today, expiry_date__lte=d90)
-        .order_by('expiry_date')
-    )
 
     # Scope data for client users
+    company_id = None
     profile = getattr(request.user, 'profile', None)
     if profile and getattr(profile, 'role', None) == 'CLIENT' and profile.company_id:
-        base_qs = base_qs.filter(worker__company_id=profile.company_id)
+        company_id = profile.company_id
 
-    bucket_30 = base_qs.filter(expiry_date__lte=d30)
-    bucket_60 = base_qs.filter(expiry_date__gt=d30, expiry_date__lte=d60)
-    bucket_90 = base_qs.filter(expiry_date__gt=d60, expiry_date__lte=d90)
-
-    def group_by_worker(docs):
-        grouped = {}
-        for doc in docs:
-            grouped.setdefault(doc.worker, []).append(doc)
-        return grouped
+    # Active docs inside their type's alert window, labelled by level
+    base_qs = Document.objects.select_related('worker', 'worker__company').order_by('expiry_date')
+    if company_id:
+        base_qs = base_qs.filter(company_id=company_id)
+    grouped = {level: {} for level in alerts.LEVELS}
+    for doc in index.with_alert_level(base_qs, today, company_id):
+        grouped[doc.alert_level].setdefault(doc.worker, []).append(doc)
 
     context = {
         'total_workers': total_workers,
         'total_active_docs': total_active_docs,
         'total_expired_docs': total_expired_docs,
-        'bucket30': group_by_worker(bucket_30),
-        'bucket60': group_by_worker(bucket_60),
-        'bucket90': group_by_worker(bucket_90),
+        'buckets': [(level.label, ALERT_STYLES[level], grouped[level]) for level in alerts.LEVELS],
         'today': today,
     }
     return render(request, 'core/dashboard.html', context)
 
 
+def _querystring_without_page(request):
+    params = request.GET.copy()
+    params.pop('page', None)
+    return params.urlencode()
+
+
+def _count_cache_key(request, list_name):
+    """Cache key for a list's total: one entry per company scope and filter set."""
+    profile = getattr(request.user, 'profile', None)
+    scope = profile.company_id if profile and profile.role == 'CLIENT' and profile.company_id else 'all'
+    params = request.GET.copy()
+    params.pop('page', None)
+    params.pop('urutkan', None)
+    return f'{list_name}:{scope}:{params.urlencode()}'
+
+
 # Companies CRUD
 @login_required
 def company_list(request):
@@ -135,11 +173,33 @@ def company_delete(request, pk):
         return redirect('company_list')
     company = get_object_or_404(Company, pk=pk)
     if request.method == 'POST':
-        company.delete()
+        jobs.schedule_company_deletion(company, request.user)
         return redirect('company_list')
     return render(request, 'core/confirm_delete.html', {'obj': company, 'title': 'Hapus Perusahaan'})
 
 
+@login_required
+def company_photos_zip(request, pk):
+    profile = getattr(request.user, 'profile', None)
+    qs = Company.objects.all()
+    if profile and profile.role == 'CLIENT' and profile.company_id:
+        qs = qs.filter(id=profile.company_id)
+    company = get_object_or_404(qs, pk=pk)
+    photos = (
+        Worker.objects.filter(company=company)
+        .exclude(photo='').exclude(photo__isnull=True)
+        .order_by('id')
+        .values_list('passport_number', 'name', 'photo')
+    )
+    entries = (
+        (f"{passport}_{slugify(name)}{os.path.splitext(photo)[1]}", photo)
+        for passport, name, photo in photos.iterator(chunk_size=500)
+    )
+    response = StreamingHttpResponse(media.stream_zip(entries), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="foto-{slugify(company.name) or company.pk}.zip"'
+    return response
+
+
 # Workers CRUD & detail
 @login_required
 def worker_list(request):
@@ -149,27 +209,76 @@ def worker_list(request):
     if profile and profile.role == 'CLIENT' and profile.company_id:
         workers = workers.filter(company_id=profile.company_id)
     if query:
-        workers = workers.filter(
-            Q(name__icontains=query)
-            | Q(passport_number__icontains=query)
-            | Q(company__name__icontains=query)
-            | Q(nationality__icontains=query)
-        )
-    workers = workers.select_related('company').prefetch_related('documents').order_by('name')
-    paginator = Paginator(workers, 25)
+        workers = workers.filter(worker_search_q(query))
+    workers, facets = apply_facets(workers, worker_facets(), request.GET, 'next_expiry_date')
+    sort = request.GET.get('urutkan', '')
+    ordering = WORKER_SORTS.get(sort, WORKER_SORTS[''])
+    workers = workers.select_related('company').prefetch_related('documents').order_by(*ordering)
+    paginator = EstimatedCountPaginator(workers, 25, cache_key=_count_cache_key(request, 'worker_list'))
     page_obj = paginator.get_page(request.GET.get('page'))
-    return render(request, 'core/worker_list.html', {'workers': page_obj, 'q': query, 'page_obj': page_obj})
+    # Chain compliance for the whole page in one query
+    states = compliance.worker_states(worker_ids=[w.pk for w in page_obj])
+    for w in page_obj:
+        w.compliance = states.get(w.pk)
+    return render(request, 'core/worker_list.html', {
+        'workers': page_obj,
+        'q': query,
+        'urutkan': sort,
+        'page_obj': page_obj,
+        'querystring': _querystring_without_page(request),
+        **facets,
+    })
 
 
 @login_required
 def worker_detail(request, pk):
     profile = getattr(request.user, 'profile', None)
-    qs = Worker.objects.all()
+    qs = Worker.objects.select_related('company')
     if profile and profile.role == 'CLIENT' and profile.company_id:
         qs = qs.filter(company_id=profile.company_id)
     worker = get_object_or_404(qs, pk=pk)
-    documents = worker.documents.all().order_by('type')
-    return render(request, 'core/worker_detail.html', {'worker': worker, 'documents': documents})
+    # Latest renewals per document come from one windowed prefetch query
+    recent_renewals = RenewalHistory.objects.order_by('-submission_date', '-id')[:RECENT_RENEWALS_PER_DOCUMENT]
+    documents = list(
+        worker.documents.annotate(
+            renewal_count=Count('renewal_history', distinct=True),
+            attachment_count=Count('attachments', distinct=True),
+        )
+        .prefetch_related(Prefetch('renewal_history', queryset=recent_renewals, to_attr='recent_renewals'))
+        .order_by('type')
+    )
+
+    # Timeline for the whole worker, or a single document via ?dokumen=<id>
+    timeline_document = None
+    timeline_qs = RenewalHistory.objects.select_related('document')
+    document_id = request.GET.get('dokumen')
+    if document_id:
+        timeline_document = next((d for d in documents if str(d.id) == document_id), None)
+    if timeline_document:
+        timeline_qs = timeline_qs.filter(document=timeline_document)
+    else:
+        timeline_qs = timeline_qs.filter(document__worker=worker)
+    timeline = keyset_paginate(timeline_qs, request.GET.get('riwayat'), RENEWALS_PER_PAGE, 'submission_date')
+
+    # Archived documents, searchable by number or type via ?arsip=
+    archive_query = request.GET.get('arsip', '').strip()
+    archived_qs = worker.archived_documents.prefetch_related(
+        Prefetch('renewal_history', queryset=ArchivedRenewalHistory.objects.order_by('-submission_date', '-id'))
+    )
+    if archive_query:
+        archived_qs = archived_qs.filter(Q(document_number__icontains=archive_query) | Q(type__iexact=archive_query))
+    archived_documents = keyset_paginate(archived_qs, request.GET.get('arsip_setelah'), ARCHIVED_DOCUMENTS_PER_PAGE, 'expiry_date')
+
+    return render(request, 'core/worker_detail.html', {
+        'worker': worker,
+        'compliance': compliance.worker_states(worker_ids=[worker.pk]).get(worker.pk),
+        'documents': documents,
+        'timeline': timeline,
+        'timeline_document': timeline_document,
+        'archived_documents': archived_documents,
+        'archive_query': archive_query,
+        'has_archive': bool(archive_query) or len(archived_documents) > 0,
+    })
 
 
 @login_required
@@ -228,7 +337,7 @@ def worker_delete(request, pk):
         qs = qs.filter(company_id=profile.company_id)
     worker = get_object_or_404(qs, pk=pk)
     if request.method == 'POST':
-        worker.delete()
+        jobs.schedule_worker_deletion(worker, request.user)
         return redirect('worker_list')
     return render(request, 'core/confirm_delete.html', {'obj': worker, 'title': 'Hapus Pekerja'})
 
@@ -237,12 +346,19 @@ def worker_delete(request, pk):
 @login_required
 def document_list(request):
     profile = getattr(request.user, 'profile', None)
-    documents = Document.objects.select_related('worker', 'worker__company').all().order_by('expiry_date')
+    documents = Document.objects.all()
     if profile and profile.role == 'CLIENT' and profile.company_id:
-        documents = documents.filter(worker__company_id=profile.company_id)
-    paginator = Paginator(documents, 25)
+        documents = documents.filter(company_id=profile.company_id)
+    documents, facets = apply_facets(documents, document_facets(), request.GET, 'expiry_date')
+    documents = documents.select_related('worker').order_by('expiry_date', 'id')
+    paginator = EstimatedCountPaginator(documents, 25, cache_key=_count_cache_key(request, 'document_list'))
     page_obj = paginator.get_page(request.GET.get('page'))
-    return render(request, 'core/document_list.html', {'documents': page_obj, 'page_obj': page_obj})
+    return render(request, 'core/document_list.html', {
+        'documents': page_obj,
+        'page_obj': page_obj,
+        'querystring': _querystring_without_page(request),
+        **facets,
+    })
 
 
 @login_required
@@ -258,7 +374,9 @@ def document_create(request):
             if profile and profile.role == 'CLIENT' and profile.company_id:
                 if doc.worker.company_id != profile.company_id:
                     return redirect('document_list')
-            doc.save()
+            with transaction.atomic():
+                doc.save()
+                webhooks.documents_created([doc])
             # Redirect back to worker detail if came from there
             if worker_id:
                 return redirect('worker_detail', pk=worker_id)
@@ -284,7 +402,7 @@ def document_update(request, pk):
     profile = getattr(request.user, 'profile', None)
     qs = Document.objects.select_related('worker', 'worker__company')
     if profile and profile.role == 'CLIENT' and profile.company_id:
-        qs = qs.filter(worker__company_id=profile.company_id)
+        qs = qs.filter(company_id=profile.company_id)
     document = get_object_or_404(qs, pk=pk)
     if request.method == 'POST':
         form = DocumentForm(request.POST, instance=document)
@@ -307,7 +425,7 @@ def document_delete(request, pk):
     profile = getattr(request.user, 'profile', None)
     qs = Document.objects.select_related('worker', 'worker__company')
     if profile and profile.role == 'CLIENT' and profile.company_id:
-        qs = qs.filter(worker__company_id=profile.company_id)
+        qs = qs.filter(company_id=profile.company_id)
     document = get_object_or_404(qs, pk=pk)
     if request.method == 'POST':
         document.delete()
@@ -321,82 +439,411 @@ def document_renew(request, pk):
     profile = getattr(request.user, 'profile', None)
     qs = Document.objects.select_related('worker', 'worker__company')
     if profile and profile.role == 'CLIENT' and profile.company_id:
-        qs = qs.filter(worker__company_id=profile.company_id)
+        qs = qs.filter(company_id=profile.company_id)
     document = get_object_or_404(qs, pk=pk)
     if request.method == 'POST':
         form = RenewalForm(request.POST)
         if form.is_valid():
-            renewal: RenewalHistory = form.save(commit=False)
-            renewal.document = document
-            renewal.save()
-            # Update document with new data if provided
-            if renewal.new_document_number:
-                document.document_number = renewal.new_document_number
-            if renewal.new_issue_date:
-                document.issue_date = renewal.new_issue_date
-            if renewal.new_expiry_date:
-                document.expiry_date = renewal.new_expiry_date
-            # Recalculate status
-            document.status = (
-                Document.Status.ACTIVE
-                if document.expiry_date >= timezone.localdate()
-                else Document.Status.EXPIRED
-            )
-            document.save()
+            with transaction.atomic():
+                renewal: RenewalHistory = form.save(commit=False)
+                renewal.document = document
+                renewal.previous_expiry_date = document.expiry_date
+                renewal.save()
+                # Update document with new data if provided
+                if renewal.new_document_number:
+                    document.document_number = renewal.new_document_number
+                if renewal.new_issue_date:
+                    document.issue_date = renewal.new_issue_date
+                if renewal.new_expiry_date:
+                    document.expiry_date = renewal.new_expiry_date
+                # Recalculate status
+                document.status = (
+                    Document.Status.ACTIVE
+                    if document.expiry_date >= timezone.localdate()
+                    else Document.Status.EXPIRED
+                )
+                document.save()
+                webhooks.document_renewed(document, renewal)
             return redirect('document_list')
     else:
         form = RenewalForm()
     return render(request, 'core/renew_form.html', {'form': form, 'document': document, 'title': 'Perpanjang Dokumen'})
 
 
+def _report_company_id(request):
+    profile = getattr(request.user, 'profile', None)
+    if profile and profile.role == 'CLIENT' and profile.company_id:
+        return profile.company_id
+    return None
+
+
+@login_required
+def compliance_report(request):
+    rows = reports.compliance_report(_report_company_id(request))
+    return render(request, 'core/compliance_report.html', {
+        'rows': rows,
+        'document_types': reports.DOCUMENT_TYPES,
+    })
+
+
+@login_required
+def compliance_report_xlsx(request):
+    rows = reports.compliance_report(_report_company_id(request))
+    response = HttpResponse(
+        reports.write_compliance_xlsx(rows),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+    response['Content-Disposition'] = f'attachment; filename="laporan-kepatuhan-{timezone.localdate():%Y%m%d}.xlsx"'
+    return response
+
+
+TREND_RANGES = [(90, '3 bulan'), (180, '6 bulan'), (365, '1 tahun'), (730, '2 tahun')]
+
+
+def _trend_params(request):
+    try:
+        days = int(request.GET.get('rentang', 365))
+    except ValueError:
+        days = 365
+    if days not in dict(TREND_RANGES):
+        days = 365
+    company_id = _report_company_id(request)
+    if company_id is None and request.GET.get('perusahaan', '').isdigit():
+        company_id = int(request.GET['perusahaan'])
+    document_type = request.GET.get('jenis', '')
+    if document_type not in Document.DocumentType.values:
+        document_type = ''
+    return company_id, document_type, days
+
+
+@login_required
+def document_trend(request):
+    company_id, document_type, days = _trend_params(request)
+    return render(request, 'core/document_trend.html', {
+        'companies': None if _report_company_id(request) else Company.objects.order_by('name').only('id', 'name'),
+        'company_id': company_id,
+        'document_type': document_type,
+        'document_types': Document.DocumentType.choices,
+        'days': days,
+        'ranges': TREND_RANGES,
+        'querystring': request.GET.urlencode(),
+        'expiring_days': settings.SNAPSHOT_EXPIRING_DAYS,
+    })
+
+
+@login_required
+def document_trend_json(request):
+    company_id, document_type, days = _trend_params(request)
+    return JsonResponse(snapshots.trend(company_id, document_type, days))
+
+
+@login_required
+def document_forecast_json(request):
+    """Active documents expiring per week over the selected range, per type."""
+    company_id, document_type, days = _trend_params(request)
+    return JsonResponse(expiry_index.current().forecast(timezone.localdate(), days, company_id, document_type))
+
+
+@login_required
+def renewal_list(request):
+    profile = getattr(request.user, 'profile', None)
+    qs = RenewalHistory.objects.select_related('document', 'document__worker', 'document__worker__company')
+    if profile and profile.role == 'CLIENT' and profile.company_id:
+        qs = qs.filter(document__company_id=profile.company_id)
+    page = keyset_paginate(qs, request.GET.get('setelah'), RENEWALS_PER_PAGE, 'submission_date')
+    return render(request, 'core/renewal_list.html', {'renewals': page, 'page': page})
+
+
+# Attachments
+def _visible_documents(request):
+    documents = Document.objects.all()
+    profile = getattr(request.user, 'profile', None)
+    if profile and profile.role == 'CLIENT' and profile.company_id:
+        documents = documents.filter(company_id=profile.company_id)
+    return documents
+
+
+def _visible_attachments(request):
+    documents = _visible_documents(request).values('pk')
+    return Attachment.objects.select_related('stored_file').filter(
+        Q(document__in=documents) | Q(renewal__document__in=documents)
+    )
+
+
+def _session_json(request, session):
+    attachment = session.attachment
+    return {
+        'id': str(session.pk),
+        'url': reverse('upload_session', args=[session.pk]),
+        'offset': uploads.stored_offset(session),
+        'size': session.size,
+        'chunk_size': settings.ATTACHMENT_CHUNK_BYTES,
+        'complete': session.status == UploadSession.Status.COMPLETE,
+        'attachment': attachment and {
+            'id': attachment.pk,
+            'filename': attachment.filename,
+            'url': reverse('attachment_download', args=[attachment.pk]),
+        },
+    }
+
+
+def _upload_error(exc):
+    return JsonResponse({'error': str(exc), 'offset': exc.offset}, status=exc.status)
+
+
+@login_required
+def attachments(request, pk, kind):
+    """Attachments of a document or renewal; POST (JSON) opens an upload session."""
+    visible = _visible_documents(request)
+    documents = visible.select_related('worker')
+    if kind == 'perpanjangan':
+        renewal = get_object_or_404(RenewalHistory.objects.filter(document__in=documents).select_related('document__worker'), pk=pk)
+        document, target = renewal.document, renewal
+    else:
+        renewal, document = None, get_object_or_404(documents, pk=pk)
+        target = document
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body or b'{}')
+            session = uploads.open_session(
+                request.user, data.get('filename'), data.get('size'), data.get('sha256'), document, renewal,
+                visible_documents=visible,
+            )
+        except ValueError:
+            return JsonResponse({'error': 'Permintaan tidak valid'}, status=400)
+        except uploads.UploadError as exc:
+            return _upload_error(exc)
+        return JsonResponse(_session_json(request, session), status=201)
+    return render(request, 'core/attachments.html', {
+        'document': document,
+        'renewal': renewal,
+        'attachments': target.attachments.select_related('stored_file', 'uploaded_by').order_by('-created_at'),
+        'max_bytes': settings.ATTACHMENT_MAX_BYTES,
+    })
+
+
+@login_required
+@require_http_methods(['GET', 'PATCH'])
+def upload_session(request, pk):
+    """GET reports the stored offset (to resume); PATCH appends one chunk at ``Upload-Offset``."""
+    session = get_object_or_404(UploadSession.objects.select_related('attachment'), pk=pk, user=request.user)
+    if request.method == 'GET':
+        return JsonResponse(_session_json(request, session))
+    try:
+        start = int(request.headers['Upload-Offset'])
+        length = int(request.headers['Content-Length'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Header Upload-Offset dan Content-Length wajib'}, status=400)
+    checksum = request.headers.get('Upload-Checksum', '')
+    algorithm, _, checksum = checksum.partition(' ')
+    if algorithm and algorithm.lower() != 'sha256':
+        return JsonResponse({'error': 'Upload-Checksum hanya mendukung sha256'}, status=400)
+    try:
+        # The body is read straight from the request stream, never as request.body
+        offset = uploads.write_chunk(session, request, start, length, checksum.strip() or None)
+        if offset == session.size:
+            attachment, stored, created = uploads.complete(session)
+            if created:
+                jobs.enqueue('attachment_preview', {'stored_file_id': stored.pk}, user=request.user)
+    except uploads.UploadError as exc:
+        return _upload_error(exc)
+    return JsonResponse(_session_json(request, session))
+
+
+@login_required
+def attachment_download(request, pk):
+    attachment = get_object_or_404(_visible_attachments(request), pk=pk)
+    # Served inline with range support, so PDF viewers can fetch pages on demand
+    return media.serve_file(
+        request, attachment.stored_file.file.name,
+        as_attachment=request.GET.get('unduh') == '1', filename=attachment.filename,
+    )
+
+
+@login_required
+def attachment_preview(request, pk):
+    attachment = get_object_or_404(_visible_attachments(request), pk=pk)
+    return media.serve_file(request, attachment.stored_file.preview.name)
+
+
+@login_required
+@require_POST
+def attachment_delete(request, pk):
+    attachment = get_object_or_404(_visible_attachments(request), pk=pk)
+    # The stored content stays until `purge_uploads` finds it unused
+    attachment.delete()
+    if attachment.renewal_id:
+        return redirect('renewal_attachments', pk=attachment.renewal_id)
+    return redirect('document_attachments', pk=attachment.document_id)
+
+
 # Exports
+def _enqueue_export(request, kind, filters):
+    profile = getattr(request.user, 'profile', None)
+    payload = {}
+    if profile and profile.role == 'CLIENT' and profile.company_id:
+        payload['company_id'] = profile.company_id
+    if filters:
+        payload['filters'] = filters
+    try:
+        job, reused = jobs.request_export(kind, payload, request.user)
+    except jobs.ExportThrottled as exc:
+        response = render(request, 'core/export_throttled.html', {
+            'message': str(exc),
+            'retry_after': exc.retry_after,
+            'back': request.META.get('HTTP_REFERER') or reverse('dashboard'),
+        }, status=429)
+        response['Retry-After'] = str(exc.retry_after)
+        return response
+    return redirect('job_detail', pk=job.pk)
+
+
 @login_required
+@require_POST
 def export_workers_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="workers.csv"'
-    writer = csv.writer(response)
-    writer.writerow([
-        'Nama', 'No Paspor', 'Kewarganegaraan', 'Tanggal Lahir', 'Perusahaan', 'Jabatan', 'Tanggal Mulai'
-    ])
+    filters = filter_params(worker_facets(), request.GET)
+    if request.GET.get('q'):
+        filters['q'] = request.GET['q']
+    return _enqueue_export(request, 'export_workers_csv', filters)
+
+
+@login_required
+@require_POST
+def export_documents_csv(request):
+    return _enqueue_export(request, 'export_documents_csv', filter_params(document_facets(), request.GET))
+
+
+# Autocomplete
+AUTOCOMPLETE_LIMIT = 20
+
+
+def _autocomplete_response(queryset, term, fields, label):
+    if term:
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f'{field}__istartswith': term})
+        queryset = queryset.filter(condition)
+    rows = list(queryset[:AUTOCOMPLETE_LIMIT + 1])
+    return JsonResponse({
+        'results': [{'id': obj.pk, 'text': label(obj)} for obj in rows[:AUTOCOMPLETE_LIMIT]],
+        'pagination': {'more': len(rows) > AUTOCOMPLETE_LIMIT},
+    })
+
+
+@login_required
+def autocomplete_workers(request):
     profile = getattr(request.user, 'profile', None)
-    qs = Worker.objects.select_related('company').all()
+    qs = Worker.objects.only('id', 'name', 'passport_number').order_by('name', 'id')
     if profile and profile.role == 'CLIENT' and profile.company_id:
         qs = qs.filter(company_id=profile.company_id)
-    for w in qs:
-        writer.writerow([
-            w.name,
-            w.passport_number,
-            w.nationality,
-            w.birth_date,
-            w.company.name if w.company else '',
-            w.position,
-            w.start_date or '',
-        ])
-    return response
+    return _autocomplete_response(qs, request.GET.get('q', '').strip(), ('name', 'passport_number'), str)
 
 
 @login_required
-def export_documents_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="documents.csv"'
-    writer = csv.writer(response)
-    writer.writerow([
-        'Pekerja', 'Jenis', 'No Dokumen', 'Tanggal Terbit', 'Tanggal Berakhir', 'Status', 'Sisa Hari'
-    ])
+def autocomplete_companies(request):
     profile = getattr(request.user, 'profile', None)
-    qs = Document.objects.select_related('worker').all()
+    qs = Company.objects.only('id', 'name').order_by('name', 'id')
     if profile and profile.role == 'CLIENT' and profile.company_id:
-        qs = qs.filter(worker__company_id=profile.company_id)
-    for d in qs:
-        writer.writerow([
-            d.worker.name,
-            d.type,
-            d.document_number,
-            d.issue_date,
-            d.expiry_date,
-            d.status,
-            d.days_until_expiry,
-        ])
+        qs = qs.filter(id=profile.company_id)
+    return _autocomplete_response(qs, request.GET.get('q', '').strip(), ('name',), str)
+
+
+# Background jobs
+def _job_queryset(request):
+    qs = Job.objects.all()
+    if not request.user.is_staff:
+        qs = qs.filter(created_by=request.user)
+    return qs
+
+
+@login_required
+def job_list(request):
+    qs = _job_queryset(request).select_related('created_by').order_by('-created_at', '-id')
+    paginator = Paginator(qs, 25)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(request, 'core/job_list.html', {'jobs': page_obj, 'page_obj': page_obj})
+
+
+@login_required
+def job_detail(request, pk):
+    job = get_object_or_404(_job_queryset(request), pk=pk)
+    return render(request, 'core/job_detail.html', {'job': job})
+
+
+@login_required
+def job_download(request, pk):
+    job = get_object_or_404(_job_queryset(request), pk=pk, status=Job.Status.DONE)
+    if not job.result_file:
+        raise Http404
+    return media.serve_file(request, job.result_file.name, as_attachment=True)
+
+
+@login_required
+def protected_media(request, path):
+    """Serve an uploaded file after checking that its owner is visible to the user."""
+    profile = getattr(request.user, 'profile', None)
+    if path.startswith('workers/photos/'):
+        owners = Worker.objects.filter(photo=path)
+        if profile and profile.role == 'CLIENT' and profile.company_id:
+            owners = owners.filter(company_id=profile.company_id)
+        allowed = owners.exists()
+    elif path.startswith('jobs/'):
+        allowed = _job_queryset(request).filter(result_file=path).exists()
+    elif path.startswith('attachments/'):
+        allowed = _visible_attachments(request).filter(Q(stored_file__file=path) | Q(stored_file__preview=path)).exists()
+    else:
+        allowed = request.user.is_staff
+    if not allowed:
+        raise Http404
+    return media.serve_file(request, path)
+
+
+def _calendar_feed_state(request, token):
+    # Shared by the condition() callbacks and the view: one lookup per request
+    if not hasattr(request, '_calendar_feed_state'):
+        feed = CalendarFeed.objects.select_related('user__profile').filter(token=token).first()
+        request._calendar_feed_state = (feed, *ical.feed_state(feed)) if feed else (None, None, None)
+    return request._calendar_feed_state
+
+
+@condition(
+    etag_func=lambda request, token: _calendar_feed_state(request, token)[1],
+    last_modified_func=lambda request, token: _calendar_feed_state(request, token)[2],
+)
+def calendar_feed(request, token):
+    """iCalendar feed behind a secret token; exempt from login."""
+    feed, etag, changed = _calendar_feed_state(request, token)
+    if feed is None:
+        raise Http404
+    response = StreamingHttpResponse(ical.cached_feed(feed, etag, changed), content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = 'inline; filename="dokumen-tka.ics"'
     return response
 
-# Create your views here.
+
+@login_required
+def calendar_feeds(request):
+    profile = getattr(request.user, 'profile', None)
+    is_client = bool(profile and profile.role == 'CLIENT' and profile.company_id)
+    companies = Company.objects.order_by('name')
+    if is_client:
+        companies = companies.filter(id=profile.company_id)
+    feeds = CalendarFeed.objects.filter(user=request.user).select_related('company').order_by('-created_at')
+    if request.method == 'POST':
+        if 'hapus' in request.POST:
+            feeds.filter(pk=request.POST.get('hapus')).delete()
+        else:
+            company_id = request.POST.get('company') or None
+            company = get_object_or_404(companies, pk=company_id) if company_id else None
+            CalendarFeed.objects.create(user=request.user, company=company)
+        return redirect('calendar_feeds')
+    for feed in feeds:
+        feed.url = request.build_absolute_uri(reverse('calendar_feed', args=[feed.token]))
+    return render(request, 'core/calendar_feeds.html', {'feeds': feeds, 'companies': companies, 'is_client': is_client})
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; exempt from login, guarded by the metrics token."""
+    if not metrics.is_authorized(request):
+        return HttpResponseForbidden()
+    body, content_type = metrics.render()
+    return HttpResponse(body, content_type=content_type)
@@ -0,0 +1,355 @@
+"""Outbound webhooks for document lifecycle events.
+
+Changes queue their events with ``emit`` inside the transaction that makes
+the change, as ``WebhookDelivery`` outbox rows (one per subscribed
+endpoint), so an event is sent if and only if the change committed.
+Time-driven events (``document.expired``, ``document.alert`` when a
+document enters an alert level) are queued by ``scan_lifecycle``; the
+``event_key`` unique constraint makes rescans idempotent.
+
+``dispatch`` claims a batch of due rows, posts them concurrently from an
+asyncio loop over plain HTTP/1.1 connections, and records the outcome:
+failures retry with exponential backoff up to ``WEBHOOK_MAX_ATTEMPTS``.
+Each endpoint is limited to ``rate_limit_per_minute`` per dispatcher
+process; over-limit rows are pushed back instead of sent. Bodies are
+signed as ``X-TKA-Signature: t=<unix time>,v1=<hex HMAC-SHA256 of
+"<t>.<body>">`` with the endpoint secret (see ``verify_signature``).
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import ssl
+import time
+import uuid
+from contextlib import suppress
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import alerts, metrics
+from .models import Document, WebhookDelivery, WebhookEndpoint
+
+
+Event = WebhookEndpoint.Event
+SIGNATURE_HEADER = 'X-TKA-Signature'
+USER_AGENT = 'tka-dashboard-webhooks/1'
+LEASE_SECONDS = 60
+
+
+def document_payload(document) -> dict:
+    return {
+        'id': document.pk,
+        'type': document.type,
+        'document_number': document.document_number,
+        'issue_date': document.issue_date,
+        'expiry_date': document.expiry_date,
+        'status': document.status,
+        'company_id': document.company_id,
+        'worker': {
+            'id': document.worker_id,
+            'name': document.worker.name,
+            'passport_number': document.worker.passport_number,
+        },
+    }
+
+
+def emit(event, items) -> int:
+    """Queue ``event`` for every subscribed endpoint; returns the number of rows written.
+
+    ``items`` are ``(company_id, event_key, data)`` tuples. Call inside the
+    transaction that makes the change.
+    """
+    items = list(items)
+    if not items:
+        return 0
+    company_ids = {company_id for company_id, _, _ in items}
+    endpoints = [
+        endpoint for endpoint in WebhookEndpoint.objects.filter(is_active=True).filter(
+            Q(company__isnull=True) | Q(company_id__in=company_ids)
+        )
+        if endpoint.subscribes(event)
+    ]
+    if not endpoints:
+        return 0
+    # Rescans skip events already queued; the unique constraint covers concurrent writers
+    queued = set(WebhookDelivery.objects.filter(
+        endpoint__in=endpoints, event_key__in=[key for _, key, _ in items]
+    ).values_list('endpoint_id', 'event_key'))
+    now = timezone.now()
+    rows = [
+        WebhookDelivery(
+            endpoint=endpoint, event=event, event_key=key, created_at=now, next_attempt_at=now,
+            # Round-trip through JSON so dates are stored as ISO strings
+            payload=json.loads(json.dumps(
+                {'id': key, 'event': event, 'created_at': now, 'data': data}, cls=DjangoJSONEncoder
+            )),
+        )
+        for company_id, key, data in items
+        for endpoint in endpoints
+        if endpoint.company_id in (None, company_id) and (endpoint.pk, key) not in queued
+    ]
+    WebhookDelivery.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+    return len(rows)
+
+
+def documents_created(documents) -> int:
+    return emit(Event.DOCUMENT_CREATED, [
+        (doc.company_id, f'{Event.DOCUMENT_CREATED}:{doc.pk}', document_payload(doc)) for doc in documents
+    ])
+
+
+def documents_expired(documents) -> int:
+    # Same key as scan_lifecycle, so the nightly scan does not queue the event again
+    return emit(Event.DOCUMENT_EXPIRED, [
+        (doc.company_id, f'{Event.DOCUMENT_EXPIRED}:{doc.pk}:{doc.expiry_date}', document_payload(doc)) for doc in documents
+    ])
+
+
+def document_renewed(document, renewal) -> int:
+    data = {
+        **document_payload(document),
+        'renewal': {
+            'id': renewal.pk,
+            'submission_date': renewal.submission_date,
+            'process_status': renewal.process_status,
+            'notes': renewal.notes,
+        },
+    }
+    return emit(Event.DOCUMENT_RENEWED, [(document.company_id, f'{Event.DOCUMENT_RENEWED}:{renewal.pk}', data)])
+
+
+def _emit_chunks(event, rows, key, extra=lambda doc: {}):
+    queued, chunk = 0, []
+    for doc in rows:
+        chunk.append((doc.company_id, key(doc), {**document_payload(doc), **extra(doc)}))
+        if len(chunk) >= 2000:
+            with transaction.atomic():
+                queued += emit(event, chunk)
+            chunk = []
+    with transaction.atomic():
+        queued += emit(event, chunk)
+    return queued
+
+
+def scan_lifecycle(today=None) -> dict:
+    """Queue ``document.expired`` and ``document.alert`` events that are due; returns counts.
+
+    Keys carry the expiry date (and level), so a renewed document that
+    expires or enters a level again produces a new event.
+    """
+    today = today or timezone.localdate()
+    if not WebhookEndpoint.objects.filter(is_active=True).exists():
+        return {'expired': 0, 'alert': 0}
+    expired = Document.objects.select_related('worker').filter(
+        status=Document.Status.ACTIVE,
+        expiry_date__lt=today,
+        expiry_date__gte=today - timedelta(days=settings.WEBHOOK_EXPIRED_LOOKBACK_DAYS),
+    ).order_by('expiry_date', 'id')
+    in_window = alerts.with_alert_level(Document.objects.select_related('worker'), today).order_by('expiry_date', 'id')
+    return {
+        'expired': _emit_chunks(
+            Event.DOCUMENT_EXPIRED, expired.iterator(chunk_size=2000),
+            lambda doc: f'{Event.DOCUMENT_EXPIRED}:{doc.pk}:{doc.expiry_date}',
+        ),
+        'alert': _emit_chunks(
+            Event.DOCUMENT_ALERT, in_window.iterator(chunk_size=2000),
+            lambda doc: f'{Event.DOCUMENT_ALERT}:{doc.pk}:{doc.expiry_date}:{doc.alert_level}',
+            lambda doc: {'alert_level': doc.alert_level},
+        ),
+    }
+
+
+# Delivery
+
+def sign(secret, body, timestamp=None) -> str:
+    timestamp = int(time.time() if timestamp is None else timestamp)
+    digest = hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={digest}'
+
+
+def verify_signature(secret, header, body, tolerance=300) -> bool:
+    """Receiver-side check of ``X-TKA-Signature`` (also handy for local stub servers)."""
+    try:
+        parts = dict(item.split('=', 1) for item in header.split(','))
+        timestamp = int(parts['t'])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(sign(secret, body, timestamp), header)
+
+
+class RateLimiter:
+    """Token bucket per endpoint, refilled continuously at ``rate_limit_per_minute``."""
+
+    def __init__(self):
+        self.buckets = {}
+
+    def take(self, endpoint, now=None):
+        """Take one token; returns 0 on success, else the seconds until one is available."""
+        if not endpoint.rate_limit_per_minute:
+            return 0
+        now = time.monotonic() if now is None else now
+        rate = endpoint.rate_limit_per_minute / 60
+        tokens, last = self.buckets.get(endpoint.pk, (endpoint.rate_limit_per_minute, now))
+        tokens = min(endpoint.rate_limit_per_minute, tokens + (now - last) * rate)
+        if tokens >= 1:
+            self.buckets[endpoint.pk] = (tokens - 1, now)
+            return 0
+        self.buckets[endpoint.pk] = (tokens, now)
+        return (1 - tokens) / rate
+
+
+def claim(limiter, batch_size=None) -> list:
+    """Lease a batch of due deliveries to this process, deferring those over their endpoint's rate."""
+    batch_size = batch_size or settings.WEBHOOK_BATCH_SIZE
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    lease_until = now + timedelta(seconds=settings.WEBHOOK_TIMEOUT_SECONDS + LEASE_SECONDS)
+    with transaction.atomic():
+        due = list(
+            WebhookDelivery.objects.select_related('endpoint')
+            .filter(status=WebhookDelivery.Status.PENDING, next_attempt_at__lte=now, endpoint__is_active=True)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        claimed, deferred, queued = [], [], {}
+        for delivery in due:
+            wait = limiter.take(delivery.endpoint)
+            if wait:
+                # Space the backlog of a throttled endpoint at its rate instead of retrying it all at once
+                position = queued.setdefault(delivery.endpoint_id, 0)
+                queued[delivery.endpoint_id] += 1
+                wait += position * 60 / delivery.endpoint.rate_limit_per_minute
+                delivery.next_attempt_at = now + timedelta(seconds=wait)
+                deferred.append(delivery)
+            else:
+                claimed.append(delivery)
+        WebhookDelivery.objects.bulk_update(deferred, ['next_attempt_at'])
+        # The due guard keeps leases exclusive between dispatcher processes
+        WebhookDelivery.objects.filter(pk__in=[d.pk for d in claimed], next_attempt_at__lte=now).update(
+            next_attempt_at=lease_until, locked_by=token,
+        )
+        leased = set(WebhookDelivery.objects.filter(locked_by=token).values_list('pk', flat=True))
+    return [delivery for delivery in claimed if delivery.pk in leased]
+
+
+async def _post(url, body, headers, timeout):
+    """POST ``body`` with HTTP/1.1 and return ``(status, headers)``."""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError(f'URL tidak didukung: {url}')
+    secure = parts.scheme == 'https'
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(
+            parts.hostname, parts.port or (443 if secure else 80),
+            ssl=ssl.create_default_context() if secure else None,
+        ),
+        timeout,
+    )
+    try:
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        lines = [
+            f'POST {path} HTTP/1.1',
+            f'Host: {parts.netloc}',
+            f'User-Agent: {USER_AGENT}',
+            'Content-Type: application/json',
+            f'Content-Length: {len(body)}',
+            'Connection: close',
+            *(f'{name}: {value}' for name, value in headers.items()),
+        ]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            raise ValueError(f'Respons HTTP tidak valid: {status_line[:80]!r}')
+        response_headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+        return status, response_headers
+    finally:
+        writer.close()
+        with suppress(OSError, asyncio.TimeoutError):
+            await asyncio.wait_for(writer.wait_closed(), 1)
+
+
+async def _send_all(deliveries, concurrency, timeout):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(delivery):
+        body = json.dumps(delivery.payload, separators=(',', ':')).encode()
+        headers = {
+            SIGNATURE_HEADER: sign(delivery.endpoint.secret, body),
+            'X-TKA-Event': delivery.event,
+            'X-TKA-Delivery': str(delivery.pk),
+        }
+        async with semaphore:
+            try:
+                status, response_headers = await asyncio.wait_for(
+                    _post(delivery.endpoint.url, body, headers, timeout), timeout * 2
+                )
+            except (OSError, ValueError, asyncio.TimeoutError) as exc:
+                return delivery, None, {}, f'{type(exc).__name__}: {exc}'
+        return delivery, status, response_headers, ''
+
+    return await asyncio.gather(*(send(delivery) for delivery in deliveries))
+
+
+def _retry_delay(attempts, response_headers):
+    delay = min(settings.WEBHOOK_BACKOFF_SECONDS * 2 ** (attempts - 1), settings.WEBHOOK_BACKOFF_MAX_SECONDS)
+    with suppress(ValueError):
+        delay = max(delay, int(response_headers.get('retry-after', 0)))
+    return delay
+
+
+def _record(results):
+    now = timezone.now()
+    counts = {'delivered': 0, 'retry': 0, 'failed': 0}
+    for delivery, status, response_headers, error in results:
+        delivery.attempts += 1
+        delivery.response_code = status
+        delivery.locked_by = ''
+        if status is not None and 200 <= status < 300:
+            delivery.status = WebhookDelivery.Status.DELIVERED
+            delivery.delivered_at = now
+            delivery.last_error = ''
+            result = 'delivered'
+        else:
+            delivery.last_error = error or f'HTTP {status}'
+            if delivery.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                delivery.status = WebhookDelivery.Status.FAILED
+                result = 'failed'
+            else:
+                delivery.next_attempt_at = now + timedelta(seconds=_retry_delay(delivery.attempts, response_headers))
+                result = 'retry'
+        counts[result] += 1
+        metrics.WEBHOOK_DELIVERIES.labels(delivery.event, result).inc()
+    WebhookDelivery.objects.bulk_update(
+        [delivery for delivery, *_ in results],
+        ['status', 'attempts', 'response_code', 'locked_by', 'delivered_at', 'last_error', 'next_attempt_at'],
+    )
+    return counts
+
+
+def dispatch(limiter, batch_size=None, concurrency=None, timeout=None) -> dict:
+    """Send one batch of due deliveries; returns counts per outcome (all zero when nothing is due)."""
+    deliveries = claim(limiter, batch_size)
+    if not deliveries:
+        return {'delivered': 0, 'retry': 0, 'failed': 0}
+    results = asyncio.run(_send_all(
+        deliveries,
+        concurrency or settings.WEBHOOK_CONCURRENCY,
+        timeout or settings.WEBHOOK_TIMEOUT_SECONDS,
+    ))
+    return _record(results)
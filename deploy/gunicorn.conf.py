@@ -0,0 +1,51 @@
+# Gunicorn settings for the TKA Dashboard.
+#
+# Metrics from all workers (and the run_jobs worker) are aggregated through
+# files in PROMETHEUS_MULTIPROC_DIR, which must be set in the environment
+# before gunicorn starts (see the systemd unit in README.md).
+import os
+
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:8001')
+workers = int(os.getenv('GUNICORN_WORKERS', '3'))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def on_starting(server):
+    # Drop sample files of processes from a previous run; files are named <type>_<pid>.db
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        pid = name.rsplit('_', 1)[-1].split('.', 1)[0]
+        if pid.isdigit() and not _pid_alive(int(pid)):
+            os.remove(os.path.join(path, name))
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # Map the shared expiry index before serving (a stale one is rebuilt by run_jobs)
+    from django.db import connections
+
+    from dashboard import expiry_index
+
+    try:
+        expiry_index.current()
+    except Exception:
+        worker.log.exception('Expiry index not ready; answering from SQL until it is rebuilt')
+    finally:
+        connections.close_all()
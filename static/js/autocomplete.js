@@ -0,0 +1,62 @@
+// Type-ahead for <select data-autocomplete-url="..."> rendered by AutocompleteSelect.
+// The server only renders the selected option; matches are fetched as JSON
+// ({results: [{id, text}], pagination: {more}}) while the user types.
+(function () {
+  'use strict';
+
+  var DEBOUNCE_MS = 250;
+
+  function setup(select) {
+    var search = document.createElement('input');
+    search.type = 'search';
+    search.className = 'form-control mb-1';
+    search.placeholder = 'Ketik untuk mencari...';
+    search.autocomplete = 'off';
+    select.parentNode.insertBefore(search, select);
+
+    var timer = null;
+    var controller = null;
+
+    function render(results, more) {
+      var selected = select.value;
+      var keep = Array.prototype.filter.call(select.options, function (opt) {
+        return opt.value === '' || opt.value === selected;
+      });
+      select.innerHTML = '';
+      keep.forEach(function (opt) { select.appendChild(opt); });
+      results.forEach(function (item) {
+        if (String(item.id) === selected) { return; }
+        select.appendChild(new Option(item.text, item.id));
+      });
+      if (more) {
+        var hint = new Option('Ketik lebih spesifik untuk hasil lain...', '');
+        hint.disabled = true;
+        select.appendChild(hint);
+      }
+      select.size = Math.min(Math.max(select.options.length, 2), 8);
+    }
+
+    function lookup() {
+      if (controller) { controller.abort(); }
+      controller = new AbortController();
+      var url = select.dataset.autocompleteUrl + '?q=' + encodeURIComponent(search.value.trim());
+      fetch(url, { credentials: 'same-origin', signal: controller.signal })
+        .then(function (response) { return response.json(); })
+        .then(function (data) { render(data.results, data.pagination && data.pagination.more); })
+        .catch(function () {});
+    }
+
+    search.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(lookup, DEBOUNCE_MS);
+    });
+    search.addEventListener('focus', function () {
+      if (select.options.length <= 2) { lookup(); }
+    });
+    select.addEventListener('change', function () { select.size = 1; });
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('select[data-autocomplete-url]').forEach(setup);
+  });
+})();
@@ -0,0 +1,107 @@
+// Resumable upload for <form id="upload-form" data-upload-url="...">.
+// The file's SHA-256 opens (or resumes) a session; chunks are then PATCHed
+// to the session URL with Upload-Offset and Upload-Checksum headers. After
+// a failed chunk the stored offset is asked for and the upload continues
+// from there.
+(function () {
+  'use strict';
+
+  var RETRIES = 5;
+
+  var form = document.getElementById('upload-form');
+  if (!form) { return; }
+  var input = document.getElementById('upload-file');
+  var status = document.getElementById('upload-status');
+  var progress = document.getElementById('upload-progress');
+  var bar = progress.querySelector('.progress-bar');
+  var csrf = form.querySelector('[name=csrfmiddlewaretoken]').value;
+
+  function hex(buffer) {
+    return Array.prototype.map.call(new Uint8Array(buffer), function (b) {
+      return ('0' + b.toString(16)).slice(-2);
+    }).join('');
+  }
+
+  function sha256(blob) {
+    return blob.arrayBuffer().then(function (data) {
+      return crypto.subtle.digest('SHA-256', data);
+    }).then(hex);
+  }
+
+  function request(method, url, options) {
+    options = options || {};
+    var headers = Object.assign({'X-CSRFToken': csrf}, options.headers || {});
+    return fetch(url, {method: method, headers: headers, body: options.body, credentials: 'same-origin'})
+      .then(function (response) {
+        return response.json().catch(function () { return {}; }).then(function (data) {
+          data.httpStatus = response.status;
+          return data;
+        });
+      });
+  }
+
+  function show(offset, size) {
+    var percent = size ? Math.floor(offset * 100 / size) : 100;
+    bar.style.width = percent + '%';
+    bar.textContent = percent + '%';
+  }
+
+  function send(session, file, retries) {
+    if (session.complete) { return Promise.resolve(session); }
+    show(session.offset, file.size);
+    var chunk = file.slice(session.offset, Math.min(session.offset + session.chunk_size, file.size));
+    return sha256(chunk).then(function (digest) {
+      return request('PATCH', session.url, {
+        body: chunk,
+        headers: {
+          'Content-Type': 'application/offset+octet-stream',
+          'Upload-Offset': String(session.offset),
+          'Upload-Checksum': 'sha256 ' + digest
+        }
+      });
+    }).catch(function () {
+      return {httpStatus: 0};
+    }).then(function (data) {
+      if (data.httpStatus === 200) { return send(data, file, RETRIES); }
+      if (data.httpStatus >= 400 && data.httpStatus < 500 && data.httpStatus !== 409 && data.offset === undefined) {
+        throw new Error(data.error || 'Unggah gagal');
+      }
+      if (data.httpStatus === 422 || data.httpStatus === 415 || retries <= 0) {
+        throw new Error(data.error || 'Koneksi terputus');
+      }
+      // Ask the server where to continue from
+      return new Promise(function (resolve) { setTimeout(resolve, (RETRIES - retries + 1) * 1000); })
+        .then(function () { return request('GET', session.url); })
+        .then(function (current) {
+          return send(current.httpStatus === 200 ? current : session, file, retries - 1);
+        }, function () { return send(session, file, retries - 1); });
+    });
+  }
+
+  form.addEventListener('submit', function (event) {
+    event.preventDefault();
+    var file = input.files[0];
+    if (!file) { return; }
+    var button = form.querySelector('button');
+    button.disabled = true;
+    progress.classList.remove('d-none');
+    status.textContent = 'Menghitung checksum...';
+    sha256(file).then(function (digest) {
+      return request('POST', form.dataset.uploadUrl, {
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({filename: file.name, size: file.size, sha256: digest})
+      });
+    }).then(function (session) {
+      if (session.httpStatus !== 201) { throw new Error(session.error || 'Unggah gagal'); }
+      status.textContent = session.offset ? 'Melanjutkan unggahan...' : 'Mengunggah...';
+      return send(session, file, RETRIES);
+    }).then(function () {
+      show(1, 1);
+      status.textContent = 'Selesai.';
+      window.location.reload();
+    }).catch(function (error) {
+      status.textContent = error.message;
+      button.disabled = false;
+    });
+  });
+})();
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'dashboard.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'dashboard.middleware.LoginRequiredMiddleware',
+    'dashboard.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'tka_dashboard.urls'
@@ -103,11 +105,17 @@ if POSTGRES_NAME and POSTGRES_USER and POSTGRES_PASSWORD:
 else:
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
+            # dashboard.sqlite adds WAL, busy_timeout and BEGIN IMMEDIATE for multi-worker use
+            'ENGINE': 'dashboard.sqlite' if os.getenv('SQLITE_TUNED', 'True').lower() == 'true' else 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
 
+# Pragmas applied by the tuned SQLite backend (dashboard/sqlite/base.py)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -151,6 +159,18 @@ STATICFILES_DIRS = [
 
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Uploaded files are served by dashboard.views.protected_media after an access
+# check. In production let nginx send the bytes from an `internal` location.
+MEDIA_ACCEL_REDIRECT = os.getenv('MEDIA_ACCEL_REDIRECT', 'False').lower() == 'true'
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Resumable attachment uploads (dashboard.uploads). Chunks must fit nginx client_max_body_size.
+ATTACHMENT_MAX_BYTES = int(os.getenv('ATTACHMENT_MAX_BYTES', str(50 * 1024 * 1024)))
+ATTACHMENT_CHUNK_BYTES = int(os.getenv('ATTACHMENT_CHUNK_BYTES', str(4 * 1024 * 1024)))
+ATTACHMENT_CHUNK_MAX_BYTES = int(os.getenv('ATTACHMENT_CHUNK_MAX_BYTES', str(8 * 1024 * 1024)))
+ATTACHMENT_UPLOAD_DIR = Path(os.getenv('ATTACHMENT_UPLOAD_DIR', str(MEDIA_ROOT / 'uploads')))
+ATTACHMENT_SESSION_HOURS = int(os.getenv('ATTACHMENT_SESSION_HOURS', '24'))
+ATTACHMENT_PREVIEW_WIDTH = int(os.getenv('ATTACHMENT_PREVIEW_WIDTH', '800'))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
@@ -174,6 +194,85 @@ SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https') if os.getenv('USE_
 # CSRF trusted origins (comma-separated)
 CSRF_TRUSTED_ORIGINS = [o.strip() for o in os.getenv('CSRF_TRUSTED_ORIGINS', '').split(',') if o.strip()]
 
+# Email for reminder digests. The file backend (default) writes each message
+# under EMAIL_FILE_PATH; set EMAIL_BACKEND to the SMTP backend in production.
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.filebased.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', str(BASE_DIR / 'sent_emails'))
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False').lower() == 'true'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'TKA Dashboard <noreply@localhost>')
+# A recipient gets at most one digest per throttle window
+NOTIFICATION_THROTTLE_HOURS = int(os.getenv('NOTIFICATION_THROTTLE_HOURS', '20'))
+NOTIFICATION_BATCH_SIZE = int(os.getenv('NOTIFICATION_BATCH_SIZE', '100'))
+
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
 ]
+
+# Background jobs (processed by `python manage.py run_jobs`)
+JOB_RETRY_BACKOFF_SECONDS = int(os.getenv('JOB_RETRY_BACKOFF_SECONDS', '30'))
+JOB_STALE_AFTER_SECONDS = int(os.getenv('JOB_STALE_AFTER_SECONDS', '3600'))
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv('JOB_POLL_INTERVAL_SECONDS', '2'))
+# Export admission: queued+running exports allowed per user and overall (above them the
+# request gets 429 with Retry-After), and how many run_jobs may run at the same time.
+EXPORT_MAX_PER_USER = int(os.getenv('EXPORT_MAX_PER_USER', '2'))
+EXPORT_MAX_PENDING = int(os.getenv('EXPORT_MAX_PENDING', '10'))
+EXPORT_MAX_RUNNING = int(os.getenv('EXPORT_MAX_RUNNING', '2'))
+EXPORT_RETRY_AFTER_SECONDS = int(os.getenv('EXPORT_RETRY_AFTER_SECONDS', '30'))
+# Rows removed per transaction when companies/workers are deleted in the background
+DELETE_CHUNK_SIZE = int(os.getenv('DELETE_CHUNK_SIZE', '1000'))
+
+# List pagination: above this planner estimate, page totals are shown as approximate
+# (PostgreSQL only); smaller exact counts are cached per scope and filter set.
+PAGINATOR_ESTIMATE_THRESHOLD = int(os.getenv('PAGINATOR_ESTIMATE_THRESHOLD', '10000'))
+PAGINATOR_COUNT_CACHE_SECONDS = int(os.getenv('PAGINATOR_COUNT_CACHE_SECONDS', '60'))
+
+# Documents expired longer than this are moved to the archive tables by `archive_documents`
+ARCHIVE_RETENTION_DAYS = int(os.getenv('ARCHIVE_RETENTION_DAYS', '730'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+
+# Compliance report results are cached per company scope and day
+REPORT_CACHE_SECONDS = int(os.getenv('REPORT_CACHE_SECONDS', '600'))
+
+# Daily trend snapshots (`snapshot_documents`): "expiring" = active and ending within this many days
+SNAPSHOT_EXPIRING_DAYS = int(os.getenv('SNAPSHOT_EXPIRING_DAYS', '30'))
+
+# On-demand profiling for staff: send `X-Profile: 1` or add `?_profile=1`.
+# Reports are listed in the admin under "Laporan Profil".
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'True').lower() == 'true'
+PROFILING_STATS_LIMIT = int(os.getenv('PROFILING_STATS_LIMIT', '60'))
+PROFILING_MAX_QUERIES = int(os.getenv('PROFILING_MAX_QUERIES', '2000'))
+PROFILING_KEEP_REPORTS = int(os.getenv('PROFILING_KEEP_REPORTS', '200'))
+
+# Prometheus /metrics is disabled (403) until METRICS_TOKEN is set; scrapes send
+# `Authorization: Bearer <token>`. METRICS_ALLOWED_IPS (empty = any) further limits the
+# peer address. Run gunicorn with PROMETHEUS_MULTIPROC_DIR set to aggregate all workers
+# (see deploy/gunicorn.conf.py).
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+METRICS_BUSINESS_CACHE_SECONDS = int(os.getenv('METRICS_BUSINESS_CACHE_SECONDS', '60'))
+
+# iCalendar feeds: renewal deadline events are placed this many days before expiry
+CALENDAR_RENEWAL_LEAD_DAYS = int(os.getenv('CALENDAR_RENEWAL_LEAD_DAYS', '60'))
+CALENDAR_PAST_DAYS = int(os.getenv('CALENDAR_PAST_DAYS', '30'))
+CALENDAR_CACHE_SECONDS = int(os.getenv('CALENDAR_CACHE_SECONDS', '3600'))
+CALENDAR_CACHE_MAX_BYTES = int(os.getenv('CALENDAR_CACHE_MAX_BYTES', str(2 * 1024 * 1024)))
+CALENDAR_UID_DOMAIN = os.getenv('CALENDAR_UID_DOMAIN', 'tka-dashboard')
+
+# Outbound webhooks (`dispatch_webhooks`): failed deliveries retry with exponential backoff
+WEBHOOK_TIMEOUT_SECONDS = float(os.getenv('WEBHOOK_TIMEOUT_SECONDS', '10'))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '8'))
+WEBHOOK_BACKOFF_SECONDS = int(os.getenv('WEBHOOK_BACKOFF_SECONDS', '30'))
+WEBHOOK_BACKOFF_MAX_SECONDS = int(os.getenv('WEBHOOK_BACKOFF_MAX_SECONDS', str(6 * 3600)))
+WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', '100'))
+WEBHOOK_CONCURRENCY = int(os.getenv('WEBHOOK_CONCURRENCY', '10'))
+# `document.expired` is queued for documents that expired within this many days
+WEBHOOK_EXPIRED_LOOKBACK_DAYS = int(os.getenv('WEBHOOK_EXPIRED_LOOKBACK_DAYS', '7'))
+
+# Memory-mapped expiry index (dashboard.expiry_index) shared by all processes on the host;
+# rebuilt by a run_jobs job after DataVersion moves, SQL answers meanwhile. Disable to answer from SQL only.
+EXPIRY_INDEX_ENABLED = os.getenv('EXPIRY_INDEX_ENABLED', 'True').lower() == 'true'
+EXPIRY_INDEX_PATH = Path(os.getenv('EXPIRY_INDEX_PATH', str(BASE_DIR / 'expiry_index.bin')))